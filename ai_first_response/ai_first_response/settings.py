@@ -159,6 +159,63 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 EMERGENCY_CLUSTER_RADIUS_KM = 50  # Radius in kilometers to check for emergency clusters
 EMERGENCY_CLUSTER_MIN_COUNT = 10  # Minimum number of events to trigger an alert
 EMERGENCY_CLUSTER_TIME_WINDOW_HOURS = 24  # Time window to check for clusters (in hours)
+EMERGENCY_ALERTS_CACHE_TTL = 60  # Max seconds the alerts ETag can miss a re-classified or out-of-order message
+EMERGENCY_ALERTS_BACKEND = 'incremental'  # 'incremental' (in-process clusters) or 'sql' (database cell counts)
+
+# Hotspot (surge) Detection Settings
+HOTSPOT_CELL_KM = 10  # Grid cell size in kilometers for per-cell report rates
+HOTSPOT_WINDOW_MINUTES = 5  # Recent window compared against each cell's baseline
+HOTSPOT_MIN_COUNT = 3  # Minimum reports in the window before a cell can be flagged
+HOTSPOT_Z_THRESHOLD = 3.0  # Standard deviations above baseline that flag a surge
+HOTSPOT_EWMA_ALPHA = 0.05  # Weight of each completed minute in the baseline rate
+
+# Map Tile Settings
+GEO_TILE_ZOOM_LEVELS = [2, 4, 6, 8, 10, 12]  # Zoom levels with maintained tile counts (rebuild_geo_tiles after changing)
+GEO_TILE_DETAIL = 2  # Serve a map zoom from tiles up to this many levels finer
+GEO_TILE_DEFAULT_DAYS = 7  # Days of activity shown on the map by default
+GEO_TILE_MAX_DAYS = 90  # Most days one map request may cover (each day is scanned in the tile table)
+
+# Live Dashboard Channel Settings
+# Under the WSGI gunicorn in entrypoint.sh each worker streams to LIVE_MAX_SUBSCRIBERS dashboards and the
+# rest get a 503 and keep polling; many dashboards per process need the ASGI application (see live.py)
+LIVE_TICK_SECONDS = 0.5  # How often the push channel checks for processed messages
+LIVE_PROBE_SECONDS = 2  # How often it asks the database about messages from other workers
+LIVE_HEARTBEAT_SECONDS = 15  # Keep-alive comment interval on idle streams
+LIVE_STREAM_MAX_SECONDS = 300  # Streams end after this long and the browser reconnects (frees WSGI threads)
+LIVE_MAX_SUBSCRIBERS = 1  # WSGI live connections per process; each holds one of its gunicorn threads (4 in entrypoint.sh)
+LIVE_MAX_ASYNC_SUBSCRIBERS = 50  # Live connections per process under ASGI, where streams hold no thread
+
+# Alert Subscription Settings
+SUBSCRIPTION_MAX_RADIUS_KM = 500  # Largest point + radius area a subscription may register
+SUBSCRIPTION_MAX_PER_SESSION = 20  # Active subscriptions one browser session may hold
+SUBSCRIPTION_INDEX_REFRESH_SECONDS = 30  # How often each worker checks for subscriptions changed elsewhere
+
+# Disaster Feed Settings
+GDACS_REQUEST_TIMEOUT = 10  # Total time budget (seconds) for one GDACS fetch, across all endpoints
+GDACS_RACE_ENDPOINTS = False  # Query all GDACS endpoints concurrently, first success wins
+GDACS_BREAKER_FAILURE_THRESHOLD = 3  # Consecutive failures before an endpoint's circuit opens
+GDACS_BREAKER_COOLDOWN = 300  # Seconds before an open circuit lets a retry through
+GDACS_IMPACT_REFRESH_SECONDS = 900  # How often the active events' impact polygons are re-indexed
+GDACS_IMPACT_MAX_EVENTS = 100  # Active events whose geometry is fetched per refresh
+GDACS_IMPACT_FETCH_WORKERS = 8  # Concurrent geometry downloads during a refresh
+
+# Message Retention Settings
+MESSAGE_RETENTION_DAYS = 90  # Conversations idle this long are moved to the archive table by archive_messages
+
+# Message Export Settings
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched from the cursor and written per chunk by exports
+
+# Message API Settings
+API_PAGE_SIZE = 50  # Messages or conversations per page of the browsing API
+API_MAX_PAGE_SIZE = 500  # Largest ?limit= accepted
+
+# Admin Settings
+ADMIN_HIGH_VOLUME = True  # Estimated counts and no date hierarchy on the message changelist
+ADMIN_COUNT_LIMIT = 10000  # Most rows counted for a filtered changelist (pages past this are not offered)
+ADMIN_FILTER_CACHE_SECONDS = 300  # How long the category filter's choices are cached
+
+# Stage Latency Settings
+LATENCY_FLUSH_SECONDS = 10  # How often each worker writes its latency histograms to the database
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -1,5 +1,86 @@
+import ipaddress
+from django.conf import settings
 from django.contrib import admin
-from .models import EmergencyCategory, ReceivedMessage
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection, transaction
+from django.utils.functional import cached_property
+from .models import EmergencyCategory, ReceivedMessage, AlertSubscription, ArchivedMessage, MessageRollup
+from . import rollups, search
+
+
+def estimated_table_rows(model):
+    """Planner statistics row count of a model's table (None if the database has none)"""
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql, params = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table]
+    elif connection.vendor == 'sqlite':
+        # Filled by ANALYZE; the first number of a row is the table's row count
+        sql, params = "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]
+    else:
+        return None
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts a whole large table: an unfiltered changelist
+    uses the planner's row estimate, a filtered one counts at most
+    ADMIN_COUNT_LIMIT matching rows (pages past that are not offered).
+    """
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'ADMIN_COUNT_LIMIT', 10000)
+        if not self.object_list.query.where:
+            estimate = estimated_table_rows(self.object_list.model)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return self.object_list.order_by()[:limit].count()
+
+
+class RollupCategoryFilter(admin.SimpleListFilter):
+    """AI category filter whose choices come from the hourly rollups, cached, instead of a DISTINCT over messages"""
+    title = 'AI category'
+    parameter_name = 'ai_category'
+    cache_key = 'admin:rollup_categories'
+
+    def lookups(self, request, model_admin):
+        categories = cache.get(self.cache_key)
+        if categories is None:
+            categories = list(MessageRollup.objects.exclude(category='').order_by('category').values_list(
+                'category', flat=True
+            ).distinct())
+            cache.set(self.cache_key, categories, getattr(settings, 'ADMIN_FILTER_CACHE_SECONDS', 300))
+        return [(category, category) for category in categories]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(ai_category=self.value())
+        return queryset
+
+class ArchivedSeverityFilter(admin.SimpleListFilter):
+    """Severity filter with the fixed ReceivedMessage choices, instead of a DISTINCT over the archive"""
+    title = 'AI severity'
+    parameter_name = 'ai_severity'
+
+    def lookups(self, request, model_admin):
+        return ReceivedMessage.SEVERITY_CHOICES
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(ai_severity=self.value())
+        return queryset
+
 
 @admin.register(EmergencyCategory)
 class EmergencyCategoryAdmin(admin.ModelAdmin):
@@ -23,11 +104,13 @@ class ReceivedMessageAdmin(admin.ModelAdmin):
     list_display = ['received_at', 'ai_category', 'ai_severity', 'conversation_display', 
                    'conversation_status', 'location_display', 'processing_time_display', 
                    'is_critical', 'has_error']
-    list_filter = ['ai_severity', 'ai_category', 'conversation_status', 'is_conversation_starter', 
+    list_filter = ['ai_severity', RollupCategoryFilter, 'conversation_status', 'is_conversation_starter', 
                    'needs_follow_up', 'has_error', 'is_test_message', 'received_at']
-    search_fields = ['user_message', 'ai_category', 'user_ip', 'follow_up_question']
+    # Searched through the full-text index (see get_search_results), or an exact IP
+    search_fields = ['user_message', 'message_text', 'follow_up_question', 'ai_category', '=user_ip']
     readonly_fields = ['received_at', 'processed_at', 'location_display', 'processing_time_display',
-                      'conversation_display', 'follow_up_count']
+                      'conversation_display', 'follow_up_count', 'last_activity_at', 'latest_severity',
+                      'latest_category']
     date_hierarchy = 'received_at'
     
     fieldsets = (
@@ -40,7 +123,8 @@ class ReceivedMessageAdmin(admin.ModelAdmin):
         ('Conversation', {
             'fields': ('parent_message', 'conversation_step', 'is_conversation_starter', 
                       'conversation_status', 'needs_follow_up', 'follow_up_question', 
-                      'conversation_display', 'follow_up_count'),
+                      'conversation_display', 'follow_up_count', 'last_activity_at', 'latest_severity',
+                      'latest_category'),
             'classes': ('collapse',)
         }),
         ('Performance', {
@@ -55,36 +139,73 @@ class ReceivedMessageAdmin(admin.ModelAdmin):
         }),
     )
     
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('parent_message').prefetch_related('follow_ups')
+    def __init__(self, model, admin_site):
+        super().__init__(model, admin_site)
+        if getattr(settings, 'ADMIN_HIGH_VOLUME', True):
+            # No exact COUNT(*) of the table and no DISTINCT over received_at dates
+            self.paginator = EstimatedCountPaginator
+            self.show_full_result_count = False
+            self.date_hierarchy = None
+    
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        try:
+            ipaddress.ip_address(search_term)
+        except ValueError:
+            return search.search_messages(queryset, search_term), False
+        return queryset.filter(user_ip=search_term), False
     
     def conversation_display(self, obj):
         """Display conversation information in a readable format"""
         if obj.is_conversation_starter:
-            follow_up_count = obj.follow_ups.count()
-            if follow_up_count > 0:
-                return f"🗣️ Starter (Step {obj.conversation_step}) → {follow_up_count} follow-ups"
+            if obj.follow_up_count > 0:
+                return f"🗣️ Starter (Step {obj.conversation_step}) → {obj.follow_up_count} follow-ups"
             else:
                 return f"🗣️ Starter (Step {obj.conversation_step})"
         else:
-            return f"💬 Follow-up (Step {obj.conversation_step}) ← Parent: #{obj.parent_message.id if obj.parent_message else 'None'}"
+            return f"💬 Follow-up (Step {obj.conversation_step}) ← Parent: #{obj.parent_message_id or 'None'}"
     conversation_display.short_description = "Conversation"
     
-    def follow_up_count(self, obj):
-        """Count of follow-up messages"""
-        return obj.follow_ups.count()
-    follow_up_count.short_description = "Follow-ups Count"
-    
     def mark_conversations_completed(self, request, queryset):
         """Mark selected conversations as completed"""
+        rollups.conversations_closed(queryset)
         updated = queryset.update(conversation_status='completed')
         self.message_user(request, f'{updated} conversations marked as completed.')
     mark_conversations_completed.short_description = "Mark conversations as completed"
     
     def mark_conversations_abandoned(self, request, queryset):
         """Mark selected conversations as abandoned"""
+        rollups.conversations_closed(queryset)
         updated = queryset.update(conversation_status='abandoned')
         self.message_user(request, f'{updated} conversations marked as abandoned.')
     mark_conversations_abandoned.short_description = "Mark conversations as abandoned"
     
     actions = ['mark_conversations_completed', 'mark_conversations_abandoned']
+
+
+@admin.register(ArchivedMessage)
+class ArchivedMessageAdmin(admin.ModelAdmin):
+    list_display = ['received_at', 'id', 'root_id', 'ai_category', 'ai_severity', 'conversation_step',
+                    'has_error', 'archived_at']
+    list_filter = [ArchivedSeverityFilter, 'has_error', 'received_at']
+    exclude = ['payload']
+    # The archive only grows: no exact COUNT(*) and no DISTINCT over its severities or received_at dates
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AlertSubscription)
+class AlertSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'area_type', 'latitude', 'longitude', 'radius_km', 'is_active', 'created_at']
+    list_filter = ['area_type', 'is_active', 'created_at']
+    search_fields = ['name']
+    list_editable = ['is_active']
+    readonly_fields = ['session_key', 'created_by', 'created_at', 'updated_at']
@@ -10,6 +10,7 @@ from .executor import EmergencyExecutor
 from .memory import EmergencyMemory
 from .responders import classify_message
 from .disaster_feeds import get_disaster_feed
+from .latency import stage_latency
 
 logger = logging.getLogger(__name__)
 
@@ -56,36 +57,40 @@ class AgenticEmergencySystem:
             context = self._gather_context(message, latitude, longitude, user_language, conversation_context)
             
             # Step 2: Initial classification using existing responder
-            classification = classify_message(
-                message, latitude, longitude, 
-                context.get('disaster_feed', ''), 
-                user_language
-            )
+            with stage_latency.measure('classify'):
+                classification = classify_message(
+                    message, latitude, longitude, 
+                    context.get('disaster_feed', ''), 
+                    user_language
+                )
             
             # Step 3: Enhance context with classification and memory
             enhanced_context = self._enhance_context_with_memory(context, classification)
             
             # Step 4: Plan comprehensive response (with conversation context)
-            response_plan = self.planner.plan_response(
-                message=message,
-                location={'lat': latitude, 'lon': longitude},
-                severity=classification.get('severity', 'UNKNOWN'),
-                category=classification.get('category', 'UNKNOWN'),
-                language=user_language or 'en',
-                conversation_context=conversation_context
-            )
+            with stage_latency.measure('plan'):
+                response_plan = self.planner.plan_response(
+                    message=message,
+                    location={'lat': latitude, 'lon': longitude},
+                    severity=classification.get('severity', 'UNKNOWN'),
+                    category=classification.get('category', 'UNKNOWN'),
+                    language=user_language or 'en',
+                    conversation_context=conversation_context
+                )
             
             # Step 5: Execute the plan
-            execution_log = self.executor.execute_plan(response_plan, enhanced_context)
+            with stage_latency.measure('execute'):
+                execution_log = self.executor.execute_plan(response_plan, enhanced_context)
             
             # Step 6: Store interaction in memory for future learning
             interaction_id = f"emergency_{int(start_time.timestamp())}"
-            self.memory.store_interaction(
-                message_id=hash(interaction_id),  # Simplified ID
-                context=enhanced_context,
-                plan=response_plan,
-                execution_log=execution_log
-            )
+            with stage_latency.measure('memory_store'):
+                self.memory.store_interaction(
+                    message_id=hash(interaction_id),  # Simplified ID
+                    context=enhanced_context,
+                    plan=response_plan,
+                    execution_log=execution_log
+                )
             
             # Step 7: Prepare comprehensive response
             agentic_response = self._prepare_agentic_response(
@@ -127,7 +132,8 @@ class AgenticEmergencySystem:
         
         # Get disaster feed context
         try:
-            disaster_feed = get_disaster_feed(latitude, longitude)
+            with stage_latency.measure('feed_fetch'):
+                disaster_feed = get_disaster_feed(latitude, longitude)
             context['disaster_feed'] = disaster_feed
         except Exception as e:
             logger.warning(f"Could not fetch disaster feed: {str(e)}")
@@ -135,9 +141,10 @@ class AgenticEmergencySystem:
         
         # Get situational awareness from memory
         try:
-            situational_awareness = self.memory.get_situational_awareness(
-                location={'lat': latitude, 'lon': longitude}
-            )
+            with stage_latency.measure('awareness'):
+                situational_awareness = self.memory.get_situational_awareness(
+                    location={'lat': latitude, 'lon': longitude}
+                )
             context['situational_awareness'] = situational_awareness
         except Exception as e:
             logger.warning(f"Could not get situational awareness: {str(e)}")
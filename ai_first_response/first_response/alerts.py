@@ -0,0 +1,309 @@
+"""
+Incremental Emergency Alert Clusters
+Keeps per-category spatial buckets of recently processed messages and the
+clusters found in them, so the alerts endpoint reads a maintained snapshot
+instead of re-clustering the whole time window on every poll.
+
+Buckets are cells of a fixed GeoGrid one cluster radius wide. Occupied cells
+that touch form connected regions; a cluster never spans two regions, so when
+messages arrive or expire only the regions around the touched cells are
+re-clustered. Each process catches up with messages processed by other
+workers through a small query on processed_at.
+
+The ETag of the alerts endpoint is derived from the database, so every
+worker computes the same one: the latest processed_at in the time window
+changes when a message arrives, the oldest one when a message ages out. Both
+are single seeks on the processed_at index, whatever the size of the window.
+A short time slot bounds how long an in-place re-classification (which keeps
+processed_at) or a row committed out of processed_at order can go unnoticed. The payload is cached per ETag in the Django
+cache, per process unless a shared cache backend is configured.
+"""
+import heapq
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .analytics import from_epoch_us, load_columns, to_epoch_us
+from .clustering import build_alert, cluster_points
+from .geo import GeoGrid
+from .models import ReceivedMessage
+from .sql_clustering import sql_cluster_alerts, window_queryset
+
+# Re-read this much before the sync watermark, for rows committed out of order
+SYNC_OVERLAP = timedelta(seconds=60)
+
+ALERTS_PAYLOAD_KEY = 'emergency_alerts:payload'
+
+
+def cluster_settings():
+    """(radius_km, min_count, time_window_hours) from settings"""
+    return (
+        getattr(settings, 'EMERGENCY_CLUSTER_RADIUS_KM', 50),
+        getattr(settings, 'EMERGENCY_CLUSTER_MIN_COUNT', 10),
+        getattr(settings, 'EMERGENCY_CLUSTER_TIME_WINDOW_HOURS', 24),
+    )
+
+
+def alerts_backend():
+    """'incremental' or 'sql', from EMERGENCY_ALERTS_BACKEND"""
+    return getattr(settings, 'EMERGENCY_ALERTS_BACKEND', 'incremental')
+
+
+def affects_alerts(message):
+    """Whether a processed message can change the emergency alerts"""
+    return bool(message.ai_category and message.ai_category != 'Unknown'
+                and message.user_latitude is not None and message.user_longitude is not None
+                and message.processed_at is not None)
+
+
+def alerts_version():
+    """
+    Version of the messages in the time window: its newest and oldest
+    processed_at, read from the database with one index seek each.
+    """
+    window = window_queryset(cluster_settings()[2]).values_list('processed_at', flat=True)
+    latest = window.order_by('-processed_at').first()
+    if latest is None:
+        return '0'
+    return f"{to_epoch_us(latest)}.{to_epoch_us(window.order_by('processed_at').first())}"
+
+
+def alerts_etag():
+    """
+    ETag for the current alerts payload, the same in every worker. Changes
+    when a relevant message is processed or ages out of the time window, when
+    the cluster settings change, and every cache TTL so that re-classified
+    messages are picked up.
+    """
+    ttl = getattr(settings, 'EMERGENCY_ALERTS_CACHE_TTL', 60)
+    slot = int(time.time() // ttl) if ttl else 0
+    radius_km, min_count, time_window_hours = cluster_settings()
+    return f'"{alerts_version()}-{slot}-{radius_km}-{min_count}-{time_window_hours}"'
+
+
+class _CategoryBuckets:
+    """Spatial buckets, connected regions and per-region alerts for one category"""
+
+    def __init__(self):
+        self.cells = {}  # cell -> {message_id: point}
+        self.cell_region = {}  # cell -> region id
+        self.regions = {}  # region id -> {'cells': set, 'alerts': list}
+        self.dirty = set()  # Cells changed since the last refresh
+        self._next_region = 0
+
+    def add(self, cell, point):
+        self.cells.setdefault(cell, {})[point[0]] = point
+        self.dirty.add(cell)
+
+    def remove(self, cell, message_id):
+        bucket = self.cells.get(cell)
+        if bucket is not None and bucket.pop(message_id, None) is not None:
+            if not bucket:
+                del self.cells[cell]
+            self.dirty.add(cell)
+
+    def refresh(self, category, grid, radius_km, min_count):
+        """Re-cluster only the regions around the cells changed since the last refresh"""
+        if not self.dirty:
+            return False
+
+        # Regions touching a changed cell may merge, split or change clusters
+        affected = set()
+        for cell in self.dirty:
+            for neighbor in grid.neighbors(cell):
+                region = self.cell_region.get(neighbor)
+                if region is not None:
+                    affected.add(region)
+
+        seeds = {cell for cell in self.dirty if cell in self.cells}
+        for region in affected:
+            for cell in self.regions.pop(region)['cells']:
+                self.cell_region.pop(cell, None)
+                if cell in self.cells:
+                    seeds.add(cell)
+        self.dirty.clear()
+
+        # Rebuild the connected regions of occupied cells from the seeds
+        for seed in seeds:
+            if seed in self.cell_region:
+                continue
+            region_id = self._next_region
+            self._next_region += 1
+            region_cells = {seed}
+            self.cell_region[seed] = region_id
+            stack = [seed]
+            while stack:
+                for neighbor in grid.neighbors(stack.pop()):
+                    if neighbor in self.cells and neighbor not in self.cell_region:
+                        self.cell_region[neighbor] = region_id
+                        region_cells.add(neighbor)
+                        stack.append(neighbor)
+            self.regions[region_id] = {
+                'cells': region_cells,
+                'alerts': self._cluster_region(category, region_cells, radius_km, min_count)
+            }
+        return True
+
+    def _cluster_region(self, category, region_cells, radius_km, min_count):
+        points = [point for cell in region_cells for point in self.cells[cell].values()]
+        if len(points) < min_count:
+            return []
+        # Newest first, as the alerts endpoint has always clustered them
+        points.sort(key=lambda p: (p[3], p[0]), reverse=True)
+        clusters = cluster_points([p[1] for p in points], [p[2] for p in points], radius_km, min_count)
+        return [build_alert(category, [points[i] for i in members], radius_km) for members in clusters]
+
+    def alerts(self):
+        return [alert for region in self.regions.values() for alert in region['alerts']]
+
+
+class AlertClusterIndex:
+    """
+    Process-wide maintained snapshot of emergency alert clusters.
+    Fed by record_message() when a message finishes processing; snapshot()
+    expires old messages, syncs rows processed by other workers and
+    re-clusters only what changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset(None)
+
+    def _reset(self, config):
+        self._config = config
+        self._grid = GeoGrid(config[0]) if config else None
+        self._categories = {}
+        self._points = {}  # message_id -> (category, cell, processed_at_us, severity)
+        self._expiry = []  # Heap of (processed_at_us, message_id)
+        self._watermark = None  # Latest processed_at_us seen
+        self._alerts = []
+        self._loaded = False
+
+    def _ensure_config(self):
+        config = cluster_settings()
+        if config != self._config:
+            self._reset(config)
+
+    def record_message(self, message):
+        """Add (or update) a processed message in the cluster buckets"""
+        with self._lock:
+            self._ensure_config()
+            if not self._loaded:
+                return  # The first snapshot loads the whole window anyway
+            self._add(message.id, message.ai_category, message.user_latitude,
+                      message.user_longitude, to_epoch_us(message.processed_at), message.ai_severity)
+
+    def _add(self, message_id, category, lat, lon, processed_at, severity):
+        existing = self._points.get(message_id)
+        if existing is not None:
+            if existing[0] == category and existing[2] == processed_at and existing[3] == severity:
+                return
+            self._remove(message_id)
+
+        if (not category or category == 'Unknown' or lat is None or lon is None
+                or processed_at < self._cutoff()):
+            return
+
+        cell = self._grid.cell(lat, lon)
+        self._categories.setdefault(category, _CategoryBuckets()).add(
+            cell, (message_id, lat, lon, processed_at, severity))
+        self._points[message_id] = (category, cell, processed_at, severity)
+        heapq.heappush(self._expiry, (processed_at, message_id))
+        if self._watermark is None or processed_at > self._watermark:
+            self._watermark = processed_at
+
+    def _remove(self, message_id):
+        category, cell = self._points.pop(message_id)[:2]
+        self._categories[category].remove(cell, message_id)
+
+    def _cutoff(self):
+        """Start of the time window, in epoch microseconds"""
+        return to_epoch_us(timezone.now() - timedelta(hours=self._config[2]))
+
+    def _expire(self):
+        cutoff = self._cutoff()
+        while self._expiry and self._expiry[0][0] < cutoff:
+            processed_at, message_id = heapq.heappop(self._expiry)
+            existing = self._points.get(message_id)
+            if existing is not None and existing[2] == processed_at:
+                self._remove(message_id)
+
+    def _sync(self):
+        """Load the window on first use, then only rows processed since the watermark"""
+        if self._loaded and self._watermark is not None:
+            since = from_epoch_us(self._watermark) - SYNC_OVERLAP
+        else:
+            since = from_epoch_us(self._cutoff())
+
+        queryset = ReceivedMessage.objects.filter(
+            processed_at__gte=since,
+            user_latitude__isnull=False,
+            user_longitude__isnull=False,
+            ai_category__isnull=False
+        ).exclude(ai_category='Unknown').order_by()  # Unordered: the processed_at index drives the scan
+        fields = ['id', 'ai_category', 'user_latitude', 'user_longitude', 'processed_at', 'ai_severity']
+        columns = load_columns(queryset, fields, consumer='emergency_alerts')
+        for row in zip(*(columns.values(name) for name in fields)):
+            self._add(*row)
+        self._loaded = True
+
+    def snapshot(self):
+        """
+        Current alerts, sorted by count (highest first).
+        Cost depends on how many messages arrived or expired since the last call.
+        """
+        with self._lock:
+            self._ensure_config()
+            radius_km, min_count, _ = self._config
+            self._sync()
+            self._expire()
+
+            changed = False
+            for category, buckets in self._categories.items():
+                changed |= buckets.refresh(category, self._grid, radius_km, min_count)
+            if changed:
+                alerts = [alert for buckets in self._categories.values() for alert in buckets.alerts()]
+                alerts.sort(key=lambda x: x['count'], reverse=True)
+                self._alerts = alerts
+            return list(self._alerts)
+
+    def payload(self, etag):
+        """
+        Alerts endpoint payload for an ETag from alerts_etag(). Built at most
+        once per ETag in each process (once overall with a shared cache backend).
+        """
+        cached = cache.get(ALERTS_PAYLOAD_KEY)
+        if cached is not None and cached['etag'] == etag:
+            return cached['payload']
+
+        radius_km, min_count, time_window_hours = cluster_settings()
+        alerts = current_alerts()
+        payload = {
+            'success': True,
+            'alerts': alerts,
+            'total_alerts': len(alerts),
+            'checked_time_window_hours': time_window_hours,
+            'cluster_settings': {
+                'radius_km': radius_km,
+                'min_count': min_count
+            }
+        }
+        cache.set(ALERTS_PAYLOAD_KEY, {'etag': etag, 'payload': payload},
+                  getattr(settings, 'EMERGENCY_ALERTS_CACHE_TTL', 60))
+        return payload
+
+
+alert_clusters = AlertClusterIndex()
+
+
+def current_alerts():
+    """
+    Current alerts from the configured backend: 'incremental' (clusters kept
+    up to date in process as messages arrive) or 'sql' (cell counts grouped
+    in the database, dense areas refined in Python).
+    """
+    if alerts_backend() == 'sql':
+        return sql_cluster_alerts(*cluster_settings())
+    return alert_clusters.snapshot()
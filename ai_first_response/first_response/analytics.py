@@ -0,0 +1,173 @@
+"""
+Analytics Data Access
+Columnar projections of ReceivedMessage for the analytics and alerting code.
+Only the requested fields are fetched, streamed with values_list().iterator()
+and packed into NumPy columns, instead of materializing model instances with
+their message text, instructions JSON and user agent.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+NO_TIME = np.iinfo(np.int64).min  # Stored for NULL timestamps
+NO_LABEL = -1  # Code stored for NULL text values
+
+FLOAT_FIELDS = {'FloatField', 'DecimalField'}
+INT_FIELDS = {'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField',
+              'SmallIntegerField', 'PositiveIntegerField', 'PositiveBigIntegerField',
+              'PositiveSmallIntegerField', 'ForeignKey', 'OneToOneField', 'BooleanField'}
+TIME_FIELDS = {'DateTimeField'}
+
+_stats_lock = threading.Lock()
+_query_stats = {}
+
+
+def to_epoch_us(value):
+    """Aware (or UTC-naive) datetime to integer microseconds since the epoch"""
+    if value is None:
+        return NO_TIME
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return (value - EPOCH) // ONE_MICROSECOND
+
+
+def from_epoch_us(value):
+    """Integer microseconds since the epoch to an aware UTC datetime"""
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+class MessageColumns:
+    """
+    Result of a columnar query: one NumPy array per field.
+    Numbers are float64 (NaN for NULL), ids and flags int64, timestamps int64
+    microseconds since the epoch (NO_TIME for NULL) and text fields int32 codes
+    into a per-field label list (NO_LABEL for NULL).
+    """
+
+    def __init__(self, columns, labels, elapsed_ms):
+        self.columns = columns
+        self.labels = labels
+        self.elapsed_ms = elapsed_ms
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def values(self, name):
+        """Column as a Python list, with text decoded and NULLs as None"""
+        column = self.columns[name]
+        if name in self.labels:
+            labels = self.labels[name]
+            return [labels[code] if code != NO_LABEL else None for code in column.tolist()]
+        if column.dtype.kind == 'f':
+            return [None if v != v else v for v in column.tolist()]
+        return column.tolist()
+
+    def value_counts(self, name):
+        """{label: count} for a text column, in first-seen order, skipping NULL and empty values"""
+        labels = self.labels[name]
+        codes = self.columns[name]
+        counts = np.bincount(codes[codes != NO_LABEL], minlength=len(labels))
+        return {label: int(count) for label, count in zip(labels, counts) if label and count}
+
+    def report(self):
+        return {'rows': len(self), 'elapsed_ms': round(self.elapsed_ms, 2), 'nbytes': self.nbytes}
+
+
+def _field_kind(model, name):
+    field_type = model._meta.get_field(name).get_internal_type()
+    if field_type in FLOAT_FIELDS:
+        return 'float'
+    if field_type in INT_FIELDS:
+        return 'int'
+    if field_type in TIME_FIELDS:
+        return 'time'
+    return 'label'
+
+
+def load_columns(queryset, fields, consumer, chunk_size=2000):
+    """
+    Stream a values_list projection of the queryset into NumPy columns.
+
+    Args:
+        queryset: ReceivedMessage or ArchivedMessage queryset (filters, ordering and slicing apply)
+        fields: Field names to fetch
+        consumer: Name the call is reported under in get_query_stats()
+        chunk_size: Rows fetched and packed per batch
+
+    Returns:
+        MessageColumns
+    """
+    started = time.perf_counter()
+    kinds = [_field_kind(queryset.model, name) for name in fields]
+    chunks = [[] for _ in fields]
+    interned = {name: {} for name, kind in zip(fields, kinds) if kind == 'label'}
+
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            break
+        for i, (name, kind, values) in enumerate(zip(fields, kinds, zip(*batch))):
+            if kind == 'float':
+                column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            elif kind == 'int':
+                column = np.array([-1 if v is None else v for v in values], dtype=np.int64)
+            elif kind == 'time':
+                column = np.array([to_epoch_us(v) for v in values], dtype=np.int64)
+            else:
+                codes = interned[name]
+                column = np.array([NO_LABEL if v is None else codes.setdefault(v, len(codes)) for v in values],
+                                  dtype=np.int32)
+            chunks[i].append(column)
+
+    dtypes = {'float': np.float64, 'int': np.int64, 'time': np.int64, 'label': np.int32}
+    columns = {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=dtypes[kind])
+        for name, kind, parts in zip(fields, kinds, chunks)
+    }
+    labels = {name: list(codes) for name, codes in interned.items()}
+    result = MessageColumns(columns, labels, (time.perf_counter() - started) * 1000)
+    _record_query(consumer, result)
+    return result
+
+
+def _record_query(consumer, result):
+    logger.debug(f"Analytics query {consumer}: {len(result)} rows, {result.elapsed_ms:.1f} ms, {result.nbytes} bytes")
+    with _stats_lock:
+        stats = _query_stats.setdefault(consumer, {
+            'calls': 0, 'rows': 0, 'total_ms': 0.0, 'last_ms': 0.0, 'last_bytes': 0, 'peak_bytes': 0
+        })
+        stats['calls'] += 1
+        stats['rows'] += len(result)
+        stats['total_ms'] += result.elapsed_ms
+        stats['last_ms'] = result.elapsed_ms
+        stats['last_bytes'] = result.nbytes
+        stats['peak_bytes'] = max(stats['peak_bytes'], result.nbytes)
+
+
+def get_query_stats():
+    """Per-consumer call counts, rows, time and column memory of analytics queries"""
+    with _stats_lock:
+        return {
+            consumer: {
+                **stats,
+                'total_ms': round(stats['total_ms'], 2),
+                'last_ms': round(stats['last_ms'], 2),
+                'avg_ms': round(stats['total_ms'] / stats['calls'], 2) if stats['calls'] else 0.0
+            }
+            for consumer, stats in _query_stats.items()
+        }
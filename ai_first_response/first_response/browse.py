@@ -0,0 +1,161 @@
+"""
+Message Browsing
+Read API over past messages and conversations, newest first, paginated by
+keyset on (received_at, id): each page starts strictly after the last row of
+the previous one, carried in an opaque cursor. A page is one index range scan
+of `limit` rows wherever it is, unlike OFFSET, which reads and discards every
+row before the page.
+
+Only the requested fields are read (values(), no model instances), and a
+page of conversations loads all their threads with one recursive query.
+"""
+import base64
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Q
+from .analytics import EPOCH, to_epoch_us
+from .conversations import conversation_threads
+
+# API field name -> ReceivedMessage field
+FIELDS = {
+    'id': 'id',
+    'parent_id': 'parent_message_id',
+    'conversation_step': 'conversation_step',
+    'is_conversation_starter': 'is_conversation_starter',
+    'conversation_status': 'conversation_status',
+    'follow_up_count': 'follow_up_count',
+    'last_activity_at': 'last_activity_at',
+    'latest_severity': 'latest_severity',
+    'latest_category': 'latest_category',
+    'message_type': 'message_type',
+    'language': 'language',
+    'message_text': 'message_text',
+    'ai_category': 'ai_category',
+    'ai_severity': 'ai_severity',
+    'ai_instructions': 'ai_instructions',
+    'needs_follow_up': 'needs_follow_up',
+    'follow_up_question': 'follow_up_question',
+    'latitude': 'user_latitude',
+    'longitude': 'user_longitude',
+    'response_time_ms': 'response_time_ms',
+    'has_error': 'has_error',
+    'received_at': 'received_at',
+    'processed_at': 'processed_at',
+}
+
+# Fields read for every row: the cursor is built from them
+KEY_FIELDS = ('received_at', 'id')
+
+# Largest id a cursor may carry (a signed 64-bit database integer)
+MAX_MESSAGE_ID = 2 ** 63 - 1
+
+
+def page_size(value):
+    """?limit= clamped to API_MAX_PAGE_SIZE (API_PAGE_SIZE when missing or invalid)"""
+    default = getattr(settings, 'API_PAGE_SIZE', 50)
+    if not value or not value.isdigit() or int(value) < 1:
+        return default
+    return min(int(value), getattr(settings, 'API_MAX_PAGE_SIZE', 500))
+
+
+def parse_fields(value):
+    """API field names from ?fields=a,b (all of them when empty); 'id' is always included"""
+    if not value:
+        return list(FIELDS)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return ['id'] + [name for name in dict.fromkeys(names) if name != 'id']
+
+
+def parse_area(params):
+    """(north, south, east, west) from the query parameters, None when not given"""
+    if not any(side in params for side in ('north', 'south', 'east', 'west')):
+        return None
+    north, south, east, west = (float(params[side]) for side in ('north', 'south', 'east', 'west'))
+    if not (-90 <= south <= north <= 90) or not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError("Invalid area bounds")
+    return north, south, east, west
+
+
+def encode_cursor(received_at, message_id):
+    token = f"{to_epoch_us(received_at)}.{message_id}".encode('ascii')
+    return base64.urlsafe_b64encode(token).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(received_at, id) of the last row of the previous page"""
+    try:
+        token = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        epoch_us, message_id = (int(part) for part in token.split('.'))
+        received_at = EPOCH + timedelta(microseconds=epoch_us)
+    except (ValueError, UnicodeDecodeError, OverflowError):
+        raise ValueError("Invalid cursor")
+    if not 0 <= message_id <= MAX_MESSAGE_ID:
+        raise ValueError("Invalid cursor")
+    return received_at, message_id
+
+
+def filter_messages(queryset, category=None, severity=None, area=None, session_key=None, since=None, until=None):
+    """Messages of the category and severity, inside the area, from the session, received in [since, until)"""
+    if category:
+        queryset = queryset.filter(ai_category=category)
+    if severity:
+        queryset = queryset.filter(ai_severity=severity.upper())
+    if area is not None:
+        north, south, east, west = area
+        queryset = queryset.filter(user_latitude__gte=south, user_latitude__lte=north)
+        if west <= east:
+            queryset = queryset.filter(user_longitude__gte=west, user_longitude__lte=east)
+        else:
+            # The area crosses the antimeridian
+            queryset = queryset.filter(Q(user_longitude__gte=west) | Q(user_longitude__lte=east))
+    if session_key is not None:
+        queryset = queryset.filter(session_key=session_key)
+    if since is not None:
+        queryset = queryset.filter(received_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(received_at__lt=until)
+    return queryset
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def keyset_page(queryset, fields, cursor=None, limit=50):
+    """
+    One page of rows newest first, continuing after `cursor`.
+
+    Returns:
+        ([{field: value}], cursor of the next page or None on the last page)
+    """
+    if cursor:
+        received_at, message_id = decode_cursor(cursor)
+        # The plain range condition bounds the index scan; the OR only breaks ties on received_at
+        queryset = queryset.filter(Q(received_at__lt=received_at) | Q(id__lt=message_id),
+                                   received_at__lte=received_at)
+    columns = list(dict.fromkeys([FIELDS[name] for name in fields] + list(KEY_FIELDS)))
+    rows = list(queryset.order_by('-received_at', '-id').values(*columns)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['received_at'], rows[-1]['id'])
+    return [{name: _json_value(row[FIELDS[name]]) for name in fields} for row in rows], next_cursor
+
+
+def conversation_page(queryset, fields, cursor=None, limit=50, with_messages=False):
+    """
+    One page of conversations (their starters) newest first, each with its
+    whole thread under 'messages' when `with_messages`.
+    """
+    conversations, next_cursor = keyset_page(queryset.filter(parent_message__isnull=True), fields, cursor, limit)
+    if with_messages:
+        threads = conversation_threads([conversation['id'] for conversation in conversations])
+        for conversation in conversations:
+            conversation['messages'] = [
+                {name: _json_value(getattr(message, FIELDS[name])) for name in fields}
+                for message in threads[conversation['id']]
+            ]
+    return conversations, next_cursor
@@ -0,0 +1,143 @@
+"""
+Spatial Clustering Engine
+Grid-indexed replacement for the pairwise emergency cluster search: points are
+bucketed into cells at least one cluster radius wide, so each candidate center
+only measures distances to the points in its 3x3 cell neighborhood.
+"""
+import math
+import numpy as np
+from .analytics import from_epoch_us
+from .geo import KM_PER_DEGREE, distances_from
+
+
+def grid_shape(max_abs_lat, radius_km):
+    """
+    (cell height in degrees, longitude columns) of a grid whose cells are at
+    least radius_km wide for points up to max_abs_lat degrees from the equator
+    """
+    # Slightly larger than radius_km, since one degree is ~111.2 km
+    dlat = radius_km / KM_PER_DEGREE
+    widest_lat = max_abs_lat + dlat
+    if widest_lat >= 89.0:
+        return dlat, 1  # Near a pole every longitude can be in range
+    dlon = dlat / math.cos(math.radians(widest_lat))
+    return dlat, max(1, int(360 // dlon))
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid over a set of points. Cells are at least radius_km
+    wide everywhere in the data's latitude range, so every point within
+    radius_km of a point lies in that point's cell or one of its 8 neighbors.
+    """
+
+    def __init__(self, lats, lons, radius_km):
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.radius_km = radius_km
+
+        max_abs_lat = float(np.max(np.abs(self.lats))) if len(self.lats) else 0.0
+        self.dlat, self.n_cols = grid_shape(max_abs_lat, radius_km)
+        self.col_width = 360.0 / self.n_cols
+
+        self.rows = np.floor((self.lats + 90) / self.dlat).astype(np.int64)
+        self.cols = np.floor((self.lons + 180) / self.col_width).astype(np.int64) % self.n_cols
+        self.cell_ids = self.rows * self.n_cols + self.cols
+
+        # Bucket point indices by cell (indices stay in ascending order inside a cell)
+        order = np.argsort(self.cell_ids, kind='stable')
+        sorted_ids = self.cell_ids[order]
+        unique_ids, starts, counts = np.unique(sorted_ids, return_index=True, return_counts=True)
+        self.buckets = {int(cell): order[start:start + count]
+                        for cell, start, count in zip(unique_ids, starts, counts)}
+
+    def neighbor_cells(self, cell_id):
+        """The cell and its 8 neighbors (longitude wraps at the antimeridian)"""
+        row, col = divmod(cell_id, self.n_cols)
+        cols = {(col + dc) % self.n_cols for dc in (-1, 0, 1)}
+        return [r * self.n_cols + c for r in (row - 1, row, row + 1) for c in cols]
+
+    def candidates(self, i):
+        """Indices of all points in point i's 3x3 cell neighborhood"""
+        parts = [self.buckets[cell] for cell in self.neighbor_cells(int(self.cell_ids[i])) if cell in self.buckets]
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    def neighborhood_counts(self):
+        """Number of points in each point's 3x3 cell neighborhood"""
+        cell_sizes = {cell: len(indices) for cell, indices in self.buckets.items()}
+        per_cell = {cell: sum(cell_sizes.get(n, 0) for n in self.neighbor_cells(cell)) for cell in self.buckets}
+        return np.array([per_cell[int(cell)] for cell in self.cell_ids], dtype=np.int64)
+
+
+def cluster_points(lats, lons, radius_km, min_count):
+    """
+    Greedy radius clustering: visiting points in input order, each point not yet
+    clustered gathers every unclustered point within radius_km; groups of at
+    least min_count become clusters. Same result as the pairwise search.
+
+    Returns:
+        List of index arrays (ascending), one per cluster
+    """
+    n = len(lats)
+    if n < min_count or n == 0:
+        return []
+
+    index = GridIndex(lats, lons, radius_km)
+    unclustered = np.ones(n, dtype=bool)
+
+    # Points whose whole neighborhood holds fewer than min_count points can never seed a cluster
+    seeds = np.flatnonzero(index.neighborhood_counts() >= min_count)
+
+    clusters = []
+    for i in seeds:
+        if not unclustered[i]:
+            continue
+        candidates = index.candidates(i)
+        candidates = candidates[unclustered[candidates]]
+        if len(candidates) < min_count:
+            continue
+        distances = distances_from(index.lats[i], index.lons[i], index.lats[candidates], index.lons[candidates])
+        members = candidates[distances <= radius_km]
+        if len(members) >= min_count:
+            members = np.sort(members)
+            clusters.append(members)
+            unclustered[members] = False
+    return clusters
+
+
+def build_alert(category, points, radius_km):
+    """
+    Alert payload for one cluster.
+
+    Args:
+        category: Emergency category of the cluster
+        points: Cluster members as (id, lat, lon, processed_at_us, severity) tuples
+        radius_km: Cluster radius
+    """
+    # Calculate severity distribution
+    severity_counts = {}
+    for point in points:
+        severity = point[4] or 'UNKNOWN'
+        severity_counts[severity] = severity_counts.get(severity, 0) + 1
+
+    # Determine dominant severity
+    dominant_severity = max(severity_counts.items(), key=lambda x: x[1])[0] if severity_counts else 'UNKNOWN'
+
+    center_lat = sum(point[1] for point in points) / len(points)
+    center_lon = sum(point[2] for point in points) / len(points)
+    first_occurrence = from_epoch_us(min(point[3] for point in points))
+    last_occurrence = from_epoch_us(max(point[3] for point in points))
+
+    return {
+        'id': f"{category}_{center_lat:.4f}_{center_lon:.4f}",
+        'category': category,
+        'count': len(points),
+        'center_lat': center_lat,
+        'center_lon': center_lon,
+        'radius_km': radius_km,
+        'dominant_severity': dominant_severity,
+        'severity_distribution': severity_counts,
+        'first_occurrence': first_occurrence.isoformat(),
+        'last_occurrence': last_occurrence.isoformat(),
+        'time_span_hours': round((last_occurrence - first_occurrence).total_seconds() / 3600, 1)
+    }
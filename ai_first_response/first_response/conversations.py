@@ -0,0 +1,115 @@
+"""
+Conversation Statistics
+Keeps follow-up count, last activity time and latest severity/category on
+each message for itself and its direct follow-ups, so conversation lists and
+the conversation step of a new follow-up never count related rows.
+
+Every update is a single conditional UPDATE, safe under concurrent follow-ups.
+conversation_thread() loads a whole conversation in one recursive query.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import ReceivedMessage
+
+
+def add_follow_up(parent):
+    """
+    Count a new follow-up on its parent before the follow-up is created.
+
+    Returns:
+        The follow-up's conversation step (parent is step 1, its Nth follow-up step N + 1)
+    """
+    with transaction.atomic():
+        # The UPDATE locks the row, so the count read back is this follow-up's
+        ReceivedMessage.objects.filter(id=parent.id).update(
+            follow_up_count=F('follow_up_count') + 1, last_activity_at=timezone.now()
+        )
+        parent.follow_up_count, parent.last_activity_at = ReceivedMessage.objects.filter(
+            id=parent.id
+        ).values_list('follow_up_count', 'last_activity_at').get()
+    return parent.follow_up_count + 1
+
+
+def record_message(message):
+    """
+    Make a processed message the latest of its own conversation stats and of
+    its parent's, unless a newer message already is (out-of-order processing).
+    """
+    activity = message.received_at
+    ReceivedMessage.objects.filter(
+        Q(last_activity_at__isnull=True) | Q(last_activity_at__lte=activity),
+        id__in=[message.id] + ([message.parent_message_id] if message.parent_message_id else []),
+    ).update(
+        last_activity_at=activity,
+        latest_severity=message.ai_severity or '',
+        latest_category=message.ai_category or ''
+    )
+
+
+def backfill_conversation_stats(batch_size=5000):
+    """
+    Recompute the stats of every message from its follow-ups, one id range
+    per UPDATE statement. Returns the number of messages updated.
+    """
+    follow_ups = ReceivedMessage.objects.filter(parent_message=OuterRef('pk')).order_by()
+    follow_up_count = follow_ups.values('parent_message').annotate(total=Count('id')).values('total')
+    latest = follow_ups.order_by('-received_at', '-id')
+
+    bounds = ReceivedMessage.objects.order_by('id').values_list('id', flat=True)
+    first, last = bounds.first(), bounds.last()
+    if first is None:
+        return 0
+    updated = 0
+    for start in range(first, last + 1, batch_size):
+        updated += ReceivedMessage.objects.filter(id__gte=start, id__lt=start + batch_size).update(
+            follow_up_count=Coalesce(Subquery(follow_up_count[:1]), 0),
+            last_activity_at=Coalesce(Subquery(latest.values('received_at')[:1]), F('received_at')),
+            latest_severity=Coalesce(Subquery(latest.values('ai_severity')[:1]), F('ai_severity')),
+            latest_category=Coalesce(Subquery(latest.values('ai_category')[:1]), F('ai_category'))
+        )
+    return updated
+
+
+def conversation_thread(message_id):
+    """
+    Every stored message of the conversation containing a message, in the
+    order received, with one recursive query: up to the starter, then down
+    through all its follow-ups at any depth. Empty if the message is unknown.
+    """
+    table = ReceivedMessage._meta.db_table
+    return list(ReceivedMessage.objects.raw(f"""
+        WITH RECURSIVE ancestors(id, parent_message_id) AS (
+            SELECT id, parent_message_id FROM {table} WHERE id = %s
+            UNION
+            SELECT m.id, m.parent_message_id FROM {table} m JOIN ancestors a ON m.id = a.parent_message_id
+        ), thread(id) AS (
+            SELECT id FROM ancestors WHERE parent_message_id IS NULL
+            UNION
+            SELECT m.id FROM {table} m JOIN thread t ON m.parent_message_id = t.id
+        )
+        SELECT * FROM {table} WHERE id IN (SELECT id FROM thread) ORDER BY received_at, id
+    """, [message_id]))
+
+
+def conversation_threads(root_ids):
+    """{starter id: [its conversation in the order received]} for many starters, in one recursive query"""
+    if not root_ids:
+        return {}
+    table = ReceivedMessage._meta.db_table
+    placeholders = ', '.join(['%s'] * len(root_ids))
+    threads = {root_id: [] for root_id in root_ids}
+    for message in ReceivedMessage.objects.raw(f"""
+        WITH RECURSIVE thread(id, thread_root) AS (
+            SELECT id, id FROM {table} WHERE id IN ({placeholders})
+            UNION
+            SELECT m.id, t.thread_root FROM {table} m JOIN thread t ON m.parent_message_id = t.id
+        )
+        SELECT m.*, t.thread_root FROM thread t JOIN {table} m ON m.id = t.id
+    """, list(root_ids)):
+        threads[message.thread_root].append(message)
+    # Sorted here: an ORDER BY makes SQLite walk the whole table in received_at order
+    for messages in threads.values():
+        messages.sort(key=lambda m: (m.received_at, m.id))
+    return threads
@@ -1,19 +1,55 @@
 import requests
 import datetime
-import math
 import hashlib
 import json
+import logging
 import time
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from functools import wraps
+from django.conf import settings
+from .feed_parsers import BoundingBox, iter_text_chunks, iter_json_events, iter_rss_items, event_coordinates
+from .feed_events import FeedEvents, FeedEventsBuilder
+from .geo import within_radius
+
+logger = logging.getLogger(__name__)
+
+# Feed parsing limits
+GDACS_MAX_EVENTS = 5  # Events kept from the GDACS JSON feed
+GDACS_RSS_MAX_ITEMS = 10  # RSS items examined by the fallback
+GDACS_DISTANCE_BATCH = 256  # Parsed events per vectorized distance check
 
 # Simple in-memory cache for disaster feed data
 _cache = {}
 _cache_ttl = {}
 
+# Incremental cache accounting, maintained on every read and write so that
+# reading statistics never has to walk the cached entries
+_cache_lock = threading.RLock()
+_cache_meta = {}  # key -> {'func', 'ttl', 'bytes', 'written_at'}
+_cache_schedule = []  # Heap of (when, kind, key, written_at) expiry/eviction events
+_expired_keys = set()  # Stored entries older than their own TTL
+_func_stats = {}  # func name -> counters
+_EXPIRE, _EVICT = 0, 1
+
 # Cache TTL settings (in seconds)
 USGS_CACHE_TTL = 300  # 5 minutes for USGS earthquake data
 GDACS_CACHE_TTL = 900  # 15 minutes for GDACS disaster data
 
+# GDACS endpoints, in default preference order
+GDACS_ENDPOINTS = [
+    "https://www.gdacs.org/gdacsapi/api/events/geteventlist/MAP",
+    "https://www.gdacs.org/gdacsapi/api/events",
+    "https://www.gdacs.org/xml/gdacs.json"
+]
+GDACS_RSS_URL = "https://www.gdacs.org/xml/rss.xml"
+
+# Endpoint health / circuit breaker defaults (overridable in settings)
+GDACS_REQUEST_TIMEOUT = 10  # Total time budget (seconds) for one GDACS fetch
+GDACS_BREAKER_FAILURE_THRESHOLD = 3  # Consecutive failures before opening the circuit
+GDACS_BREAKER_COOLDOWN = 300  # Seconds an open circuit stays open before a retry
+
 def _get_cache_key(func_name, *args, **kwargs):
     """Generate a cache key based on function name and parameters"""
     key_data = {
@@ -34,10 +70,97 @@ def _get_from_cache(cache_key):
     """Get data from cache if valid"""
     return _cache.get(cache_key)
 
-def _set_cache(cache_key, data):
+def _estimate_size(data):
+    """Approximate size in bytes of a cached value (computed once, on write)"""
+    if isinstance(data, FeedEvents):
+        return data.nbytes
+    try:
+        return len(json.dumps(data))
+    except (TypeError, ValueError):
+        return 0
+
+def _stats_for(func_name, ttl=None):
+    stats = _func_stats.get(func_name)
+    if stats is None:
+        stats = _func_stats[func_name] = {
+            'hits': 0, 'misses': 0, 'evictions': 0, 'refreshes': 0,
+            'refresh_ms_total': 0.0, 'last_refresh_ms': None,
+            'entries': 0, 'expired_entries': 0, 'bytes': 0, 'ttl_seconds': ttl
+        }
+    if ttl is not None:
+        stats['ttl_seconds'] = ttl
+    return stats
+
+def _forget_entry(cache_key):
+    """Drop an entry's accounting (caller holds the lock)"""
+    meta = _cache_meta.pop(cache_key, None)
+    if meta is None:
+        return None
+    stats = _stats_for(meta['func'])
+    stats['entries'] -= 1
+    stats['bytes'] -= meta['bytes']
+    if cache_key in _expired_keys:
+        _expired_keys.discard(cache_key)
+        stats['expired_entries'] -= 1
+    return stats
+
+def _set_cache(cache_key, data, func_name='unknown', ttl=None, refresh_ms=None):
     """Store data in cache with timestamp"""
-    _cache[cache_key] = data
-    _cache_ttl[cache_key] = time.time()
+    now = time.time()
+    size = _estimate_size(data)
+    with _cache_lock:
+        # Apply due events first, so the schedule only holds the last two TTLs of writes
+        _advance_cache_schedule(now)
+        _forget_entry(cache_key)
+        _cache[cache_key] = data
+        _cache_ttl[cache_key] = now
+        _cache_meta[cache_key] = {'func': func_name, 'ttl': ttl, 'bytes': size, 'written_at': now}
+        
+        stats = _stats_for(func_name, ttl)
+        stats['entries'] += 1
+        stats['bytes'] += size
+        if refresh_ms is not None:
+            stats['refreshes'] += 1
+            stats['refresh_ms_total'] += refresh_ms
+            stats['last_refresh_ms'] = round(refresh_ms, 1)
+        
+        if ttl:
+            # Expired after its TTL, evicted once it has been stale for another TTL
+            heapq.heappush(_cache_schedule, (now + ttl, _EXPIRE, cache_key, now))
+            heapq.heappush(_cache_schedule, (now + ttl * 2, _EVICT, cache_key, now))
+
+def _record_lookup(func_name, hit):
+    with _cache_lock:
+        stats = _stats_for(func_name)
+        stats['hits' if hit else 'misses'] += 1
+
+def _advance_cache_schedule(now):
+    """
+    Apply due expiry/eviction events. Each event is handled once, so the
+    cost is amortized over the writes that scheduled it. Called on every
+    write as well as by the stats and cleanup calls.
+    
+    Returns:
+        Number of entries evicted
+    """
+    evicted = 0
+    with _cache_lock:
+        while _cache_schedule and _cache_schedule[0][0] <= now:
+            _, kind, key, written_at = heapq.heappop(_cache_schedule)
+            meta = _cache_meta.get(key)
+            if meta is None or meta['written_at'] != written_at:
+                continue  # Entry was refreshed or removed since
+            if kind == _EXPIRE:
+                if key not in _expired_keys:
+                    _expired_keys.add(key)
+                    _stats_for(meta['func'])['expired_entries'] += 1
+            else:
+                stats = _forget_entry(key)
+                stats['evictions'] += 1
+                _cache.pop(key, None)
+                _cache_ttl.pop(key, None)
+                evicted += 1
+    return evicted
 
 def cache_with_ttl(ttl_seconds):
     """Decorator to cache function results with TTL"""
@@ -50,26 +173,275 @@ def cache_with_ttl(ttl_seconds):
             if _is_cache_valid(cache_key, ttl_seconds):
                 cached_data = _get_from_cache(cache_key)
                 if cached_data is not None:
-                    print(f"Cache HIT for {func.__name__} - {cache_key[:8]}")
+                    logger.debug(f"Cache HIT for {func.__name__} - {cache_key[:8]}")
+                    _record_lookup(func.__name__, hit=True)
                     return cached_data
             
             # Cache miss - call the actual function
-            print(f"Cache MISS for {func.__name__} - {cache_key[:8]}")
+            logger.debug(f"Cache MISS for {func.__name__} - {cache_key[:8]}")
+            _record_lookup(func.__name__, hit=False)
+            started = time.perf_counter()
             result = func(*args, **kwargs)
+            refresh_ms = (time.perf_counter() - started) * 1000
             
             # Store in cache
-            _set_cache(cache_key, result)
+            _set_cache(cache_key, result, func.__name__, ttl_seconds, refresh_ms)
             return result
         return wrapper
     return decorator
 
 
-def _haversine_km(lat1, lon1, lat2, lon2):
-    R = 6371
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi, dl = math.radians(lat2-lat1), math.radians(lon2-lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dl/2)**2
-    return 2*R*math.asin(math.sqrt(a))
+class EndpointHealth:
+    """
+    Tracks the health of remote feed endpoints.
+    Remembers the last endpoint that answered successfully so it is tried first,
+    and opens a circuit breaker on endpoints that keep failing. Once the
+    cooldown is over a single caller gets to probe the endpoint (half-open);
+    the others keep skipping it until the probe succeeds or fails.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+        self._last_healthy = None
+
+    def _entry(self, url):
+        return self._state.setdefault(url, {
+            'consecutive_failures': 0,
+            'total_failures': 0,
+            'total_successes': 0,
+            'opened_at': None,
+            'probe_started': None,
+            'last_success': None,
+            'last_failure': None
+        })
+
+    def order(self, urls):
+        """
+        Return the endpoints worth trying, last healthy first. Open circuits
+        are skipped, except for the one caller that gets the half-open probe.
+        """
+        threshold = getattr(settings, 'GDACS_BREAKER_FAILURE_THRESHOLD', GDACS_BREAKER_FAILURE_THRESHOLD)
+        cooldown = getattr(settings, 'GDACS_BREAKER_COOLDOWN', GDACS_BREAKER_COOLDOWN)
+        probe_timeout = getattr(settings, 'GDACS_REQUEST_TIMEOUT', GDACS_REQUEST_TIMEOUT)
+        now = time.time()
+        
+        with self._lock:
+            available = []
+            for url in urls:
+                entry = self._entry(url)
+                if entry['consecutive_failures'] >= threshold and entry['opened_at'] is not None:
+                    if now - entry['opened_at'] < cooldown:
+                        continue  # Circuit open - skip this endpoint
+                    if entry['probe_started'] is not None and now - entry['probe_started'] < probe_timeout:
+                        continue  # Another caller is probing it
+                    entry['probe_started'] = now
+                available.append(url)
+            
+            # Try the last healthy endpoint first
+            if self._last_healthy in available:
+                available.remove(self._last_healthy)
+                available.insert(0, self._last_healthy)
+            return available
+
+    def record_success(self, url):
+        with self._lock:
+            entry = self._entry(url)
+            entry['consecutive_failures'] = 0
+            entry['total_successes'] += 1
+            entry['opened_at'] = None
+            entry['probe_started'] = None
+            entry['last_success'] = time.time()
+            self._last_healthy = url
+
+    def record_failure(self, url):
+        threshold = getattr(settings, 'GDACS_BREAKER_FAILURE_THRESHOLD', GDACS_BREAKER_FAILURE_THRESHOLD)
+        with self._lock:
+            entry = self._entry(url)
+            entry['consecutive_failures'] += 1
+            entry['total_failures'] += 1
+            entry['last_failure'] = time.time()
+            entry['probe_started'] = None
+            if entry['consecutive_failures'] >= threshold:
+                # (Re)open the circuit - a failed half-open probe restarts the cooldown
+                entry['opened_at'] = entry['last_failure']
+                logger.warning(f"Circuit breaker OPEN for {url} after {entry['consecutive_failures']} failures")
+            if self._last_healthy == url:
+                self._last_healthy = None
+
+    def release_probe(self, url):
+        """Give up a half-open probe whose outcome was never recorded"""
+        with self._lock:
+            self._entry(url)['probe_started'] = None
+
+    def snapshot(self):
+        """Get endpoint health for monitoring"""
+        threshold = getattr(settings, 'GDACS_BREAKER_FAILURE_THRESHOLD', GDACS_BREAKER_FAILURE_THRESHOLD)
+        with self._lock:
+            return {
+                'last_healthy': self._last_healthy,
+                'endpoints': {
+                    url: dict(entry, circuit_open=entry['consecutive_failures'] >= threshold)
+                    for url, entry in self._state.items()
+                }
+            }
+
+    def reset(self):
+        with self._lock:
+            self._state.clear()
+            self._last_healthy = None
+
+
+endpoint_health = EndpointHealth()
+
+
+def _get_endpoint(url, params, timeout, stream=False):
+    return requests.get(url, params=params, timeout=timeout, stream=stream)
+
+
+def _discard_when_done(future, url, release_probe):
+    """Close the response of a request whose result is no longer wanted, without recording it"""
+    def discard(done):
+        if release_probe:
+            endpoint_health.release_probe(url)
+        if not done.cancelled() and done.exception() is None:
+            done.result().close()
+    future.add_done_callback(discard)
+
+
+def fetch_first_success(requests_to_try, timeout=None, race=None, stream=False):
+    """
+    Fetch from the first endpoint that answers with HTTP 200.
+    
+    Requests run on worker threads so the whole fetch, not each socket read,
+    is bounded by `timeout`. Only the outcome of requests that answer before
+    a winner and within the budget is recorded in endpoint_health; every
+    response that is not returned is closed (late ones as they arrive).
+    
+    Args:
+        requests_to_try: List of (url, params) tuples in preference order
+        timeout: Total time budget in seconds for the whole fetch
+        race: Query all endpoints concurrently, first success wins
+        stream: Return before the body is downloaded (caller must close the response)
+        
+    Returns:
+        (url, response) of the successful endpoint, or (None, last_response)
+        where last_response is the last non-200 response (or None)
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'GDACS_REQUEST_TIMEOUT', GDACS_REQUEST_TIMEOUT)
+    if race is None:
+        race = getattr(settings, 'GDACS_RACE_ENDPOINTS', False)
+    
+    params_by_url = dict(requests_to_try)
+    urls = endpoint_health.order([url for url, _ in requests_to_try])
+    if not urls:
+        logger.warning("All feed endpoints have an open circuit breaker, skipping fetch")
+        return None, None
+    
+    deadline = time.monotonic() + timeout
+    pool = ThreadPoolExecutor(max_workers=len(urls) if race else 1)
+    pending = {}  # future -> url, requests not yet answered
+    last_resp = None
+    timed_out = False
+    
+    def submit(url):
+        pending[pool.submit(_get_endpoint, url, params_by_url[url], max(deadline - time.monotonic(), 0.001),
+                            stream)] = url
+    
+    def outcome(future):
+        """The response of an answered request, recorded in endpoint_health (None if it failed)"""
+        url = pending.pop(future)
+        try:
+            resp = future.result()
+        except Exception as e:
+            endpoint_health.record_failure(url)
+            logger.warning(f"Feed endpoint {url} error: {e}")
+            return None
+        if resp.status_code == 200:
+            endpoint_health.record_success(url)
+        else:
+            endpoint_health.record_failure(url)
+        return resp
+    
+    queue = list(urls)
+    try:
+        while queue or pending:
+            # Racing starts every request at once, otherwise one at a time
+            while queue and (race or not pending) and deadline > time.monotonic():
+                submit(queue.pop(0))
+            if not pending:
+                logger.warning(f"Feed fetch time budget of {timeout}s exhausted")
+                break
+            try:
+                future = next(as_completed(pending, timeout=max(deadline - time.monotonic(), 0)))
+            except FuturesTimeoutError:
+                logger.warning(f"Feed endpoints did not answer within {timeout}s")
+                timed_out = True
+                break
+            url = pending[future]
+            resp = outcome(future)
+            if resp is None:
+                continue
+            if resp.status_code == 200:
+                if last_resp is not None:
+                    last_resp.close()
+                return url, resp
+            if last_resp is not None:
+                last_resp.close()
+            last_resp = resp
+    finally:
+        # Requests past the budget failed; losers to a winner are not recorded at all.
+        # Either way stop waiting and close whatever they return.
+        for future, url in pending.items():
+            if timed_out:
+                endpoint_health.record_failure(url)
+            if future.cancel():
+                if not timed_out:
+                    endpoint_health.release_probe(url)
+            else:
+                _discard_when_done(future, url, release_probe=not timed_out)
+        for url in queue:
+            endpoint_health.release_probe(url)  # Never tried
+        pool.shutdown(wait=False)
+    
+    return None, last_resp
+
+
+def _take_within(batch, lat, lon, radius_km, matches, limit):
+    """Append the events of a (event, lat, lon) batch within the radius to matches, up to limit"""
+    if not batch:
+        return
+    indices, _ = within_radius(lat, lon, [b[1] for b in batch], [b[2] for b in batch], radius_km)
+    for i in indices[:limit - len(matches)]:
+        matches.append(batch[i][0])
+
+
+def gdacs_events_within(chunks, lat, lon, radius_km, limit=GDACS_MAX_EVENTS):
+    """
+    The first `limit` events of a GDACS JSON stream within radius_km of the
+    point, in feed order. Distances are checked in vectorized batches and the
+    stream is only read until `limit` events have matched.
+
+    Raises:
+        ValueError: If the document is not valid JSON
+    """
+    matches = []
+    batch = []
+    for event in iter_json_events(chunks):
+        if not isinstance(event, dict):
+            continue
+        event_lat, event_lon = event_coordinates(event)
+        if event_lat is None:
+            continue
+        batch.append((event, event_lat, event_lon))
+        if len(batch) >= GDACS_DISTANCE_BATCH:
+            _take_within(batch, lat, lon, radius_km, matches, limit)
+            batch = []
+            if len(matches) >= limit:
+                return matches  # Stop reading the rest of the payload
+    _take_within(batch, lat, lon, radius_km, matches, limit)
+    return matches
 
 
 @cache_with_ttl(USGS_CACHE_TTL)
@@ -90,298 +462,230 @@ def recent_quakes(lat, lon, radius_km=300, min_mag=3.0, minutes=60):
         
         # Check if response is successful
         if resp.status_code != 200:
-            print(f"USGS API returned status code: {resp.status_code}")
-            return []
+            logger.warning(f"USGS API returned status code: {resp.status_code}")
+            return FeedEvents()
         
-        # Try to parse JSON
+        # Try to parse JSON, keep only the normalized fields
         data = resp.json()
-        return data.get("features", [])
+        return FeedEvents.from_usgs_features(data.get("features", []))
     except requests.exceptions.RequestException as e:
-        print(f"USGS API request error: {e}")
-        return []
+        logger.warning(f"USGS API request error: {e}")
+        return FeedEvents()
     except ValueError as e:  # JSON decode error
-        print(f"USGS API JSON decode error: {e}")
-        return []
+        logger.warning(f"USGS API JSON decode error: {e}")
+        return FeedEvents()
     except Exception as e:
-        print(f"USGS API unexpected error: {e}")
-        return []
+        logger.error(f"USGS API unexpected error: {e}")
+        return FeedEvents()
 
 
 @cache_with_ttl(GDACS_CACHE_TTL)
 def gdacs_events(lat, lon, radius_km=50000):
+    """
+    Up to GDACS_MAX_EVENTS GDACS events within radius_km of the point.
+    The feed is scanned until that many events match, rather than only its
+    first GDACS_MAX_EVENTS events being checked, so nearby events further
+    down the feed are no longer missed.
+    """
+    # Healthy endpoints first, open circuits skipped, bounded by one time budget (body included)
+    deadline = _fetch_deadline()
     try:
         # Try the main GDACS API endpoint with geographic bounding box
-        # Calculate bounding box based on radius (rough approximation: 1 degree ≈ 111 km)
-        degree_radius = radius_km / 111.0
-        min_lat = lat - degree_radius
-        max_lat = lat + degree_radius
-        min_lon = lon - degree_radius
-        max_lon = lon + degree_radius
-        
-        # Try different GDACS API endpoints
-        urls_to_try = [
-            "https://www.gdacs.org/gdacsapi/api/events/geteventlist/MAP",
-            "https://www.gdacs.org/gdacsapi/api/events",
-            "https://www.gdacs.org/xml/gdacs.json"
-        ]
+        bbox = BoundingBox(lat, lon, radius_km)
         
         params = {
-            "bbox": f"{min_lon},{min_lat},{max_lon},{max_lat}",
+            "bbox": f"{bbox.min_lon},{bbox.min_lat},{bbox.max_lon},{bbox.max_lat}",
             "limit": 20,
             "alertlevel": "Red,Orange",
             "eventtype": "EQ,FL,TC,VO,WF"
         }
         
-        # Try each URL until one works
-        for url in urls_to_try:
-            try:
-                if "json" in url:
-                    # For JSON endpoint, don't send bbox parameter
-                    resp = requests.get(url, timeout=10)
-                else:
-                    resp = requests.get(url, params=params, timeout=10)
-                
-                if resp.status_code == 200:
-                    break
-            except:
-                continue
-        else:
-            # If none of the URLs worked, use the last response for error reporting
-            pass
+        # For JSON endpoint, don't send bbox parameter
+        requests_to_try = [(url, None if "json" in url else params) for url in GDACS_ENDPOINTS]
+        
+        url, resp = fetch_first_success(requests_to_try, timeout=deadline - time.monotonic(), stream=True)
+        
+        if resp is None:
+            logger.warning("GDACS API: no endpoint answered")
+            return FeedEvents()
         
-        # Debug information
-        print(f"GDACS API URL: {url}")
-        if "json" not in url:
-            print(f"GDACS API params: {params}")
-        print(f"GDACS API response status: {resp.status_code}")
+        logger.debug(f"GDACS API URL: {url or resp.url}, response status: {resp.status_code}")
         
         # Check if response is successful
         if resp.status_code != 200:
-            print(f"GDACS API returned status code: {resp.status_code}")
-            print(f"Response text: {resp.text[:300]}...")
+            logger.warning(f"GDACS API returned status code: {resp.status_code}")
+            resp.close()
             # Only try RSS if we got a client error (not server error)
             if 400 <= resp.status_code < 500:
-                return gdacs_events_from_rss(lat, lon, radius_km)
-            return []
+                return _gdacs_rss_events(lat, lon, radius_km, budget=deadline - time.monotonic())
+            return FeedEvents()
         
-        # Check if response has content
-        if not resp.text.strip():
-            print("GDACS API returned empty response")
-            return []
-        
-        print(f"GDACS API response length: {len(resp.text)}")
-        print(f"GDACS API response preview: {resp.text[:200]}...")
-        
-        # Try to parse JSON
-        data = resp.json()
+        # Parse events incrementally, filtering by distance in vectorized batches
+        try:
+            filtered_events = gdacs_events_within(_read_until(iter_text_chunks(resp), deadline),
+                                                  lat, lon, radius_km)
+        finally:
+            resp.close()
         
-        # Handle different response formats
-        events = []
-        if isinstance(data, dict):
-            events = data.get("features", data.get("results", []))
-        elif isinstance(data, list):
-            events = data
-        
-        # Filter events by distance
-        filtered_events = []
-        for event in events[:5]:  # Limit to first 5 events
-            try:
-                # Try different possible field names for coordinates
-                event_lat = None
-                event_lon = None
-                
-                if 'geometry' in event and 'coordinates' in event['geometry']:
-                    # GeoJSON format
-                    coords = event['geometry']['coordinates']
-                    event_lon, event_lat = float(coords[0]), float(coords[1])
-                elif 'latitude' in event and 'longitude' in event:
-                    # Direct lat/lon fields
-                    event_lat = float(event['latitude'])
-                    event_lon = float(event['longitude'])
-                elif 'lat' in event and 'lon' in event:
-                    # Alternative field names
-                    event_lat = float(event['lat'])
-                    event_lon = float(event['lon'])
-                
-                if event_lat is not None and event_lon is not None:
-                    distance = _haversine_km(lat, lon, event_lat, event_lon)
-                    if distance <= radius_km:
-                        filtered_events.append(event)
-                        
-            except (ValueError, TypeError, KeyError):
-                continue
-                
-        return filtered_events
+        logger.debug(f"GDACS API matched {len(filtered_events)} events")
+        return FeedEvents.from_gdacs_events(filtered_events)
         
     except requests.exceptions.RequestException as e:
-        print(f"GDACS API request error: {e}")
+        logger.warning(f"GDACS API request error: {e}")
         # Don't fall back to RSS if the API is down, just return empty
-        return []
+        return FeedEvents()
     except ValueError as e:  # JSON decode error
-        print(f"GDACS API JSON decode error: {e}")
-        print(f"Response content: {resp.text[:200]}...")
+        logger.warning(f"GDACS API JSON decode error: {e}")
         # Try RSS only if we got a response but couldn't parse it
-        return gdacs_events_from_rss(lat, lon, radius_km)
+        return _gdacs_rss_events(lat, lon, radius_km, budget=deadline - time.monotonic())
     except Exception as e:
-        print(f"GDACS API unexpected error: {e}")
-        return []
+        logger.error(f"GDACS API unexpected error: {e}")
+        return FeedEvents()
+
+
+def _fetch_deadline(budget=None):
+    """time.monotonic() by which a GDACS fetch, body included, must be done"""
+    if budget is None:
+        budget = getattr(settings, 'GDACS_REQUEST_TIMEOUT', GDACS_REQUEST_TIMEOUT)
+    return time.monotonic() + budget
+
+
+def _read_until(chunks, deadline):
+    """
+    The chunks of a streamed body, until the fetch deadline. Each socket read
+    is only bounded by the request's read timeout, so a slow body is cut off
+    here instead.
+
+    Raises:
+        requests.exceptions.Timeout: Once the deadline has passed
+    """
+    for chunk in chunks:
+        if time.monotonic() > deadline:
+            raise requests.exceptions.Timeout("Feed body not read within the time budget")
+        yield chunk
 
 
 @cache_with_ttl(GDACS_CACHE_TTL)
 def gdacs_events_from_rss(lat, lon, radius_km=50):
     """Fallback method using GDACS RSS feed"""
+    return _gdacs_rss_events(lat, lon, radius_km)
+
+
+def _gdacs_rss_events(lat, lon, radius_km=50, budget=None):
+    """Fetch and parse the GDACS RSS feed within the remaining time budget"""
     try:
         import xml.etree.ElementTree as ET
         
-        url = "https://www.gdacs.org/xml/rss.xml"
-        resp = requests.get(url, timeout=10)
+        if budget is not None and budget <= 0:
+            logger.warning("GDACS RSS fallback skipped: time budget exhausted")
+            return FeedEvents()
         
-        if resp.status_code != 200:
-            print(f"GDACS RSS feed returned status code: {resp.status_code}")
-            return []
+        deadline = _fetch_deadline(budget)
+        url, resp = fetch_first_success([(GDACS_RSS_URL, None)], timeout=deadline - time.monotonic(), stream=True)
         
-        # Remove BOM (Byte Order Mark) if present and clean the response
-        response_text = resp.text
-        if response_text.startswith('\ufeff'):
-            response_text = response_text[1:]  # Remove BOM
-        response_text = response_text.strip()
+        if resp is None:
+            logger.warning("GDACS RSS feed unavailable")
+            return FeedEvents()
         
-        # Check if response looks like XML
-        if not response_text.startswith('<?xml') and not response_text.startswith('<'):
-            print(f"GDACS RSS response doesn't look like XML: {response_text[:100]}...")
-            return []
+        if resp.status_code != 200:
+            logger.warning(f"GDACS RSS feed returned status code: {resp.status_code}")
+            resp.close()
+            return FeedEvents()
         
-        # Parse RSS XML with error handling
+        # Parse RSS items incrementally (BOM and leading whitespace are stripped)
+        items = []
         try:
-            root = ET.fromstring(response_text)
+            for item in iter_rss_items(_read_until(iter_text_chunks(resp), deadline), limit=GDACS_RSS_MAX_ITEMS):
+                items.append(item)
         except ET.ParseError as e:
-            print(f"GDACS RSS XML parse error: {e}")
-            print(f"Response content: {response_text[:200]}...")
-            return []
+            logger.warning(f"GDACS RSS XML parse error: {e}")
+        finally:
+            resp.close()
         
-        events = []
+        # One vectorized distance check over all located items
+        lats = [item['latitude'] if item['latitude'] is not None else float('nan') for item in items]
+        lons = [item['longitude'] if item['longitude'] is not None else float('nan') for item in items]
+        nearby = set(within_radius(lat, lon, lats, lons, radius_km)[0].tolist())
         
-        # Find all items in the RSS feed
-        for item in root.findall(".//item")[:10]:  # Limit to first 10 items
-            try:
-                title = item.find("title")
-                description = item.find("description")
-                link = item.find("link")
-                
-                if title is not None:
-                    title_text = title.text or ""
-                    desc_text = description.text if description is not None else ""
-                    link_text = link.text if link is not None else ""
-                    
-                    # Create basic event data
-                    event_data = {
-                        "title": title_text,
-                        "description": desc_text,
-                        "link": link_text,
-                        "source": "gdacs_rss"
-                    }
-                    
-                    # Try to extract coordinates from description or title
-                    import re
-                    
-                    # Look for coordinates in various formats
-                    coord_patterns = [
-                        r'(\d+\.?\d*)[°\s]*[NS][,\s]*(\d+\.?\d*)[°\s]*[EW]',
-                        r'lat[:\s]*(\d+\.?\d*)[,\s]*lon[:\s]*(\d+\.?\d*)',
-                        r'(\d+\.?\d*)[,\s]+(\d+\.?\d*)'
-                    ]
-                    
-                    event_lat = event_lon = None
-                    text_to_search = f"{title_text} {desc_text}"
-                    
-                    for pattern in coord_patterns:
-                        coord_match = re.search(pattern, text_to_search, re.IGNORECASE)
-                        if coord_match:
-                            try:
-                                event_lat = float(coord_match.group(1))
-                                event_lon = float(coord_match.group(2))
-                                # Basic validation of coordinates
-                                if -90 <= event_lat <= 90 and -180 <= event_lon <= 180:
-                                    break
-                                else:
-                                    event_lat = event_lon = None
-                            except ValueError:
-                                continue
-                    
-                    if event_lat is not None and event_lon is not None:
-                        distance = _haversine_km(lat, lon, event_lat, event_lon)
-                        if distance <= radius_km:
-                            event_data["latitude"] = event_lat
-                            event_data["longitude"] = event_lon
-                            event_data["distance_km"] = distance
-                            events.append(event_data)
-                    else:
-                        # Include events without coordinates if they might be relevant
-                        # This allows for manual review of potentially relevant events
-                        if len(events) < 3:  # Only include a few without coordinates
-                            events.append(event_data)
-                            
-            except Exception as e:
-                print(f"Error parsing RSS item: {e}")
-                continue
+        events = FeedEventsBuilder()
+        for i, item in enumerate(items):
+            event_lat, event_lon = item['latitude'], item['longitude']
+            
+            if event_lat is not None and event_lon is not None:
+                if i in nearby:
+                    events.add(lat=event_lat, lon=event_lon, place=item['title'], url=item['link'])
+            else:
+                # Include events without coordinates if they might be relevant
+                # This allows for manual review of potentially relevant events
+                if len(events) < 3:  # Only include a few without coordinates
+                    events.add(place=item['title'], url=item['link'])
         
-        return events
+        return events.build()
         
     except Exception as e:
-        print(f"GDACS RSS fallback error: {e}")
-        return []
+        logger.error(f"GDACS RSS fallback error: {e}")
+        return FeedEvents()
 
 
 def get_cache_stats():
-    """Get cache statistics for monitoring"""
-    current_time = time.time()
-    stats = {
-        'total_entries': len(_cache),
-        'valid_entries': 0,
-        'expired_entries': 0,
-        'cache_size_bytes': 0
-    }
+    """
+    Get cache statistics for monitoring.
+    Reads the incrementally maintained counters: the cost does not depend on
+    the number or size of cached entries.
+    """
+    _advance_cache_schedule(time.time())
     
-    for key in _cache:
-        if key in _cache_ttl:
-            # Check if entry is still valid (using max TTL)
-            age = current_time - _cache_ttl[key]
-            if age < max(USGS_CACHE_TTL, GDACS_CACHE_TTL):
-                stats['valid_entries'] += 1
-            else:
-                stats['expired_entries'] += 1
+    with _cache_lock:
+        functions = {}
+        for name, counters in _func_stats.items():
+            lookups = counters['hits'] + counters['misses']
+            functions[name] = {
+                'hits': counters['hits'],
+                'misses': counters['misses'],
+                'hit_ratio': round(counters['hits'] / lookups, 4) if lookups else 0,
+                'evictions': counters['evictions'],
+                'refreshes': counters['refreshes'],
+                'avg_refresh_ms': round(counters['refresh_ms_total'] / counters['refreshes'], 1) if counters['refreshes'] else 0,
+                'last_refresh_ms': counters['last_refresh_ms'],
+                'entries': counters['entries'],
+                'valid_entries': counters['entries'] - counters['expired_entries'],
+                'bytes': counters['bytes'],
+                'ttl_seconds': counters['ttl_seconds']
+            }
         
-        # Estimate size
-        try:
-            stats['cache_size_bytes'] += len(json.dumps(_cache[key]))
-        except:
-            pass
+        hits = sum(f['hits'] for f in functions.values())
+        misses = sum(f['misses'] for f in functions.values())
+        stats = {
+            'total_entries': len(_cache),
+            'valid_entries': len(_cache) - len(_expired_keys),
+            'expired_entries': len(_expired_keys),
+            'cache_size_bytes': sum(f['bytes'] for f in functions.values()),
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0,
+            'evictions': sum(f['evictions'] for f in functions.values()),
+            'functions': functions
+        }
     
     return stats
 
 def clear_cache():
     """Clear all cached data"""
-    global _cache, _cache_ttl
-    _cache.clear()
-    _cache_ttl.clear()
-    print("Disaster feeds cache cleared")
+    with _cache_lock:
+        for key in list(_cache_meta):
+            stats = _forget_entry(key)
+            stats['evictions'] += 1
+        _cache.clear()
+        _cache_ttl.clear()
+        _cache_schedule.clear()
+    logger.info("Disaster feeds cache cleared")
 
 def cleanup_expired_cache():
-    """Remove expired cache entries"""
-    current_time = time.time()
-    expired_keys = []
+    """Remove entries that have been expired for longer than their own TTL"""
+    evicted = _advance_cache_schedule(time.time())
     
-    for key in list(_cache_ttl.keys()):
-        # Use max TTL to determine if completely expired
-        if current_time - _cache_ttl[key] > max(USGS_CACHE_TTL, GDACS_CACHE_TTL) * 2:
-            expired_keys.append(key)
-    
-    for key in expired_keys:
-        _cache.pop(key, None)
-        _cache_ttl.pop(key, None)
-    
-    if expired_keys:
-        print(f"Cleaned up {len(expired_keys)} expired cache entries")
+    if evicted:
+        logger.info(f"Cleaned up {evicted} expired cache entries")
 
 
 def get_disaster_feed(lat, lon, radius_km=300):
@@ -392,24 +696,34 @@ def get_disaster_feed(lat, lon, radius_km=300):
     feed_data = []
     
     try:
+        # Active GDACS impact areas covering the location (one STRtree lookup)
+        from .impact_areas import impact_areas
+        inside = impact_areas.containing(lat, lon)
+        for event in inside[:3]:
+            feed_data.append(f"Inside impact area: {event['name'] or 'Unknown Event'} - "
+                             f"{event['alert_level'] or 'Unknown'} level")
+        inside_names = {event['name'] for event in inside}
+        
         # Get earthquake data
         quakes = recent_quakes(lat, lon, radius_km)
         if quakes:
             for quake in quakes[:3]:  # Limit to 3 most recent
-                props = quake.get('properties', {})
-                feed_data.append(f"Earthquake M{props.get('mag', 'unknown')} - {props.get('place', 'unknown location')}")
+                magnitude = quake.magnitude if quake.magnitude is not None else 'unknown'
+                feed_data.append(f"Earthquake M{magnitude} - {quake.place or 'unknown location'}")
         
         # Get GDACS data
         gdacs = gdacs_events(lat, lon, radius_km)
         if gdacs:
             for event in gdacs[:3]:  # Limit to 3 most recent
-                event_name = event.get('eventname', 'Unknown Event')
-                alert_level = event.get('alertlevel', 'Unknown')
+                event_name = event.place or 'Unknown Event'
+                if event_name in inside_names:
+                    continue  # Already reported with its impact area
+                alert_level = event.alert_level or 'Unknown'
                 feed_data.append(f"Disaster Alert: {event_name} - {alert_level} level")
         
         return "; ".join(feed_data) if feed_data else ""
         
     except Exception as e:
-        print(f"Error getting disaster feed: {str(e)}")
+        logger.error(f"Error getting disaster feed: {str(e)}")
         return ""
 
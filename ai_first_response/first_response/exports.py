@@ -0,0 +1,213 @@
+"""
+Message Export
+Streams ReceivedMessage rows filtered by time, category and severity as
+NDJSON, CSV or NumPy column files, for analysts who need more than the admin
+pages through. Rows are read with values_list().iterator(), a server-side
+cursor where the database has one, and written one chunk at a time, so memory
+stays constant however many rows are exported.
+
+Columns follow the analytics conventions (see analytics.MessageColumns):
+float64 with NaN for NULL, int64 with -1 for NULL, int64 microseconds since
+the epoch for timestamps and int32 codes into labels.json for text fields.
+The message text is left out of the column files.
+"""
+import csv
+import io
+import json
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from .analytics import NO_LABEL, NO_TIME, _field_kind, to_epoch_us
+from .models import ReceivedMessage
+
+FORMATS = ('ndjson', 'csv', 'npy')
+
+EXPORT_FIELDS = ('id', 'received_at', 'processed_at', 'message_type', 'language', 'message_text', 'ai_category',
+                 'ai_severity', 'user_latitude', 'user_longitude', 'response_time_ms', 'has_error',
+                 'parent_message_id', 'conversation_step', 'conversation_status')
+COLUMN_FIELDS = tuple(name for name in EXPORT_FIELDS if name != 'message_text')
+
+DTYPES = {'float': np.float64, 'int': np.int64, 'time': np.int64, 'label': np.int32}
+
+COPY_BLOCK = 1024 * 1024
+
+
+def parse_time(value):
+    """ISO 8601 date or datetime (UTC unless it carries an offset), or None"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def export_queryset(since=None, until=None, category=None, severity=None):
+    """Messages received in [since, until) with the category and severity, in id order"""
+    messages = ReceivedMessage.objects.all()
+    if since is not None:
+        messages = messages.filter(received_at__gte=since)
+    if until is not None:
+        messages = messages.filter(received_at__lt=until)
+    if category:
+        messages = messages.filter(ai_category=category)
+    if severity:
+        messages = messages.filter(ai_severity=severity.upper())
+    return messages.order_by('id')
+
+
+class ExportProgress:
+    """Rows written so far and the export's throughput"""
+
+    def __init__(self):
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self):
+        return f"{self.rows} rows in {self.elapsed:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+def _batches(queryset, fields, chunk_size, progress):
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            return
+        progress.rows += len(batch)
+        yield batch
+
+
+def ndjson_chunks(queryset, progress, chunk_size=2000):
+    """One JSON object per line, one bytes chunk per batch of rows"""
+    for batch in _batches(queryset, EXPORT_FIELDS, chunk_size, progress):
+        lines = [json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder, ensure_ascii=False)
+                 for row in batch]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def csv_chunks(queryset, progress, chunk_size=2000):
+    """CSV with a header row, one bytes chunk per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in _batches(queryset, EXPORT_FIELDS, chunk_size, progress):
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in batch
+        )
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def spool_columns(queryset, progress, chunk_size=2000):
+    """
+    Pack the column fields into raw arrays in temporary files, one per column.
+
+    Returns:
+        ({field: (dtype, temporary file)}, {field: label list}) for the rows written
+    """
+    kinds = {name: _field_kind(ReceivedMessage, name) for name in COLUMN_FIELDS}
+    files = {name: (np.dtype(DTYPES[kind]), tempfile.TemporaryFile()) for name, kind in kinds.items()}
+    codes = {name: {} for name, kind in kinds.items() if kind == 'label'}
+
+    for batch in _batches(queryset, COLUMN_FIELDS, chunk_size, progress):
+        for name, values in zip(COLUMN_FIELDS, zip(*batch)):
+            kind = kinds[name]
+            if kind == 'float':
+                column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            elif kind == 'int':
+                column = np.array([-1 if v is None else v for v in values], dtype=np.int64)
+            elif kind == 'time':
+                column = np.array([to_epoch_us(v) for v in values], dtype=np.int64)
+            else:
+                interned = codes[name]
+                column = np.array([NO_LABEL if v is None else interned.setdefault(v, len(interned)) for v in values],
+                                  dtype=np.int32)
+            files[name][1].write(column.tobytes())
+
+    for _, raw in files.values():
+        raw.seek(0)
+    return files, {name: list(interned) for name, interned in codes.items()}
+
+
+def npy_header(dtype, count):
+    """.npy header of a 1-D array of `count` items"""
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, {
+        'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (count,)
+    })
+    return header.getvalue()
+
+
+def _labels_json(labels):
+    return json.dumps({'labels': labels, 'no_label': NO_LABEL, 'no_time': int(NO_TIME)},
+                      ensure_ascii=False).encode('utf-8')
+
+
+def write_npy_directory(queryset, path, progress, chunk_size=2000):
+    """One <field>.npy per column plus labels.json in the directory `path`"""
+    files, labels = spool_columns(queryset, progress, chunk_size)
+    path.mkdir(parents=True, exist_ok=True)
+    for name, (dtype, raw) in files.items():
+        with raw, open(path / f"{name}.npy", 'wb') as out:
+            out.write(npy_header(dtype, progress.rows))
+            shutil.copyfileobj(raw, out, COPY_BLOCK)
+    (path / 'labels.json').write_bytes(_labels_json(labels))
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable stream collecting what zipfile writes until it is drained"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def npz_chunks(queryset, progress, chunk_size=2000):
+    """
+    The column files as an uncompressed .npz (a zip np.load reads), streamed.
+    The rows are spooled to disk first since each column is one zip member.
+    """
+    files, labels = spool_columns(queryset, progress, chunk_size)
+    sink = _ChunkSink()
+    modified = timezone.now().timetuple()[:6]
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, (dtype, raw) in files.items():
+            header = npy_header(dtype, progress.rows)
+            member = zipfile.ZipInfo(f"{name}.npy", date_time=modified)
+            member.file_size = len(header) + progress.rows * dtype.itemsize
+            with raw, archive.open(member, 'w', force_zip64=member.file_size > zipfile.ZIP64_LIMIT) as out:
+                out.write(header)
+                while block := raw.read(COPY_BLOCK):
+                    out.write(block)
+                    yield sink.drain()
+            yield sink.drain()
+        archive.writestr(zipfile.ZipInfo('labels.json', date_time=modified), _labels_json(labels))
+    yield sink.drain()
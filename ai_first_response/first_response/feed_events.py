@@ -0,0 +1,213 @@
+"""
+Normalized Disaster Feed Events
+Compact columnar storage for USGS/GDACS feed events: one NumPy structured array
+row per event plus an interned string table, instead of raw GeoJSON features.
+"""
+import sys
+import datetime
+import numpy as np
+from .feed_parsers import event_coordinates
+from .geo import within_radius
+
+EVENT_TYPES = ['', 'EQ', 'FL', 'TC', 'VO', 'WF', 'DR', 'TS']
+ALERT_LEVELS = ['', 'Green', 'Orange', 'Red']
+
+_EVENT_TYPE_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+_ALERT_LEVEL_CODES = {name.lower(): code for code, name in enumerate(ALERT_LEVELS)}
+
+EVENT_DTYPE = np.dtype([
+    ('lat', 'f8'),
+    ('lon', 'f8'),
+    ('time', 'f8'),        # Unix timestamp in seconds, NaN if unknown
+    ('magnitude', 'f4'),   # NaN if unknown
+    ('event_type', 'u1'),  # Index into EVENT_TYPES
+    ('alert_level', 'u1'), # Index into ALERT_LEVELS
+    ('place', 'i4'),       # Index into the string table, -1 if unknown
+    ('url', 'i4'),         # Index into the string table, -1 if unknown
+])
+
+
+class FeedEvent:
+    """Lightweight view of a single normalized feed event"""
+
+    __slots__ = ('lat', 'lon', 'time', 'magnitude', 'event_type', 'alert_level', 'place', 'url')
+
+    def __init__(self, lat, lon, time, magnitude, event_type, alert_level, place, url):
+        self.lat = lat
+        self.lon = lon
+        self.time = time
+        self.magnitude = magnitude
+        self.event_type = event_type
+        self.alert_level = alert_level
+        self.place = place
+        self.url = url
+
+    @property
+    def has_location(self):
+        return self.lat is not None and self.lon is not None
+
+    def to_feature(self):
+        """GeoJSON-style dict for API responses"""
+        return {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [self.lon, self.lat]} if self.has_location else None,
+            'properties': {
+                'mag': self.magnitude,
+                'place': self.place,
+                'eventname': self.place,
+                'time': int(self.time * 1000) if self.time is not None else None,
+                'eventtype': self.event_type or None,
+                'alertlevel': self.alert_level or None,
+                'url': self.url
+            }
+        }
+
+
+class FeedEvents:
+    """
+    Immutable collection of normalized feed events.
+    Behaves like a list of FeedEvent (len, slicing, iteration) so existing
+    callers keep working, while radius filtering runs over whole columns.
+    """
+
+    def __init__(self, rows=None, strings=None):
+        self.rows = rows if rows is not None else np.empty(0, dtype=EVENT_DTYPE)
+        self.strings = strings if strings is not None else []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return len(self.rows) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FeedEvents(self.rows[index], self.strings)
+        return self._event(self.rows[index])
+
+    def __iter__(self):
+        for row in self.rows:
+            yield self._event(row)
+
+    def _string(self, index):
+        return self.strings[index] if index >= 0 else None
+
+    def _event(self, row):
+        has_location = not (np.isnan(row['lat']) or np.isnan(row['lon']))
+        return FeedEvent(
+            lat=float(row['lat']) if has_location else None,
+            lon=float(row['lon']) if has_location else None,
+            time=None if np.isnan(row['time']) else float(row['time']),
+            magnitude=None if np.isnan(row['magnitude']) else round(float(row['magnitude']), 2),
+            event_type=EVENT_TYPES[row['event_type']],
+            alert_level=ALERT_LEVELS[row['alert_level']],
+            place=self._string(row['place']),
+            url=self._string(row['url'])
+        )
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by this collection"""
+        return self.rows.nbytes + sum(sys.getsizeof(s) for s in self.strings)
+
+    def within(self, lat, lon, radius_km):
+        """Events within radius_km of a point (events without a location are dropped)"""
+        indices, _ = within_radius(lat, lon, self.rows['lat'], self.rows['lon'], radius_km)
+        return FeedEvents(self.rows[indices], self.strings)
+
+    def to_features(self):
+        """Conversion layer for callers that expect GeoJSON feature dicts"""
+        return [event.to_feature() for event in self]
+
+    @classmethod
+    def from_usgs_features(cls, features):
+        builder = FeedEventsBuilder()
+        for feature in features:
+            props = feature.get('properties') or {}
+            coords = (feature.get('geometry') or {}).get('coordinates') or [None, None]
+            builder.add(
+                lat=coords[1], lon=coords[0],
+                time=props['time'] / 1000 if isinstance(props.get('time'), (int, float)) else None,
+                magnitude=props.get('mag'),
+                event_type='EQ',
+                place=props.get('place'),
+                url=props.get('url')
+            )
+        return builder.build()
+
+    @classmethod
+    def from_gdacs_events(cls, events):
+        builder = FeedEventsBuilder()
+        for event in events:
+            props = event.get('properties') or event
+            lat, lon = event_coordinates(event)
+            severity = props.get('severitydata')
+            url = props.get('url')
+            builder.add(
+                lat=lat, lon=lon,
+                time=_parse_iso_time(props.get('fromdate')),
+                magnitude=severity.get('severity') if isinstance(severity, dict) else None,
+                event_type=props.get('eventtype'),
+                alert_level=props.get('alertlevel'),
+                place=props.get('eventname') or props.get('name'),
+                url=url.get('report') if isinstance(url, dict) else url
+            )
+        return builder.build()
+
+
+class FeedEventsBuilder:
+    """Accumulates events and interns their strings before building a FeedEvents"""
+
+    def __init__(self):
+        self._rows = []
+        self._strings = []
+        self._string_index = {}
+
+    def _intern(self, value):
+        if not value:
+            return -1
+        value = sys.intern(str(value))
+        index = self._string_index.get(value)
+        if index is None:
+            index = len(self._strings)
+            self._strings.append(value)
+            self._string_index[value] = index
+        return index
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, lat=None, lon=None, time=None, magnitude=None, event_type=None,
+            alert_level=None, place=None, url=None):
+        self._rows.append((
+            _float_or_nan(lat),
+            _float_or_nan(lon),
+            _float_or_nan(time),
+            _float_or_nan(magnitude),
+            _EVENT_TYPE_CODES.get(str(event_type or '').upper(), 0),
+            _ALERT_LEVEL_CODES.get(str(alert_level or '').lower(), 0),
+            self._intern(place),
+            self._intern(url),
+        ))
+
+    def build(self):
+        return FeedEvents(np.array(self._rows, dtype=EVENT_DTYPE), self._strings)
+
+
+def _float_or_nan(value):
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _parse_iso_time(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
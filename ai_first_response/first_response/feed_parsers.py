@@ -0,0 +1,216 @@
+"""
+Disaster Feed Parsing Engine
+Incremental parsers for GDACS JSON and RSS payloads: events are decoded one at a
+time from the response stream, so callers can filter them as they arrive and
+stop reading as soon as enough events have been collected.
+"""
+import codecs
+import json
+import re
+import xml.etree.ElementTree as ET
+
+# Coordinate patterns used on RSS titles/descriptions (compiled once)
+COORD_PATTERNS = [
+    re.compile(r'(\d+\.?\d*)[°\s]*[NS][,\s]*(\d+\.?\d*)[°\s]*[EW]', re.IGNORECASE),
+    re.compile(r'lat[:\s]*(\d+\.?\d*)[,\s]*lon[:\s]*(\d+\.?\d*)', re.IGNORECASE),
+    re.compile(r'(\d+\.?\d*)[,\s]+(\d+\.?\d*)', re.IGNORECASE),
+]
+
+# Start of the event array in a GDACS/GeoJSON document
+_ARRAY_START = re.compile(r'"(?:features|results)"\s*:\s*\[')
+_WHITESPACE = re.compile(r'[\s,]*')
+
+_GEO_NS = '{http://www.w3.org/2003/01/geo/wgs84_pos#}'
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class BoundingBox:
+    """
+    Rough lat/lon box around a point (1 degree ≈ 111 km), for the bbox
+    parameter of the GDACS API. Too narrow in longitude away from the
+    equator to filter events with: use geo.within_radius for that.
+    """
+
+    __slots__ = ('min_lat', 'max_lat', 'min_lon', 'max_lon')
+
+    def __init__(self, lat, lon, radius_km):
+        degree_radius = radius_km / 111.0
+        self.min_lat = lat - degree_radius
+        self.max_lat = lat + degree_radius
+        self.min_lon = lon - degree_radius
+        self.max_lon = lon + degree_radius
+
+
+def iter_text_chunks(resp):
+    """Iterate a requests response body as decoded text chunks (BOM stripped)"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    for chunk in resp.iter_content(chunk_size=_CHUNK_SIZE):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_json_events(chunks):
+    """
+    Decode events one at a time from a GDACS JSON document.
+
+    Handles a top-level list or an object with a "features"/"results" array.
+    Only the current event is held in memory; the rest of the document is
+    never read if the caller stops iterating.
+
+    Raises:
+        ValueError: If the document is not valid JSON
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = None
+    chunks = iter(chunks)
+    exhausted = False
+
+    def read_more():
+        nonlocal buffer, exhausted
+        try:
+            buffer += next(chunks)
+            return True
+        except StopIteration:
+            exhausted = True
+            return False
+
+    # Locate the start of the event array
+    while pos is None:
+        stripped = buffer.lstrip()
+        if stripped.startswith('['):
+            pos = len(buffer) - len(stripped) + 1
+            break
+        match = _ARRAY_START.search(buffer)
+        if match:
+            pos = match.end()
+            break
+        if not read_more():
+            # No event array: validate the (small) document and yield nothing
+            if buffer.strip():
+                json.loads(buffer)
+            return
+
+    while True:
+        # Skip separators between events
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos >= len(buffer):
+            if not read_more():
+                raise ValueError("Unexpected end of JSON event array")
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            event, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if exhausted or not read_more():
+                raise
+            continue
+        yield event
+        # Drop consumed text so memory stays bounded by one event
+        buffer = buffer[end:]
+        pos = 0
+
+
+def event_coordinates(event):
+    """Extract (lat, lon) from a GDACS JSON event, or (None, None)"""
+    try:
+        geometry = event.get('geometry')
+        if geometry and 'coordinates' in geometry:
+            # GeoJSON format
+            coords = geometry['coordinates']
+            return float(coords[1]), float(coords[0])
+        if 'latitude' in event and 'longitude' in event:
+            # Direct lat/lon fields
+            return float(event['latitude']), float(event['longitude'])
+        if 'lat' in event and 'lon' in event:
+            # Alternative field names
+            return float(event['lat']), float(event['lon'])
+    except (ValueError, TypeError, KeyError, IndexError, AttributeError):
+        pass
+    return None, None
+
+
+def extract_coordinates(text):
+    """Find the first plausible lat/lon pair in free text"""
+    for pattern in COORD_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            try:
+                lat = float(match.group(1))
+                lon = float(match.group(2))
+            except ValueError:
+                continue
+            # Basic validation of coordinates
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                return lat, lon
+    return None, None
+
+
+class _ChunkReader:
+    """File-like adapter over text chunks, for ElementTree.iterparse"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._started = False
+
+    def read(self, size=-1):
+        for chunk in self._chunks:
+            if not self._started:
+                # Leading whitespace before the XML declaration is not allowed
+                chunk = chunk.lstrip()
+                if not chunk:
+                    continue
+                self._started = True
+            return chunk.encode('utf-8')
+        return b''
+
+
+def iter_rss_items(chunks, limit=10):
+    """
+    Parse RSS items incrementally, yielding dicts with title, description,
+    link and coordinates (from geo:lat/geo:long or the item text).
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the payload is not valid XML
+    """
+    count = 0
+    for _, elem in ET.iterparse(_ChunkReader(chunks), events=('end',)):
+        if elem.tag != 'item':
+            continue
+
+        title_text = elem.findtext('title')
+        if title_text is not None:
+            desc_text = elem.findtext('description') or ""
+            lat = _float_or_none(elem.findtext(f'{_GEO_NS}Point/{_GEO_NS}lat') or elem.findtext(f'{_GEO_NS}lat'))
+            lon = _float_or_none(elem.findtext(f'{_GEO_NS}Point/{_GEO_NS}long') or elem.findtext(f'{_GEO_NS}long'))
+            if lat is None or lon is None:
+                lat, lon = extract_coordinates(f"{title_text} {desc_text}")
+
+            yield {
+                'title': title_text,
+                'description': desc_text,
+                'link': elem.findtext('link') or "",
+                'latitude': lat,
+                'longitude': lon
+            }
+
+        # Free the parsed item before reading the next one
+        elem.clear()
+        count += 1
+        if count >= limit:
+            return
+
+
+def _float_or_none(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,131 @@
+"""
+Vectorized Geodesic Helpers
+Great-circle (haversine) distances over NumPy arrays, with a cheap bounding-box
+prefilter, shared by the disaster feeds, clustering and alerting code.
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.0  # Rough length of one degree of latitude
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km. Arguments may be scalars or arrays and
+    broadcast like any NumPy expression.
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dl = np.radians(lon2) - np.radians(lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def distances_from(lat, lon, lats, lons):
+    """One-to-many: distance from a point to every point in the arrays"""
+    return haversine_km(lat, lon, np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+
+
+def pairwise_distances(lats1, lons1, lats2=None, lons2=None):
+    """Many-to-many: (len(lats1), len(lats2)) distance matrix (self-distances if second set omitted)"""
+    lats1 = np.asarray(lats1, dtype=float)
+    lons1 = np.asarray(lons1, dtype=float)
+    if lats2 is None:
+        lats2, lons2 = lats1, lons1
+    else:
+        lats2 = np.asarray(lats2, dtype=float)
+        lons2 = np.asarray(lons2, dtype=float)
+    return haversine_km(lats1[:, None], lons1[:, None], lats2[None, :], lons2[None, :])
+
+
+def bbox_mask(lat, lon, lats, lons, radius_km):
+    """
+    Cheap prefilter: True for points inside the lat/lon box that encloses the
+    radius around (lat, lon). Never excludes a point that is within the radius.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    dlat = radius_km / KM_PER_DEGREE
+    if abs(lat) + dlat >= 90:
+        # The box reaches a pole: every longitude can be within range
+        return np.abs(lats - lat) <= dlat
+    dlon = dlat / np.cos(np.radians(abs(lat) + dlat))
+    if dlon >= 180:
+        return np.abs(lats - lat) <= dlat
+    lon_diff = np.abs((lons - lon + 180) % 360 - 180)  # Wraps across the antimeridian
+    return (np.abs(lats - lat) <= dlat) & (lon_diff <= dlon)
+
+
+def within_radius(lat, lon, lats, lons, radius_km):
+    """
+    Indices (in input order) of the points within radius_km of (lat, lon),
+    with their distances. NaN coordinates never match.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    candidates = np.flatnonzero(bbox_mask(lat, lon, lats, lons, radius_km))
+    distances = distances_from(lat, lon, lats[candidates], lons[candidates])
+    keep = distances <= radius_km
+    return candidates[keep], distances[keep]
+
+
+class GeoGrid:
+    """
+    Fixed global grid with cells at least cell_km wide. Rows are bands of
+    latitude; each row has as many longitude columns as fit at its widest
+    latitude, so two points within cell_km of each other are always in the
+    same or neighboring cells.
+    """
+
+    def __init__(self, cell_km):
+        self.cell_km = cell_km
+        self.dlat = cell_km / KM_PER_DEGREE
+        self.n_rows = max(1, int(np.ceil(180 / self.dlat)))
+        self._cols = {}
+
+    def columns(self, row):
+        """Number of longitude columns in a row"""
+        n = self._cols.get(row)
+        if n is None:
+            lat_lo = -90 + row * self.dlat
+            widest = max(abs(lat_lo), abs(lat_lo + self.dlat)) + self.dlat
+            if widest >= 89:
+                n = 1  # Near a pole every longitude can be in range
+            else:
+                n = max(1, int(360 // (self.dlat / np.cos(np.radians(widest)))))
+            self._cols[row] = n
+        return n
+
+    def cell(self, lat, lon):
+        """(row, col) of the cell containing a point"""
+        row = min(max(int((lat + 90) // self.dlat), 0), self.n_rows - 1)
+        n = self.columns(row)
+        col = int(((lon + 180) % 360) // (360 / n)) % n
+        return row, col
+
+    def neighbors(self, cell):
+        """The cell itself and every cell that can hold a point within cell_km of it"""
+        row, col = cell
+        width = 360 / self.columns(row)
+        lo, hi = col * width, (col + 1) * width
+        result = set()
+        for r in (row - 1, row, row + 1):
+            if r < 0 or r >= self.n_rows:
+                continue
+            n = self.columns(r)
+            row_width = 360 / n
+            pad = max(width, row_width)
+            if n <= 3 or (hi - lo) + 2 * pad >= 360:
+                result.update((r, c) for c in range(n))
+                continue
+            first = int(np.ceil((lo - pad) / row_width)) - 1
+            last = int((hi + pad) // row_width)
+            result.update((r, c % n) for c in range(first, last + 1))
+        return result
+
+    def center(self, cell):
+        """(lat, lon) of a cell's center"""
+        row, col = cell
+        lat = min(-90 + (row + 0.5) * self.dlat, 90.0)
+        width = 360 / self.columns(row)
+        return lat, -180 + (col + 0.5) * width
@@ -0,0 +1,244 @@
+"""
+Sliding-Window Hotspot Detection
+Near-real-time surge detection: every (category, grid cell) pair keeps a ring
+buffer of per-minute report counts and an exponentially weighted baseline of
+its per-minute rate. A cell is flagged as soon as the reports in its recent
+window stand out from that baseline (z-score), instead of waiting for a
+fixed number of reports in the alert clustering window.
+
+Recording a message is O(1): one ring buffer slot and one running sum change.
+The first load replays enough history to seed the baselines, so a restarted
+process does not mistake ordinary traffic for a surge.
+"""
+import math
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .alerts import affects_alerts
+from .analytics import from_epoch_us, load_columns, to_epoch_us
+from .geo import GeoGrid
+from .models import ReceivedMessage
+
+US_PER_MINUTE = 60 * 1000 * 1000
+
+# Completed minutes folded into the baseline one by one; longer gaps decay in closed form
+MAX_BASELINE_STEPS = 60
+
+# Re-read this much before the sync watermark, for rows committed out of order
+SYNC_OVERLAP = timedelta(seconds=60)
+
+# Share of a baseline's weight covered by the history replayed on the first load
+BASELINE_SEED_WEIGHT = 0.99
+
+
+def hotspot_settings():
+    """(cell_km, window_minutes, min_count, z_threshold, ewma_alpha) from settings"""
+    return (
+        getattr(settings, 'HOTSPOT_CELL_KM', 10),
+        getattr(settings, 'HOTSPOT_WINDOW_MINUTES', 5),
+        getattr(settings, 'HOTSPOT_MIN_COUNT', 3),
+        getattr(settings, 'HOTSPOT_Z_THRESHOLD', 3.0),
+        getattr(settings, 'HOTSPOT_EWMA_ALPHA', 0.05),
+    )
+
+
+def baseline_minutes(alpha):
+    """Minutes of history that carry BASELINE_SEED_WEIGHT of an EWMA baseline (90 for alpha 0.05)"""
+    if not 0 < alpha < 1:
+        return 1
+    return math.ceil(math.log(1 - BASELINE_SEED_WEIGHT) / math.log(1 - alpha))
+
+
+class CellRate:
+    """Per-minute report counts of one (category, cell) and the baseline rate"""
+
+    __slots__ = ('counts', 'head', 'total', 'mean', 'var', 'last_report')
+
+    def __init__(self, window_minutes, minute):
+        self.counts = [0] * window_minutes  # Ring buffer indexed by minute % window
+        self.head = minute  # Newest minute in the ring
+        self.total = 0  # Reports in the ring
+        self.mean = 0.0  # EWMA of completed per-minute counts
+        self.var = 0.0  # EW variance of completed per-minute counts
+        self.last_report = 0  # processed_at of the newest report, epoch microseconds
+
+    def advance(self, minute, alpha):
+        """Move the ring forward to `minute`, folding completed minutes into the baseline"""
+        gap = minute - self.head
+        if gap <= 0:
+            return
+        size = len(self.counts)
+
+        # The head minute is complete, and so is every empty minute after it
+        self._observe(self.counts[self.head % size], alpha)
+        empty = gap - 1
+        for _ in range(min(empty, MAX_BASELINE_STEPS)):
+            self._observe(0, alpha)
+        if empty > MAX_BASELINE_STEPS:
+            decay = (1 - alpha) ** (empty - MAX_BASELINE_STEPS)
+            self.mean *= decay
+            self.var *= decay
+
+        for m in range(self.head + 1, self.head + 1 + min(gap, size)):
+            self.total -= self.counts[m % size]
+            self.counts[m % size] = 0
+        self.head = minute
+
+    def _observe(self, count, alpha):
+        diff = count - self.mean
+        increment = alpha * diff
+        self.mean += increment
+        self.var = (1 - alpha) * (self.var + diff * increment)
+
+    def add(self, minute, alpha):
+        """Count one report; returns False if it is older than the ring"""
+        if minute > self.head:
+            self.advance(minute, alpha)
+        elif self.head - minute >= len(self.counts):
+            return False
+        self.counts[minute % len(self.counts)] += 1
+        self.total += 1
+        return True
+
+    def z_score(self):
+        """How far the window's reports are above the baseline, in standard deviations"""
+        size = len(self.counts)
+        expected = size * self.mean
+        # Poisson floor on the variance, plus one so a cell with no history needs a real surge
+        variance = size * max(self.var, self.mean) + 1.0
+        return (self.total - expected) / math.sqrt(variance)
+
+
+class HotspotDetector:
+    """
+    Process-wide surge detector fed by record_message(). snapshot() catches
+    up with messages processed by other workers and re-checks flagged cells,
+    so a surge that calms down drops out of the feed.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset(None)
+
+    def _reset(self, config):
+        self._config = config
+        self._grid = GeoGrid(config[0]) if config else None
+        self._cells = {}  # (category, cell) -> CellRate
+        self._flagged = {}  # (category, cell) -> flagged since, epoch microseconds
+        self._seen = {}  # message_id -> minute, for de-duplicating the sync
+        self._watermark = None  # Latest processed_at seen, epoch microseconds
+        self._pruned_minute = 0
+        self._loaded = False
+
+    def _ensure_config(self):
+        config = hotspot_settings()
+        if config != self._config:
+            self._reset(config)
+
+    def record_message(self, message):
+        """Count a processed message in its cell's current minute"""
+        with self._lock:
+            self._ensure_config()
+            if not self._loaded or not affects_alerts(message):
+                return  # The first snapshot loads the window and history anyway
+            self._add(message.id, message.ai_category, message.user_latitude,
+                      message.user_longitude, to_epoch_us(message.processed_at))
+
+    def _add(self, message_id, category, lat, lon, processed_at):
+        if message_id in self._seen:
+            return
+        _, window_minutes, min_count, z_threshold, alpha = self._config
+        minute = processed_at // US_PER_MINUTE
+        key = (category, self._grid.cell(lat, lon))
+        rate = self._cells.get(key)
+        if rate is None:
+            rate = self._cells[key] = CellRate(window_minutes, minute)
+        if not rate.add(minute, alpha):
+            return
+        self._seen[message_id] = minute
+        rate.last_report = max(rate.last_report, processed_at)
+        if self._watermark is None or processed_at > self._watermark:
+            self._watermark = processed_at
+
+        if key not in self._flagged and rate.total >= min_count and rate.z_score() >= z_threshold:
+            self._flagged[key] = processed_at
+
+    def _sync(self, now_minute):
+        """
+        Load the recent window and enough history to seed the baselines on
+        first use, then only rows processed since the watermark.
+        """
+        _, window_minutes, _, _, alpha = self._config
+        if self._loaded:
+            since = from_epoch_us((now_minute - window_minutes) * US_PER_MINUTE)
+            if self._watermark is not None:
+                since = max(since, from_epoch_us(self._watermark) - SYNC_OVERLAP)
+        else:
+            since = from_epoch_us((now_minute - window_minutes - baseline_minutes(alpha)) * US_PER_MINUTE)
+
+        queryset = ReceivedMessage.objects.filter(
+            processed_at__gte=since,
+            user_latitude__isnull=False,
+            user_longitude__isnull=False,
+            ai_category__isnull=False
+        ).exclude(ai_category='Unknown').order_by('processed_at')
+        fields = ['id', 'ai_category', 'user_latitude', 'user_longitude', 'processed_at']
+        columns = load_columns(queryset, fields, consumer='hotspots')
+        for row in zip(*(columns.values(name) for name in fields)):
+            self._add(*row)
+        self._loaded = True
+
+    def _prune(self, now_minute):
+        """Drop idle cells and de-duplication entries, at most once a minute"""
+        if now_minute == self._pruned_minute:
+            return
+        self._pruned_minute = now_minute
+        alpha = self._config[4]
+        horizon = now_minute - self._config[1] - 1  # The sync never reads further back
+        self._seen = {mid: minute for mid, minute in self._seen.items() if minute >= horizon}
+        idle = [key for key, rate in self._cells.items()
+                if rate.head < horizon and key not in self._flagged
+                and rate.mean * (1 - alpha) ** (now_minute - rate.head) < 0.01]
+        for key in idle:
+            del self._cells[key]
+
+    def snapshot(self):
+        """Currently surging cells, strongest first"""
+        with self._lock:
+            self._ensure_config()
+            cell_km, window_minutes, min_count, z_threshold, alpha = self._config
+            now_minute = to_epoch_us(timezone.now()) // US_PER_MINUTE
+            self._sync(now_minute)
+
+            hotspots = []
+            for key, flagged_at in list(self._flagged.items()):
+                rate = self._cells[key]
+                rate.advance(now_minute, alpha)
+                z_score = rate.z_score()
+                if rate.total < min_count or z_score < z_threshold:
+                    del self._flagged[key]
+                    continue
+
+                category, cell = key
+                center_lat, center_lon = self._grid.center(cell)
+                hotspots.append({
+                    'id': f"{category}_{cell[0]}_{cell[1]}",
+                    'category': category,
+                    'center_lat': center_lat,
+                    'center_lon': center_lon,
+                    'cell_km': cell_km,
+                    'count': rate.total,
+                    'window_minutes': window_minutes,
+                    'baseline_per_minute': round(rate.mean, 3),
+                    'z_score': round(z_score, 2),
+                    'flagged_at': from_epoch_us(flagged_at).isoformat(),
+                    'last_report': from_epoch_us(rate.last_report).isoformat()
+                })
+
+            self._prune(now_minute)
+            hotspots.sort(key=lambda x: x['z_score'], reverse=True)
+            return hotspots
+
+
+hotspot_detector = HotspotDetector()
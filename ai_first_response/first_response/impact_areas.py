@@ -0,0 +1,296 @@
+"""
+GDACS Impact Areas
+Floods, cyclones and wildfires cover irregular areas that a single event point
+and a radius misrepresent. GDACS publishes each event's geometry; the active
+events' polygons are kept in a shapely STRtree so "is this location inside an
+active impact area" is one indexed point-in-polygon lookup.
+
+The index is immutable once built: a refresh builds a new one off the request
+path and swaps it in, so lookups never wait on the network.
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+import numpy as np
+import requests
+import shapely
+from shapely.geometry import Point, shape
+from django.conf import settings
+from .disaster_feeds import GDACS_ENDPOINTS, fetch_first_success
+from .feed_parsers import iter_json_events, iter_text_chunks
+
+logger = logging.getLogger(__name__)
+
+GDACS_GEOMETRY_URL = "https://www.gdacs.org/gdacsapi/api/polygons/getgeometry"
+
+# Defaults, overridable in settings
+GDACS_IMPACT_REFRESH_SECONDS = 900  # Same cadence as the GDACS feed cache
+GDACS_IMPACT_MAX_EVENTS = 100  # Active events whose geometry is fetched per refresh
+GDACS_IMPACT_FETCH_WORKERS = 8  # Concurrent geometry downloads
+
+_POLYGONAL = ('Polygon', 'MultiPolygon')
+
+
+def impact_event(props):
+    """Summary of a GDACS event from its feature properties"""
+    url = props.get('url')
+    return {
+        'event_id': props.get('eventid'),
+        'episode_id': props.get('episodeid'),
+        'event_type': props.get('eventtype'),
+        'name': props.get('eventname') or props.get('name') or props.get('description'),
+        'alert_level': props.get('alertlevel'),
+        'from_date': props.get('fromdate'),
+        'to_date': props.get('todate'),
+        'url': url.get('report') if isinstance(url, dict) else url
+    }
+
+
+def event_polygons(features):
+    """
+    Polygonal parts of GeoJSON features (event points and tracks are dropped).
+    Invalid rings are repaired, and shapes drawn past ±180° longitude get a
+    copy shifted by 360° so points on the other side of the antimeridian match.
+    """
+    parts = []
+    for feature in features:
+        geometry = feature.get('geometry') if isinstance(feature, dict) else None
+        if not geometry or geometry.get('type') not in _POLYGONAL + ('GeometryCollection',):
+            continue
+        try:
+            geom = shape(geometry)
+        except (ValueError, TypeError, AttributeError, KeyError, shapely.errors.GEOSException):
+            continue
+        if not geom.is_valid:
+            geom = shapely.make_valid(geom)
+        for part in shapely.get_parts(geom):
+            if part.geom_type not in _POLYGONAL or part.is_empty:
+                continue
+            parts.append(part)
+            min_x, _, max_x, _ = part.bounds
+            if max_x > 180:
+                parts.append(shapely.transform(part, lambda xy: xy - [360.0, 0.0]))
+            if min_x < -180:
+                parts.append(shapely.transform(part, lambda xy: xy + [360.0, 0.0]))
+    return parts
+
+
+class ImpactAreas:
+    """Immutable STRtree over the polygons of a set of events"""
+
+    def __init__(self, events=(), built_at=None):
+        """
+        Args:
+            events: Iterable of (event summary dict, list of GeoJSON features)
+            built_at: time.time() of the data, for staleness reporting
+        """
+        started = time.perf_counter()
+        self.events = []
+        polygons, owners = [], []
+        for event, features in events:
+            parts = event_polygons(features)
+            if not parts:
+                continue
+            polygons.extend(parts)
+            owners.extend([len(self.events)] * len(parts))
+            self.events.append(event)
+
+        self.polygons = np.array(polygons, dtype=object)
+        self.owners = np.array(owners, dtype=np.int64)
+        self.tree = shapely.STRtree(self.polygons) if polygons else None
+        self.vertices = int(shapely.get_num_coordinates(self.polygons).sum()) if polygons else 0
+        self.built_at = built_at if built_at is not None else time.time()
+        self.build_ms = (time.perf_counter() - started) * 1000
+
+    def __len__(self):
+        return len(self.events)
+
+    def containing(self, lat, lon):
+        """Events whose impact area covers the point"""
+        if self.tree is None or lat is None or lon is None:
+            return []
+        hits = self.tree.query(Point(lon, lat), predicate='intersects')
+        return [self.events[i] for i in np.unique(self.owners[hits]).tolist()]
+
+    def stats(self):
+        return {
+            'events': len(self.events),
+            'polygons': len(self.polygons),
+            'vertices': self.vertices,
+            'build_ms': round(self.build_ms, 1),
+            'age_seconds': round(time.time() - self.built_at, 1)
+        }
+
+
+def events_from_geometries(features):
+    """Group getgeometry-style features (properties carry the event ids) by event"""
+    grouped = {}
+    for feature in features:
+        props = feature.get('properties') or {}
+        key = (props.get('eventtype'), props.get('eventid'))
+        if key not in grouped:
+            grouped[key] = (impact_event(props), [])
+        grouped[key][1].append(feature)
+    return list(grouped.values())
+
+
+def _geometry_url(props):
+    url = props.get('url')
+    if isinstance(url, dict) and url.get('geometry'):
+        return url['geometry'], None
+    if props.get('eventtype') and props.get('eventid') is not None:
+        return GDACS_GEOMETRY_URL, {
+            'eventtype': props['eventtype'],
+            'eventid': props['eventid'],
+            'episodeid': props.get('episodeid')
+        }
+    return None, None
+
+
+def _fetch_geometry(url, params, timeout):
+    resp = requests.get(url, params=params, timeout=timeout)
+    if resp.status_code != 200:
+        raise requests.exceptions.HTTPError(f"status {resp.status_code}")
+    data = resp.json()
+    if isinstance(data, dict) and data.get('type') == 'FeatureCollection':
+        return data.get('features') or []
+    if isinstance(data, dict) and 'geometry' in data:
+        return [data]
+    return []
+
+
+def fetch_impact_events(timeout=None, max_events=None):
+    """
+    Active GDACS events with their geometry features, fetched within one time
+    budget: the event list first, then the geometries concurrently. Events
+    whose geometry does not arrive in time are left out of this refresh.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'GDACS_REQUEST_TIMEOUT', 10)
+    if max_events is None:
+        max_events = getattr(settings, 'GDACS_IMPACT_MAX_EVENTS', GDACS_IMPACT_MAX_EVENTS)
+    deadline = time.monotonic() + timeout
+
+    params = {"limit": max_events, "alertlevel": "Red,Orange", "eventtype": "EQ,FL,TC,VO,WF,DR"}
+    url, resp = fetch_first_success([(url, None if "json" in url else params) for url in GDACS_ENDPOINTS],
+                                    timeout=timeout, stream=True)
+    if url is None:
+        if resp is not None:
+            resp.close()
+        logger.warning("GDACS impact areas: no endpoint answered")
+        return None
+
+    events, pending = [], []
+    try:
+        for feature in iter_json_events(iter_text_chunks(resp)):
+            if not isinstance(feature, dict):
+                continue
+            props = feature.get('properties') or feature
+            event = impact_event(props)
+            if (feature.get('geometry') or {}).get('type') in _POLYGONAL:
+                events.append((event, [feature]))  # Geometry already inline
+            else:
+                geometry_url, geometry_params = _geometry_url(props)
+                if geometry_url:
+                    pending.append((event, geometry_url, geometry_params))
+            if len(events) + len(pending) >= max_events:
+                break
+    finally:
+        resp.close()
+
+    if pending:
+        workers = getattr(settings, 'GDACS_IMPACT_FETCH_WORKERS', GDACS_IMPACT_FETCH_WORKERS)
+        pool = ThreadPoolExecutor(max_workers=workers)
+        futures = {
+            pool.submit(_fetch_geometry, geometry_url, geometry_params, max(deadline - time.monotonic(), 0.1)): event
+            for event, geometry_url, geometry_params in pending
+        }
+        try:
+            for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0)):
+                try:
+                    events.append((futures[future], future.result()))
+                except Exception as e:
+                    logger.warning(f"GDACS geometry for event {futures[future]['event_id']} failed: {e}")
+        except FuturesTimeoutError:
+            missed = sum(1 for future in futures if not future.done())
+            logger.warning(f"GDACS impact areas: {missed} geometries missed the {timeout}s budget")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    return events
+
+
+class ImpactAreaIndex:
+    """
+    Process-wide holder of the current ImpactAreas. A lookup on a stale index
+    starts one background refresh and answers from the index it already has.
+    """
+
+    def __init__(self, fetch=fetch_impact_events):
+        self._fetch = fetch
+        self._areas = ImpactAreas(built_at=0)
+        self._refresh_lock = threading.Lock()
+        self._refreshing = None
+        self._next_refresh = 0.0  # time.monotonic() after which the areas are stale
+        self._last_error = None
+
+    def is_stale(self):
+        return time.monotonic() >= self._next_refresh
+
+    def refresh(self):
+        """Fetch and index the active events now; returns the new ImpactAreas (or the old on failure)"""
+        try:
+            events = self._fetch()
+        except Exception as e:
+            events = None
+            logger.error(f"GDACS impact areas refresh failed: {e}")
+        refresh_seconds = getattr(settings, 'GDACS_IMPACT_REFRESH_SECONDS', GDACS_IMPACT_REFRESH_SECONDS)
+        if events is None:
+            # Keep the previous areas and retry after a short cooldown, not on every lookup
+            self._last_error = time.time()
+            self._next_refresh = time.monotonic() + min(refresh_seconds, 60)
+            return self._areas
+        self._areas = ImpactAreas(events)
+        self._next_refresh = time.monotonic() + refresh_seconds
+        logger.info(f"Indexed {len(self._areas)} GDACS impact areas in {self._areas.build_ms:.1f} ms")
+        return self._areas
+
+    def _refresh_in_background(self):
+        with self._refresh_lock:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return
+            self._refreshing = threading.Thread(target=self.refresh, name='gdacs-impact-areas', daemon=True)
+            self._refreshing.start()
+
+    def containing(self, lat, lon, wait=False):
+        """
+        Active events whose impact area covers the point.
+
+        Args:
+            wait: Refresh synchronously when stale (management commands), instead of in the background
+        """
+        if self.is_stale():
+            if wait:
+                self.refresh()
+            else:
+                self._refresh_in_background()
+        return self._areas.containing(lat, lon)
+
+    def stats(self):
+        stats = self._areas.stats()
+        stats['last_error_at'] = self._last_error
+        stats['refreshing'] = self._refreshing is not None and self._refreshing.is_alive()
+        return stats
+
+
+impact_areas = ImpactAreaIndex()
+
+
+def load_recorded_geometries(path):
+    """Events from a recorded getgeometry response (or a list of them) saved as JSON"""
+    with open(path, 'rb') as f:
+        data = json.load(f)
+    documents = data if isinstance(data, list) else [data]
+    features = [feature for document in documents for feature in (document.get('features') or [])]
+    return events_from_geometries(features)
@@ -0,0 +1,58 @@
+"""
+Message Ingest Hooks
+Called once a received message has been classified and saved, to keep the
+incrementally maintained views of recent traffic up to date.
+"""
+import logging
+from .alerts import affects_alerts, alert_clusters, alerts_backend
+from .hotspots import hotspot_detector
+from . import conversations, rollups, tiles
+from .live import live_channel
+from .subscriptions import notify_message
+
+logger = logging.getLogger(__name__)
+
+
+def message_processed(message, reassessed=False, previous=None):
+    """
+    Feed a processed message to the incremental aggregates.
+    Never raises: a failing aggregate must not fail the user's request.
+
+    Args:
+        message: The saved ReceivedMessage
+        reassessed: True when an already processed message was updated (e.g. a
+            conversation starter re-classified by a follow-up); counters that
+            cannot take a message back only count it the first time
+        previous: rollups.contribution() of the message taken before it was
+            updated, when it had already been counted
+    """
+    if alerts_backend() == 'incremental':
+        try:
+            alert_clusters.record_message(message)
+        except Exception as e:
+            logger.error(f"Error updating alert clusters for message {message.id}: {e}")
+    try:
+        hotspot_detector.record_message(message)
+    except Exception as e:
+        logger.error(f"Error updating hotspot detector for message {message.id}: {e}")
+    if not reassessed or previous is not None:
+        try:
+            rollups.record_message(message, previous)
+        except Exception as e:
+            logger.error(f"Error updating rollups for message {message.id}: {e}")
+    if not reassessed:
+        try:
+            conversations.record_message(message)
+        except Exception as e:
+            logger.error(f"Error updating conversation stats for message {message.id}: {e}")
+        try:
+            tiles.record_message(message)
+        except Exception as e:
+            logger.error(f"Error updating geo tiles for message {message.id}: {e}")
+        try:
+            notify_message(message)
+        except Exception as e:
+            logger.error(f"Error matching subscriptions for message {message.id}: {e}")
+
+    # Wake the push channel; alert diffs and subscription matches are computed off the request path
+    live_channel.notify(alerts_changed=affects_alerts(message))
@@ -0,0 +1,264 @@
+"""
+Pipeline Stage Latency
+Streaming latency histograms per pipeline stage (classification, feed fetch,
+situational awareness, planning, execution, memory store, TTS, STT).
+
+Durations go into log-scaled buckets (HDR-style: every bucket is LATENCY_GAMMA
+times wider than the previous one, so any percentile is within about 1% of
+the true value). Histograms merge by adding bucket counts: each process
+records into a small in-memory delta and a background flush adds it to
+per-minute and per-hour rows in the database, which every worker reads.
+Memory per process and per stored period is bounded by the bucket count.
+"""
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('classify', 'feed_fetch', 'awareness', 'plan', 'execute', 'memory_store', 'tts', 'stt')
+
+# Bucket layout: MIN_MS * GAMMA ** i, from 10 µs to 10 minutes (~900 buckets)
+MIN_MS = 0.01
+MAX_MS = 10 * 60 * 1000
+GAMMA = 1.02
+BUCKETS = int(math.ceil(math.log(MAX_MS / MIN_MS) / math.log(GAMMA))) + 1
+
+PERCENTILES = (50, 95, 99)
+
+# Window name -> (row resolution, length)
+WINDOWS = {
+    '5m': ('minute', timedelta(minutes=5)),
+    '1h': ('minute', timedelta(hours=1)),
+    '24h': ('hour', timedelta(hours=24)),
+}
+
+# How long stored rows are kept, per resolution
+RETENTION = {'minute': timedelta(hours=2), 'hour': timedelta(days=8)}
+
+
+def bucket_index(ms):
+    """Bucket of a duration in milliseconds"""
+    if ms <= MIN_MS:
+        return 0
+    return min(int(math.log(ms / MIN_MS) / math.log(GAMMA)) + 1, BUCKETS - 1)
+
+
+def bucket_value(index):
+    """Representative duration of a bucket (its geometric midpoint), in milliseconds"""
+    if index == 0:
+        return MIN_MS
+    return MIN_MS * GAMMA ** (index - 0.5)
+
+
+def percentiles(counts, quantiles=PERCENTILES):
+    """{'p50': ms, ...} from dense bucket counts, None when empty"""
+    total = counts.sum()
+    if not total:
+        return {f"p{q}": None for q in quantiles}
+    cumulative = np.cumsum(counts)
+    return {
+        f"p{q}": round(bucket_value(int(np.searchsorted(cumulative, total * q / 100.0))), 2)
+        for q in quantiles
+    }
+
+
+def to_sparse(counts):
+    """JSON-friendly {bucket: count} of the non-empty buckets"""
+    nonzero = np.flatnonzero(counts)
+    return {str(i): int(counts[i]) for i in nonzero.tolist()}
+
+
+def add_sparse(counts, sparse):
+    """Add a {bucket: count} dict into dense counts in place"""
+    if sparse:
+        indices = np.fromiter((int(k) for k in sparse), dtype=np.int64, count=len(sparse))
+        np.add.at(counts, indices, np.fromiter(sparse.values(), dtype=np.int64, count=len(sparse)))
+    return counts
+
+
+def _period_start(now, resolution):
+    if resolution == 'minute':
+        return now.replace(second=0, microsecond=0)
+    return now.replace(minute=0, second=0, microsecond=0)
+
+
+class StageLatency:
+    """
+    Process-wide recorder. record() only touches an in-memory delta; the
+    delta is written to the database at most every LATENCY_FLUSH_SECONDS
+    by a background thread, or by summary() when the process has gone idle
+    since its last recording.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # (stage, minute start) -> [dense counts, sum_ms]
+        self._last_flush = time.monotonic()
+        self._flushing = None
+        self._summary = None
+        self._summary_at = 0.0
+
+    def record(self, stage, ms):
+        """Count one duration of a stage"""
+        minute = _period_start(timezone.now(), 'minute')
+        with self._lock:
+            entry = self._pending.get((stage, minute))
+            if entry is None:
+                entry = self._pending[(stage, minute)] = [np.zeros(BUCKETS, dtype=np.int64), 0.0]
+            entry[0][bucket_index(ms)] += 1
+            entry[1] += ms
+            if self._flush_due():
+                self._last_flush = time.monotonic()
+                self._flushing = threading.Thread(target=self._flush_in_background, name='latency-flush',
+                                                  daemon=True)
+                self._flushing.start()
+
+    def _flush_due(self):
+        """Pending deltas older than LATENCY_FLUSH_SECONDS and no flush running (caller holds the lock)"""
+        return (bool(self._pending)
+                and time.monotonic() - self._last_flush >= getattr(settings, 'LATENCY_FLUSH_SECONDS', 10)
+                and (self._flushing is None or not self._flushing.is_alive()))
+
+    @contextmanager
+    def measure(self, stage):
+        """Time the enclosed block as one run of `stage` (failures included)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - started) * 1000)
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Latency flush failed: {e}")
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Add the pending deltas to the stored minute and hour rows"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        # Minute deltas roll up into their hour as well
+        deltas = {}
+        for (stage, minute), (counts, sum_ms) in pending.items():
+            for resolution in ('minute', 'hour'):
+                key = (stage, resolution, _period_start(minute, resolution))
+                if key in deltas:
+                    deltas[key][0] += counts
+                    deltas[key][1] += sum_ms
+                else:
+                    deltas[key] = [counts.copy(), sum_ms]
+
+        for (stage, resolution, period_start), (counts, sum_ms) in deltas.items():
+            self._add_to_row(stage, resolution, period_start, counts, sum_ms)
+
+        cutoff = timezone.now()
+        for resolution, retention in RETENTION.items():
+            LatencyHistogram.objects.filter(resolution=resolution, period_start__lt=cutoff - retention).delete()
+        self._summary = None
+        return len(deltas)
+
+    def _add_to_row(self, stage, resolution, period_start, counts, sum_ms):
+        key = dict(stage=stage, resolution=resolution, period_start=period_start)
+        for _ in range(2):
+            with transaction.atomic():
+                row = LatencyHistogram.objects.select_for_update().filter(**key).first()
+                if row is not None:
+                    merged = add_sparse(counts.copy(), row.counts)
+                    row.counts = to_sparse(merged)
+                    row.count = int(merged.sum())
+                    row.sum_ms += sum_ms
+                    row.save(update_fields=['counts', 'count', 'sum_ms'])
+                    return
+                try:
+                    with transaction.atomic():
+                        LatencyHistogram.objects.create(counts=to_sparse(counts), count=int(counts.sum()),
+                                                        sum_ms=sum_ms, **key)
+                    return
+                except IntegrityError:
+                    continue  # Another worker created the row first: merge into it
+
+    def summary(self, max_age=None):
+        """
+        {stage: {window: {'count', 'mean_ms', 'p50', 'p95', 'p99'}}} merged
+        across workers, including this process's unflushed delta. Cached for
+        max_age seconds (LATENCY_FLUSH_SECONDS by default).
+
+        A delta that is due is flushed first, so a process that stopped
+        recording still shares it with the other workers.
+        """
+        if max_age is None:
+            max_age = getattr(settings, 'LATENCY_FLUSH_SECONDS', 10)
+        if self._summary is not None and time.monotonic() - self._summary_at < max_age:
+            return self._summary
+
+        with self._lock:
+            due = self._flush_due()
+            if due:
+                self._last_flush = time.monotonic()
+        if due:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Latency flush failed: {e}")
+
+        now = timezone.now()
+        oldest = {resolution: _period_start(now - max(length for res, length in WINDOWS.values()
+                                                      if res == resolution), resolution)
+                  for resolution, _ in WINDOWS.values()}
+        in_windows = Q()
+        for resolution, since in oldest.items():
+            in_windows |= Q(resolution=resolution, period_start__gte=since)
+        rows = {}
+        for stage, resolution, period_start, counts, sum_ms in LatencyHistogram.objects.filter(
+            in_windows
+        ).values_list('stage', 'resolution', 'period_start', 'counts', 'sum_ms'):
+            rows.setdefault((stage, resolution), []).append((period_start, counts, sum_ms))
+
+        with self._lock:
+            pending = [(stage, minute, counts.copy(), sum_ms)
+                       for (stage, minute), (counts, sum_ms) in self._pending.items()]
+
+        summary = {}
+        for stage in STAGES:
+            summary[stage] = {}
+            for window, (resolution, length) in WINDOWS.items():
+                since = _period_start(now - length, resolution)
+                counts = np.zeros(BUCKETS, dtype=np.int64)
+                total_ms = 0.0
+                for period_start, sparse, sum_ms in rows.get((stage, resolution), ()):
+                    if period_start >= since:
+                        add_sparse(counts, sparse)
+                        total_ms += sum_ms
+                for pending_stage, minute, pending_counts, sum_ms in pending:
+                    if pending_stage == stage and minute >= since:
+                        counts += pending_counts
+                        total_ms += sum_ms
+                count = int(counts.sum())
+                summary[stage][window] = {
+                    'count': count,
+                    'mean_ms': round(total_ms / count, 2) if count else None,
+                    **percentiles(counts)
+                }
+
+        self._summary = summary
+        self._summary_at = time.monotonic()
+        return summary
+
+
+stage_latency = StageLatency()
@@ -0,0 +1,287 @@
+"""
+Live Dashboard Channel
+Server-sent events (SSE) push channel for the admin and system dashboards.
+One background thread per process notices processed messages (immediately
+for this process through the ingest hook, through a single cheap probe query
+for other workers), computes the alert diff and metric deltas once, and fans
+the same serialized event out to every connected dashboard.
+
+The same thread matches the alerts against the alert subscriptions after a
+message that can change them, so neither clustering nor matching runs on
+the request path.
+
+Fan-out needs an ASGI server. Under the WSGI gunicorn setup in
+entrypoint.sh every open stream holds one of a worker's threads, so each
+worker accepts only LIVE_MAX_SUBSCRIBERS streams (1 by default) and answers
+503 to further dashboards, which keep polling the alerts and status
+endpoints. Serving ai_first_response.asgi:application (for example with
+uvicorn workers) lifts the limit to LIVE_MAX_ASYNC_SUBSCRIBERS per process.
+
+Events:
+    snapshot: {'alerts': [...], 'status': {...}} sent when a client connects
+    alerts:   {'added': [...], 'updated': [...], 'removed': [alert ids]}
+    metrics:  {'changed': {field: value}, 'deltas': {field: numeric change}}
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from .agentic_system import AgenticEmergencySystem
+from .alerts import cluster_settings, current_alerts
+from .models import ReceivedMessage
+from .status import build_agentic_status
+from .subscriptions import alert_notifier
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per client before it is considered stalled and dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def live_settings():
+    """(tick_seconds, probe_seconds, heartbeat_seconds, max_stream_seconds, max_subscribers) from settings"""
+    return (
+        getattr(settings, 'LIVE_TICK_SECONDS', 0.5),
+        getattr(settings, 'LIVE_PROBE_SECONDS', 2),
+        getattr(settings, 'LIVE_HEARTBEAT_SECONDS', 15),
+        getattr(settings, 'LIVE_STREAM_MAX_SECONDS', 300),
+        getattr(settings, 'LIVE_MAX_SUBSCRIBERS', 1),
+    )
+
+
+def subscriber_limit(asynchronous):
+    """
+    Streams one process may hold. A WSGI stream occupies a worker thread for
+    its whole life, so LIVE_MAX_SUBSCRIBERS must stay well below the gunicorn
+    thread count and only ASGI streams, which hold no thread, really fan out.
+    """
+    if asynchronous:
+        return getattr(settings, 'LIVE_MAX_ASYNC_SUBSCRIBERS', 50)
+    return live_settings()[4]
+
+
+def format_event(event, data, event_id=None):
+    """Serialize one SSE event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscriber:
+    """One connected dashboard: a bounded queue of serialized events"""
+
+    def __init__(self, asynchronous=False):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.asynchronous = asynchronous
+        self.needs_snapshot = True
+        self.closed = False
+
+    def send(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            self.closed = True  # Stalled client: it reconnects and gets a fresh snapshot
+
+
+class LiveChannel:
+    """
+    Process-wide broadcaster. The pump thread runs while clients are connected,
+    or until the alert subscriptions have been matched after a relevant message.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = set()
+        self._thread = None
+        self._alerts = None  # alert id -> alert, as last broadcast
+        self._status = None  # Status fields, as last broadcast
+        self._next_expiry = None  # time.time() when the oldest alert member leaves the window
+        self._system = None  # Built on first use, for its status
+        self._latest_processed = None
+        self._next_probe = 0.0
+        self._seq = 0
+        self._alerts_pending = False  # Alerts changed in this process since the last match
+
+    def _start(self):
+        """Start the pump thread if it is not running (caller holds the lock)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='live-channel', daemon=True)
+            self._thread.start()
+
+    def subscribe(self, asynchronous=False):
+        """Register a client, or return None when this process is at its subscriber_limit()"""
+        with self._lock:
+            active = sum(1 for s in self._subscribers if s.asynchronous == asynchronous)
+            if active >= subscriber_limit(asynchronous):
+                return None
+            subscriber = Subscriber(asynchronous)
+            self._subscribers.add(subscriber)
+            self._start()
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def notify(self, alerts_changed=False):
+        """
+        A message was processed in this process: refresh on the next tick.
+        When it can change the alerts, the thread is started if needed to
+        match them against the alert subscriptions.
+        """
+        with self._lock:
+            if alerts_changed:
+                self._alerts_pending = True
+                self._start()
+            elif self._thread is None:
+                return
+        self._wake.set()
+
+    def _run(self):
+        try:
+            while True:
+                tick_seconds, probe_seconds = live_settings()[:2]
+                woken = self._wake.wait(tick_seconds)
+                self._wake.clear()
+                with self._lock:
+                    subscribers = [s for s in self._subscribers if not s.closed]
+                    self._subscribers = set(subscribers)
+                    match_alerts, self._alerts_pending = self._alerts_pending, False
+                    if not subscribers and not match_alerts:
+                        self._thread = None
+                        self._alerts = None  # Stale once nobody follows it; rebuilt on restart
+                        self._status = None
+                        self._next_expiry = None
+                        return
+                try:
+                    if not subscribers:
+                        alert_notifier.notify(current_alerts())
+                        continue
+                    if (self._alerts is None or woken or match_alerts or self._expiry_due()
+                            or self._probe(probe_seconds)):
+                        self._refresh(subscribers, match_alerts)
+                    self._send_snapshots(subscribers)
+                except Exception as e:
+                    logger.error(f"Live channel refresh failed: {e}")
+        finally:
+            connection.close()
+
+    def _probe(self, probe_seconds):
+        """At most one small query every probe_seconds: did another worker process a message?"""
+        now = time.monotonic()
+        if now < self._next_probe:
+            return False
+        self._next_probe = now + probe_seconds
+        latest = ReceivedMessage.objects.aggregate(latest=Max('processed_at'))['latest']
+        changed = latest != self._latest_processed
+        self._latest_processed = latest
+        return changed
+
+    def _expiry_due(self):
+        """Whether an alert member has aged out of the window since the last refresh"""
+        return self._next_expiry is not None and time.time() >= self._next_expiry
+
+    def _refresh(self, subscribers, match_alerts=False):
+        """Compute the alert diff and metric deltas once and broadcast them"""
+        alerts = {alert['id']: alert for alert in current_alerts()}
+        if match_alerts:
+            alert_notifier.notify(list(alerts.values()))
+        # Alerts only change without a new message when their oldest member leaves the window
+        first = min((alert['first_occurrence'] for alert in alerts.values()), default=None)
+        self._next_expiry = (datetime.fromisoformat(first).timestamp() + cluster_settings()[2] * 3600
+                             if first else None)
+        if self._system is None:
+            self._system = AgenticEmergencySystem()
+        status = build_agentic_status(self._system)
+        status.pop('analytics_queries', None)
+
+        if self._alerts is not None:
+            diff = {
+                'added': [alert for alert_id, alert in alerts.items() if alert_id not in self._alerts],
+                'updated': [alert for alert_id, alert in alerts.items()
+                            if alert_id in self._alerts and self._alerts[alert_id] != alert],
+                'removed': [alert_id for alert_id in self._alerts if alert_id not in alerts]
+            }
+            if diff['added'] or diff['updated'] or diff['removed']:
+                self._broadcast(subscribers, 'alerts', diff)
+
+            changed = {key: value for key, value in status.items() if self._status.get(key) != value}
+            if changed:
+                deltas = {key: value - self._status[key] for key, value in changed.items()
+                          if isinstance(value, (int, float)) and isinstance(self._status.get(key), (int, float))}
+                self._broadcast(subscribers, 'metrics', {'changed': changed, 'deltas': deltas})
+
+        self._alerts = alerts
+        self._status = status
+
+    def _broadcast(self, subscribers, event, data):
+        self._seq += 1
+        payload = format_event(event, data, self._seq)  # Serialized once for every client
+        for subscriber in subscribers:
+            if not subscriber.needs_snapshot:
+                subscriber.send(payload)
+
+    def _send_snapshots(self, subscribers):
+        pending = [s for s in subscribers if s.needs_snapshot]
+        if not pending:
+            return
+        alerts = sorted(self._alerts.values(), key=lambda x: x['count'], reverse=True)
+        payload = format_event('snapshot', {'alerts': alerts, 'status': self._status}, self._seq)
+        for subscriber in pending:
+            subscriber.needs_snapshot = False
+            subscriber.send(payload)
+
+
+def event_stream(channel, subscriber):
+    """Blocking SSE iterator for WSGI workers; ends after LIVE_STREAM_MAX_SECONDS so threads recycle"""
+    _, _, heartbeat_seconds, max_stream_seconds, _ = live_settings()
+    deadline = time.monotonic() + max_stream_seconds
+    try:
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline and not subscriber.closed:
+            try:
+                yield subscriber.queue.get(timeout=heartbeat_seconds)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+    finally:
+        channel.unsubscribe(subscriber)
+
+
+async def async_event_stream(channel, subscriber, poll_seconds=0.2):
+    """Non-blocking SSE iterator for ASGI servers, where one process can hold many clients"""
+    _, _, heartbeat_seconds, max_stream_seconds, _ = live_settings()
+    deadline = time.monotonic() + max_stream_seconds
+    last_sent = time.monotonic()
+    try:
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline and not subscriber.closed:
+            try:
+                payload = subscriber.queue.get_nowait()
+            except queue.Empty:
+                if time.monotonic() - last_sent >= heartbeat_seconds:
+                    last_sent = time.monotonic()
+                    yield ": keep-alive\n\n"
+                await asyncio.sleep(poll_seconds)
+                continue
+            last_sent = time.monotonic()
+            yield payload
+    finally:
+        channel.unsubscribe(subscriber)
+
+
+live_channel = LiveChannel()
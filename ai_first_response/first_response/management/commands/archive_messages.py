@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from first_response.retention import archive_conversations, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move conversations older than the retention age from ReceivedMessage to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention age in days (default: MESSAGE_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Conversations per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 1:
+            raise CommandError("--days must be at least 1")
+        cutoff = retention_cutoff(days=options['days'])
+        conversations, messages = archive_conversations(cutoff, batch_size=options['batch_size'],
+                                                        dry_run=options['dry_run'])
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {conversations} conversations ({messages} messages) received before {cutoff:%Y-%m-%d %H:%M} UTC"
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from first_response.conversations import backfill_conversation_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized follow-up count, last activity and latest assessment of every message'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Messages per UPDATE statement')
+
+    def handle(self, *args, **options):
+        updated = backfill_conversation_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated conversation stats on {updated} messages"))
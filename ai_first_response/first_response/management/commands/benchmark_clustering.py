@@ -0,0 +1,71 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from first_response.clustering import cluster_points
+from first_response.geo import distances_from
+
+
+def _pairwise_clusters(lats, lons, radius_km, min_count):
+    """The previous pairwise cluster search: every center measured against every point"""
+    clusters = []
+    unprocessed = np.ones(len(lats), dtype=bool)
+    for i in range(len(lats)):
+        if not unprocessed[i]:
+            continue
+        distances = distances_from(lats[i], lons[i], lats, lons)
+        members = np.flatnonzero(unprocessed & (distances <= radius_km))
+        if len(members) >= min_count:
+            clusters.append(members)
+            unprocessed[members] = False
+    return clusters
+
+
+class Command(BaseCommand):
+    help = 'Benchmark grid-indexed clustering against the pairwise cluster search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000,1000000', help='Comma-separated point counts')
+        parser.add_argument('--radius', type=float, default=50, help='Cluster radius in km')
+        parser.add_argument('--min-count', type=int, default=10, help='Minimum cluster size')
+        parser.add_argument('--pairwise-max', type=int, default=20000,
+                            help='Largest size to run the quadratic pairwise search on')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        radius_km = options['radius']
+        min_count = options['min_count']
+
+        self.stdout.write(f"{'points':>9}{'clusters':>10}{'pairwise ms':>14}{'grid ms':>12}{'speedup':>10}")
+        for n in [int(size) for size in options['sizes'].split(',')]:
+            lats, lons = self._synthetic_reports(n, rng)
+
+            started = time.perf_counter()
+            grid = cluster_points(lats, lons, radius_km, min_count)
+            grid_ms = (time.perf_counter() - started) * 1000
+
+            if n <= options['pairwise_max']:
+                started = time.perf_counter()
+                pairwise = _pairwise_clusters(lats, lons, radius_km, min_count)
+                pairwise_ms = (time.perf_counter() - started) * 1000
+                same = [c.tolist() for c in pairwise] == [c.tolist() for c in grid]
+                if not same:
+                    self.stderr.write(f"Cluster mismatch at {n} points")
+                speedup = f"{pairwise_ms / grid_ms:>9.1f}x"
+                pairwise_col = f"{pairwise_ms:>14.1f}"
+            else:
+                pairwise_col = f"{'skipped':>14}"
+                speedup = f"{'-':>10}"
+
+            self.stdout.write(f"{n:>9}{len(grid):>10}{pairwise_col}{grid_ms:>12.1f}{speedup}")
+
+    def _synthetic_reports(self, n, rng):
+        """Reports over Italy: a few dense incident hotspots plus scattered background noise"""
+        hotspots = rng.uniform([37.0, 7.0], [46.5, 18.0], size=(20, 2))
+        clustered = int(n * 0.7)
+        centers = hotspots[rng.integers(0, len(hotspots), clustered)]
+        points = np.vstack([
+            centers + rng.normal(0, 0.15, size=(clustered, 2)),
+            rng.uniform([36.0, 6.0], [47.5, 19.0], size=(n - clustered, 2)),
+        ])
+        rng.shuffle(points)
+        return points[:, 0], points[:, 1]
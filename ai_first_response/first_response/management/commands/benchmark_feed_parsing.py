@@ -0,0 +1,122 @@
+import json
+import random
+import re
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from django.core.management.base import BaseCommand
+from first_response.disaster_feeds import gdacs_events_within
+from first_response.feed_parsers import iter_text_chunks, iter_rss_items, event_coordinates
+
+
+class _RecordedResponse:
+    """Replays a recorded payload like a streamed requests response"""
+
+    def __init__(self, payload, chunk_size=64 * 1024):
+        self.payload = payload
+        self.chunk_size = chunk_size
+
+    @property
+    def text(self):
+        return self.payload.decode('utf-8-sig')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=None):
+        size = chunk_size or self.chunk_size
+        for i in range(0, len(self.payload), size):
+            yield self.payload[i:i + size]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark peak memory and CPU of GDACS feed parsing on recorded payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', dest='json_path', help='Recorded gdacs.json payload')
+        parser.add_argument('--rss', dest='rss_path', help='Recorded rss.xml payload')
+        parser.add_argument('--events', type=int, default=5000,
+                            help='Events in the synthetic payloads used when no recording is given')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per parser')
+        parser.add_argument('--lat', type=float, default=45.0703)
+        parser.add_argument('--lon', type=float, default=7.6869)
+        parser.add_argument('--radius', type=float, default=3000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        json_payload = self._load(options['json_path']) or self._synthetic_json(options['events'], rng)
+        rss_payload = self._load(options['rss_path']) or self._synthetic_rss(options['events'], rng)
+        point = (options['lat'], options['lon'], options['radius'])
+
+        self.stdout.write(f"JSON payload: {len(json_payload) / 1024:.1f} KB, RSS payload: {len(rss_payload) / 1024:.1f} KB")
+        for name, func, payload in [
+            ('json (full load)', self._legacy_json, json_payload),
+            ('json (streaming)', self._streaming_json, json_payload),
+            ('rss (fromstring)', self._legacy_rss, rss_payload),
+            ('rss (iterparse)', self._streaming_rss, rss_payload),
+        ]:
+            cpu, peak, count = self._measure(func, payload, point, options['repeat'])
+            self.stdout.write(f"{name:<18} cpu {cpu * 1000:8.2f} ms/refresh   peak {peak / 1024:9.1f} KB   events {count}")
+
+    def _measure(self, func, payload, point, repeat):
+        cpu_total = 0.0
+        peak = 0
+        count = 0
+        for _ in range(repeat):
+            tracemalloc.start()
+            started = time.process_time()
+            count = len(func(_RecordedResponse(payload), *point))
+            cpu_total += time.process_time() - started
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        return cpu_total / repeat, peak, count
+
+    def _load(self, path):
+        if not path:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _synthetic_json(self, count, rng):
+        features = [{
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [rng.uniform(-180, 180), rng.uniform(-90, 90)]},
+            'properties': {'eventname': f'Event {i}', 'alertlevel': rng.choice(['Green', 'Orange', 'Red']),
+                           'description': 'x' * 200}
+        } for i in range(count)]
+        return json.dumps({'type': 'FeatureCollection', 'features': features}).encode('utf-8')
+
+    def _synthetic_rss(self, count, rng):
+        items = ''.join(
+            f"<item><title>Event {i}</title><description>lat: {rng.uniform(0, 90):.3f}, "
+            f"lon: {rng.uniform(0, 180):.3f} {'x' * 200}</description><link>https://www.gdacs.org/{i}</link></item>"
+            for i in range(count)
+        )
+        return f'<?xml version="1.0"?><rss><channel>{items}</channel></rss>'.encode('utf-8')
+
+    # Parsers as they were before the streaming engine, for comparison
+
+    def _legacy_json(self, resp, lat, lon, radius_km):
+        data = resp.json()
+        events = data.get('features', data.get('results', [])) if isinstance(data, dict) else data
+        return [e for e in events[:5] if event_coordinates(e)[0] is not None]
+
+    def _legacy_rss(self, resp, lat, lon, radius_km):
+        root = ET.fromstring(resp.text.strip())
+        events = []
+        for item in root.findall('.//item')[:10]:
+            text = f"{item.findtext('title')} {item.findtext('description')}"
+            for pattern in [r'(\d+\.?\d*)[°\s]*[NS][,\s]*(\d+\.?\d*)[°\s]*[EW]',
+                            r'lat[:\s]*(\d+\.?\d*)[,\s]*lon[:\s]*(\d+\.?\d*)',
+                            r'(\d+\.?\d*)[,\s]+(\d+\.?\d*)']:
+                if re.search(pattern, text, re.IGNORECASE):
+                    events.append(item)
+                    break
+        return events
+
+    def _streaming_json(self, resp, lat, lon, radius_km):
+        return gdacs_events_within(iter_text_chunks(resp), lat, lon, radius_km)
+
+    def _streaming_rss(self, resp, lat, lon, radius_km):
+        return [item for item in iter_rss_items(iter_text_chunks(resp), limit=10)
+                if item['latitude'] is not None]
@@ -0,0 +1,75 @@
+import math
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from first_response.geo import distances_from, pairwise_distances, within_radius
+
+
+def _scalar_haversine_km(lat1, lon1, lat2, lon2):
+    """The per-pair math implementation the vectorized helpers replace"""
+    R = 6371
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dl = math.radians(lat2-lat1), math.radians(lon2-lon1)
+    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dl/2)**2
+    return 2*R*math.asin(math.sqrt(a))
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark scalar vs vectorized haversine distance computations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated point counts')
+        parser.add_argument('--queries', type=int, default=100, help='Query points for the many-to-many case')
+        parser.add_argument('--scalar-limit', type=int, default=200000,
+                            help='Max scalar distance calls per case; larger cases are extrapolated')
+        parser.add_argument('--radius', type=float, default=50)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        queries = options['queries']
+
+        self.stdout.write(f"{'case':<22}{'points':>9}{'scalar ms':>14}{'numpy ms':>12}{'speedup':>10}")
+        for n in sizes:
+            # Points spread over northern Italy, like a regional emergency
+            lats = rng.uniform(44.0, 46.5, n)
+            lons = rng.uniform(6.5, 12.5, n)
+            q_lats = rng.uniform(44.0, 46.5, queries)
+            q_lons = rng.uniform(6.5, 12.5, queries)
+            # The scalar path works on plain floats, as it did on ORM instances
+            lat_list, lon_list = lats.tolist(), lons.tolist()
+            q_lat_list, q_lon_list = q_lats.tolist(), q_lons.tolist()
+
+            scalar = self._scalar_ms(lambda i: _scalar_haversine_km(45.07, 7.69, lat_list[i], lon_list[i]), n, options['scalar_limit'])
+            vector = self._timed_ms(lambda: distances_from(45.07, 7.69, lats, lons))
+            self._row('one-to-many', n, scalar, vector)
+
+            prefiltered = self._timed_ms(lambda: within_radius(45.07, 7.69, lats, lons, options['radius']))
+            self._row('one-to-many + bbox', n, scalar, prefiltered)
+
+            pairs = queries * n
+            scalar = self._scalar_ms(lambda k: _scalar_haversine_km(q_lat_list[k % queries], q_lon_list[k % queries],
+                                                                    lat_list[k // queries], lon_list[k // queries]),
+                                     pairs, options['scalar_limit'])
+            vector = self._timed_ms(lambda: pairwise_distances(q_lats, q_lons, lats, lons))
+            self._row(f'many-to-many ({queries}x)', n, scalar, vector)
+
+    def _row(self, case, n, scalar_ms, numpy_ms):
+        speedup = scalar_ms / numpy_ms if numpy_ms > 0 else float('inf')
+        self.stdout.write(f"{case:<22}{n:>9}{scalar_ms:>14.2f}{numpy_ms:>12.2f}{speedup:>9.1f}x")
+
+    def _timed_ms(self, func, repeat=3):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000
+
+    def _scalar_ms(self, func, calls, limit):
+        measured = min(calls, limit)
+        started = time.perf_counter()
+        for i in range(measured):
+            func(i)
+        elapsed = time.perf_counter() - started
+        return elapsed * 1000 * calls / measured
@@ -0,0 +1,106 @@
+import json
+import math
+import time
+import numpy as np
+import shapely
+from shapely.geometry import Point
+from django.core.management.base import BaseCommand
+from first_response.geo import within_radius
+from first_response.impact_areas import ImpactAreas, events_from_geometries, load_recorded_geometries
+
+
+class Command(BaseCommand):
+    help = 'Benchmark loading, refreshing and querying the GDACS impact area index on recorded event sets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Recorded getgeometry responses (JSON); synthetic events when omitted')
+        parser.add_argument('--events', type=int, default=500, help='Synthetic events')
+        parser.add_argument('--vertices', type=int, default=400, help='Vertices per synthetic polygon')
+        parser.add_argument('--queries', type=int, default=2000, help='Query points')
+        parser.add_argument('--radius', type=float, default=300,
+                            help='Radius of the point-based check the polygons replace')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        if options['paths']:
+            documents = []
+            for path in options['paths']:
+                with open(path, 'rb') as f:
+                    documents.append(f.read())
+            load = lambda: [event for path in options['paths'] for event in load_recorded_geometries(path)]
+        else:
+            documents = [self._synthetic_geometries(options['events'], options['vertices'], rng)]
+            load = lambda: events_from_geometries(
+                [feature for document in documents for feature in json.loads(document)['features']]
+            )
+
+        # Load: decode the recorded payloads and build the index, as a cold refresh does
+        started = time.perf_counter()
+        events = load()
+        decoded_ms = (time.perf_counter() - started) * 1000
+        areas = ImpactAreas(events)
+        load_ms = decoded_ms + areas.build_ms
+        stats = areas.stats()
+        self.stdout.write(f"{stats['events']} events, {stats['polygons']} polygons, {stats['vertices']} vertices, "
+                          f"{sum(len(d) for d in documents) / 1024:.1f} KB recorded")
+        self.stdout.write(f"{'load (decode + index)':<28}{load_ms:>10.2f} ms")
+
+        # Refresh: re-index already decoded events, the cost a refresh adds on top of the download
+        refresh_ms = min(ImpactAreas(events).build_ms for _ in range(3))
+        self.stdout.write(f"{'refresh (index only)':<28}{refresh_ms:>10.2f} ms")
+
+        # Queries around the areas, so most of them land near (and many inside) a polygon
+        lats, lons = self._query_points(areas, options['queries'], rng)
+        points = [Point(lon, lat) for lat, lon in zip(lats.tolist(), lons.tolist())]
+        polygons = list(areas.polygons)
+        for polygon in polygons:
+            shapely.prepare(polygon)
+
+        indexed_ms, inside = self._per_query_ms(lambda i: areas.containing(lats[i], lons[i]), len(points))
+        scan_ms, scanned = self._per_query_ms(
+            lambda i: [j for j, polygon in enumerate(polygons) if polygon.intersects(points[i])], len(points)
+        )
+        centers = shapely.centroid(areas.polygons)
+        center_lats, center_lons = shapely.get_y(centers), shapely.get_x(centers)
+        radius_ms, near = self._per_query_ms(
+            lambda i: within_radius(lats[i], lons[i], center_lats, center_lons, options['radius'])[0], len(points)
+        )
+
+        self.stdout.write(f"{'query':<28}{'ms/query':>10}{'hits':>10}")
+        self.stdout.write(f"{'STRtree point-in-polygon':<28}{indexed_ms:>10.4f}{inside:>10}")
+        self.stdout.write(f"{'linear prepared scan':<28}{scan_ms:>10.4f}{scanned:>10}")
+        self.stdout.write(f"{'point + radius (before)':<28}{radius_ms:>10.4f}{near:>10}")
+
+    def _per_query_ms(self, func, count):
+        hits = 0
+        started = time.perf_counter()
+        for i in range(count):
+            hits += len(func(i)) > 0
+        return (time.perf_counter() - started) * 1000 / count, hits
+
+    def _query_points(self, areas, count, rng):
+        if not len(areas.polygons):
+            return rng.uniform(-60, 60, count), rng.uniform(-180, 180, count)
+        bounds = shapely.bounds(areas.polygons[rng.integers(0, len(areas.polygons), count)])
+        lons = rng.uniform(bounds[:, 0], bounds[:, 2])
+        lats = rng.uniform(bounds[:, 1], bounds[:, 3])
+        return lats, lons
+
+    def _synthetic_geometries(self, count, vertices, rng):
+        """Irregular flood/cyclone-like rings of 50-500 km, in getgeometry's FeatureCollection shape"""
+        features = []
+        for i in range(count):
+            lat, lon = rng.uniform(-55, 55), rng.uniform(-179, 179)
+            radius_deg = rng.uniform(50, 500) / 111.0
+            angles = np.linspace(0, 2 * math.pi, vertices, endpoint=False)
+            radii = radius_deg * (0.5 + rng.random(vertices) * 0.5)
+            ring = np.stack([lon + radii * np.cos(angles) / math.cos(math.radians(lat)),
+                             lat + radii * np.sin(angles)], axis=1)
+            props = {'eventtype': rng.choice(['FL', 'TC', 'WF']), 'eventid': i, 'episodeid': 1,
+                     'eventname': f'Event {i}', 'alertlevel': rng.choice(['Orange', 'Red'])}
+            features.append({'type': 'Feature', 'properties': props,
+                             'geometry': {'type': 'Point', 'coordinates': [lon, lat]}})
+            features.append({'type': 'Feature', 'properties': props,
+                             'geometry': {'type': 'Polygon', 'coordinates': [ring.tolist() + [ring[0].tolist()]]}})
+        return json.dumps({'type': 'FeatureCollection', 'features': features}).encode('utf-8')
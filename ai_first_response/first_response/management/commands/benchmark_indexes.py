@@ -0,0 +1,164 @@
+import statistics
+import time
+from datetime import timedelta
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.db.models import Count, Max
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from first_response.models import ReceivedMessage
+
+# Indexes added for the hot queries (ReceivedMessage.Meta.indexes)
+QUERY_INDEXES = ('msg_processed_window_idx', 'msg_received_category_idx', 'msg_category_received_idx',
+                 'msg_conversation_status_idx', 'msg_starter_received_idx', 'msg_error_recent_idx')
+
+# Indexes the suite replaced, restored for the "before" run
+LEGACY_INDEXES = [models.Index(fields=['ai_category'], name='first_respo_ai_cate_32e963_idx')]
+
+CATEGORIES = ['Fire', 'Flood', 'Medical', 'Earthquake', 'Accident', 'Storm', 'Unknown']
+SEVERITIES = ['CRIT', 'HIGH', 'MED', 'LOW', 'INFO']
+SEVERITY_WEIGHTS = [0.03, 0.1, 0.3, 0.37, 0.2]
+
+
+def hot_queries(now):
+    """(name, function running the query as the code does)"""
+    messages = ReceivedMessage.objects.all()
+    day_ago = now - timedelta(hours=24)
+    return [
+        ('alert window (24h)', lambda: list(messages.filter(
+            processed_at__gte=day_ago, user_latitude__isnull=False, user_longitude__isnull=False,
+            ai_category__isnull=False
+        ).exclude(ai_category='Unknown').order_by().values_list(
+            'id', 'ai_category', 'user_latitude', 'user_longitude', 'processed_at', 'ai_severity'
+        ))),
+        ('latest processed_at', lambda: messages.aggregate(latest=Max('processed_at'))['latest']),
+        ('recent critical', lambda: list(messages.filter(ai_severity__in=['CRIT', 'HIGH']).order_by(
+            '-received_at')[:10])),
+        ('category newest', lambda: list(messages.filter(ai_category='Earthquake').order_by('-received_at')[:100])),
+        ('active conversations', lambda: messages.filter(conversation_status='active',
+                                                         parent_message__isnull=True).count()),
+        ('starters (7d)', lambda: messages.filter(is_conversation_starter=True,
+                                                  received_at__gte=now - timedelta(days=7)).count()),
+        ('recent errors', lambda: list(messages.filter(has_error=True).order_by('-received_at')[:100])),
+        ('24h by category', lambda: list(messages.filter(received_at__gte=day_ago).values(
+            'ai_category', 'ai_severity').annotate(count=Count('id')).order_by())),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway database with synthetic messages and compare query plans and timings of the '
+            'hot ReceivedMessage queries without and with the query indexes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help='Synthetic messages')
+        parser.add_argument('--days', type=int, default=90, help='Days the messages are spread over')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query (median reported)')
+        parser.add_argument('--plans', action='store_true', help='Print the full query plans')
+
+    def handle(self, *args, **options):
+        # A separate test database, so the real one is never seeded or stripped of indexes
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, options):
+        now = timezone.now()
+        started = time.perf_counter()
+        self._seed(options['rows'], options['days'], now, np.random.default_rng(42))
+        self.stdout.write(f"Seeded {options['rows']} messages over {options['days']} days "
+                          f"in {time.perf_counter() - started:.1f}s ({connection.vendor})")
+
+        indexes = [index for index in ReceivedMessage._meta.indexes if index.name in QUERY_INDEXES]
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(ReceivedMessage, index)
+            for index in LEGACY_INDEXES:
+                editor.add_index(ReceivedMessage, index)
+        self._analyze()
+        before = self._measure(now, options['repeat'])
+
+        started = time.perf_counter()
+        with connection.schema_editor() as editor:
+            for index in LEGACY_INDEXES:
+                editor.remove_index(ReceivedMessage, index)
+            for index in indexes:
+                editor.add_index(ReceivedMessage, index)
+        self._analyze()
+        self.stdout.write(f"Built {len(indexes)} indexes in {time.perf_counter() - started:.1f}s")
+        after = self._measure(now, options['repeat'])
+
+        self.stdout.write(f"\n{'query':<24}{'rows':>8}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name in before:
+            rows, before_ms, before_plan = before[name]
+            _, after_ms, after_plan = after[name]
+            self.stdout.write(f"{name:<24}{rows:>8}{before_ms:>12.2f}{after_ms:>12.2f}"
+                              f"{before_ms / after_ms if after_ms else float('inf'):>9.1f}x")
+            if options['plans']:
+                self.stdout.write(f"  before: {before_plan}\n  after:  {after_plan}")
+            else:
+                self.stdout.write(f"  before: {before_plan.splitlines()[0]}\n  after:  {after_plan.splitlines()[0]}")
+
+    def _measure(self, now, repeat):
+        results = {}
+        for name, run in hot_queries(now):
+            with CaptureQueriesContext(connection) as captured:
+                result = run()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            rows = len(result) if isinstance(result, list) else (result if isinstance(result, int) else 1)
+            results[name] = (rows, statistics.median(timings), self._plan(captured[-1]['sql']))
+        return results
+
+    def _plan(self, sql):
+        """Plan of the SQL the query ran, as the database reports it"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+            return '\n'.join(' '.join(str(value) for value in row) for row in cursor.fetchall())
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE' if connection.vendor == 'sqlite' else f"ANALYZE {ReceivedMessage._meta.db_table}")
+
+    def _seed(self, count, days, now, rng, batch_size=5000):
+        """Messages with the production mix: few critical, few errors, 30% follow-ups, 20% open conversations"""
+        ids = []
+        for start in range(0, count, batch_size):
+            n = min(batch_size, count - start)
+            ages = rng.uniform(0, days * 86400, n)
+            delays = rng.exponential(3, n)
+            processed = rng.random(n) < 0.95
+            categories = rng.choice(CATEGORIES, n)
+            severities = rng.choice(SEVERITIES, n, p=SEVERITY_WEIGHTS)
+            errors = rng.random(n) < 0.02
+            follow_up = (rng.random(n) < 0.3) & (len(ids) > 0)
+            active = rng.random(n) < 0.2
+            messages = []
+            for i in range(n):
+                received_at = now - timedelta(seconds=float(ages[i]))
+                parent_id = ids[int(rng.integers(len(ids)))] if follow_up[i] else None
+                messages.append(ReceivedMessage(
+                    user_message='help', message_text='help', user_latitude=float(rng.uniform(36, 47)),
+                    user_longitude=float(rng.uniform(6, 18)), ai_category=str(categories[i]),
+                    ai_severity=str(severities[i]), has_error=bool(errors[i]),
+                    processed_at=received_at + timedelta(seconds=float(delays[i])) if processed[i] else None,
+                    response_time_ms=int(delays[i] * 1000) if processed[i] else None,
+                    parent_message_id=parent_id, is_conversation_starter=parent_id is None,
+                    conversation_step=2 if parent_id else 1,
+                    conversation_status='active' if active[i] else 'completed'
+                ))
+            created = ReceivedMessage.objects.bulk_create(messages)
+            # received_at is auto_now_add: spread it over the window afterwards
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"UPDATE {ReceivedMessage._meta.db_table} SET received_at = %s WHERE id = %s",
+                    [(connection.ops.adapt_datetimefield_value(now - timedelta(seconds=float(age))), m.id)
+                     for age, m in zip(ages, created)]
+                )
+            ids.extend(m.id for m in created)
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from first_response.exports import (FORMATS, ExportProgress, csv_chunks, export_queryset, ndjson_chunks, parse_time,
+                                    write_npy_directory)
+
+
+class Command(BaseCommand):
+    help = 'Stream messages to NDJSON, CSV or a directory of NumPy .npy column files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson', help='Output format')
+        parser.add_argument('--output', default='-',
+                            help='Output file, "-" for stdout (npy: directory for the column files)')
+        parser.add_argument('--since', help='Messages received on or after this date or datetime (ISO 8601, UTC)')
+        parser.add_argument('--until', help='Messages received before this date or datetime (ISO 8601, UTC)')
+        parser.add_argument('--category', help='Only this AI category')
+        parser.add_argument('--severity', help='Only this severity (CRIT, HIGH, MED, LOW, INFO)')
+        parser.add_argument('--chunk-size', type=int, default=getattr(settings, 'EXPORT_CHUNK_SIZE', 2000),
+                            help='Rows fetched from the cursor and written per chunk')
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export_queryset(since=parse_time(options['since']), until=parse_time(options['until']),
+                                       category=options['category'], severity=options['severity'])
+        except ValueError as e:
+            raise CommandError(f"Invalid time: {e}")
+
+        progress = ExportProgress()
+        if options['format'] == 'npy':
+            if options['output'] == '-':
+                raise CommandError("--output must be a directory for the npy format")
+            write_npy_directory(queryset, Path(options['output']), progress, options['chunk_size'])
+        else:
+            writer = ndjson_chunks if options['format'] == 'ndjson' else csv_chunks
+            to_stdout = options['output'] == '-'
+            out = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+            try:
+                for chunk in writer(queryset, progress, options['chunk_size']):
+                    out.write(chunk)
+            finally:
+                if to_stdout:
+                    out.flush()
+                else:
+                    out.close()
+
+        # Keep stdout clean when it carries the export
+        report = self.stderr if options['output'] == '-' else self.stdout
+        report.write(self.style.SUCCESS(f"Exported {progress.report()}"))
@@ -0,0 +1,22 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from first_response.tiles import rebuild_tiles, tile_zoom_levels
+
+
+class Command(BaseCommand):
+    help = 'Recompute the map tile counts from stored messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days on or after this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f"Invalid --since date: {options['since']}")
+
+        written = rebuild_tiles(since=since)
+        levels = ', '.join(str(zoom) for zoom in tile_zoom_levels())
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} tile rows for zoom levels {levels}"))
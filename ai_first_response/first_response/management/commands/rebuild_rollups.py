@@ -0,0 +1,24 @@
+from datetime import datetime, timezone as dt_timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from first_response.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the hourly message rollups behind the admin dashboard from stored messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild hours on or after this date or datetime (ISO 8601, UTC)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f"Invalid --since value: {options['since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since, dt_timezone.utc)
+
+        written = rebuild_rollups(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup rows"))
@@ -11,6 +11,7 @@ import logging
 from datetime import datetime, timedelta
 from .models import ReceivedMessage
 from .metrics import agentic_metrics
+from .analytics import load_columns
 
 logger = logging.getLogger(__name__)
 
@@ -148,11 +149,13 @@ class EmergencyMemory:
             Current situational awareness data
         """
         
-        # Get recent messages from database
+        # Get recent messages from database (only the columns the analysis reads)
         recent_cutoff = timezone.now() - timedelta(hours=6)
-        recent_messages = ReceivedMessage.objects.filter(
-            received_at__gte=recent_cutoff
-        ).order_by('-received_at')[:100]
+        recent_messages = load_columns(
+            ReceivedMessage.objects.filter(received_at__gte=recent_cutoff).order_by('-received_at')[:100],
+            ['ai_category', 'ai_severity', 'user_latitude', 'user_longitude', 'received_at'],
+            consumer='situational_awareness'
+        )
         
         # Analyze patterns
         situation = {
@@ -311,21 +314,11 @@ class EmergencyMemory:
     
     def _get_trending_categories(self, messages) -> Dict:
         """Get trending emergency categories"""
-        categories = {}
-        for msg in messages:
-            cat = msg.ai_category  # Use ai_category field from model
-            if cat:  # Only count if category is not None/empty
-                categories[cat] = categories.get(cat, 0) + 1
-        return categories
+        return messages.value_counts('ai_category')
     
     def _get_severity_distribution(self, messages) -> Dict:
         """Get severity distribution"""
-        severities = {}
-        for msg in messages:
-            sev = msg.ai_severity  # Use ai_severity field from model
-            if sev:  # Only count if severity is not None/empty
-                severities[sev] = severities.get(sev, 0) + 1
-        return severities
+        return messages.value_counts('ai_severity')
     
     def _identify_geographic_clusters(self, messages, location: Dict) -> List[Dict]:
         """Identify geographic clusters of incidents"""
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_response', '0003_receivedmessage_conversation_status_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeoTileCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField(help_text='Tile zoom level')),
+                ('x', models.PositiveIntegerField(help_text='Tile column at this zoom')),
+                ('y', models.PositiveIntegerField(help_text='Tile row at this zoom')),
+                ('day', models.DateField(help_text='UTC day the messages were processed')),
+                ('category', models.CharField(help_text='AI classified category', max_length=100)),
+                ('severity', models.CharField(blank=True, help_text='AI severity assessment', max_length=4)),
+                ('count', models.PositiveIntegerField(default=0, help_text='Messages in this tile')),
+                ('lat_sum', models.FloatField(default=0.0, help_text='Sum of latitudes, for the centroid')),
+                ('lon_sum', models.FloatField(default=0.0, help_text='Sum of longitudes, for the centroid')),
+            ],
+            options={
+                'verbose_name': 'Geo Tile Count',
+                'verbose_name_plural': 'Geo Tile Counts',
+                'indexes': [models.Index(fields=['zoom', 'day'], name='first_respo_zoom_c885e5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('zoom', 'x', 'y', 'day', 'category', 'severity'), name='unique_geo_tile_count')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_response', '0004_geotilecount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, help_text='Label for the area', max_length=100)),
+                ('area_type', models.CharField(choices=[('circle', 'Point and radius'), ('polygon', 'Polygon')], help_text='Shape of the area', max_length=10)),
+                ('latitude', models.FloatField(blank=True, help_text='Circle center latitude', null=True)),
+                ('longitude', models.FloatField(blank=True, help_text='Circle center longitude', null=True)),
+                ('radius_km', models.FloatField(blank=True, help_text='Circle radius in kilometers', null=True)),
+                ('polygon', models.JSONField(blank=True, help_text='Polygon ring as [[lon, lat], ...]', null=True)),
+                ('categories', models.JSONField(blank=True, default=list, help_text='Categories to notify about (empty for all)')),
+                ('session_key', models.CharField(blank=True, db_index=True, help_text="Owner's session key", max_length=40)),
+                ('is_active', models.BooleanField(default=True, help_text='Whether the area is matched')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, help_text='Operator who registered the area', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alert_subscriptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Alert Subscription',
+                'verbose_name_plural': 'Alert Subscriptions',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SubscriptionNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('alert', 'Emergency Alert'), ('message', 'Critical Message')], max_length=10)),
+                ('alert_key', models.CharField(blank=True, help_text='Stable key of the matched alert area', max_length=100)),
+                ('category', models.CharField(blank=True, max_length=100)),
+                ('severity', models.CharField(blank=True, max_length=4)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('payload', models.JSONField(default=dict, help_text='Alert or message summary')),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(blank=True, help_text='Matched message (critical messages)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='first_response.receivedmessage')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='first_response.alertsubscription')),
+            ],
+            options={
+                'verbose_name': 'Subscription Notification',
+                'verbose_name_plural': 'Subscription Notifications',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['subscription', 'created_at'], name='first_respo_subscri_7c8da4_idx'), models.Index(fields=['alert_key', 'created_at'], name='first_respo_alert_k_5fe434_idx')],
+            },
+        ),
+    ]
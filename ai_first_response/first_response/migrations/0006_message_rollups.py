@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_response', '0005_alert_subscriptions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Start of the UTC hour the messages were received in')),
+                ('category', models.CharField(blank=True, help_text='AI classified category', max_length=100)),
+                ('severity', models.CharField(blank=True, help_text='AI severity assessment (upper case)', max_length=4)),
+                ('language', models.CharField(blank=True, help_text='Language of the messages', max_length=10)),
+                ('message_type', models.CharField(blank=True, help_text='Type of the messages', max_length=10)),
+                ('has_error', models.BooleanField(default=False, help_text='Whether processing had errors')),
+                ('count', models.IntegerField(default=0, help_text='Messages')),
+                ('processed', models.IntegerField(default=0, help_text='Messages the AI finished processing')),
+                ('response_time_count', models.IntegerField(default=0, help_text='Messages with a response time')),
+                ('response_time_total', models.BigIntegerField(default=0, help_text='Sum of response times (ms)')),
+                ('starters', models.IntegerField(default=0, help_text='Conversation starters')),
+                ('follow_ups', models.IntegerField(default=0, help_text='Follow-up messages')),
+                ('starter_replies', models.IntegerField(default=0, help_text='Follow-ups whose parent starts a conversation')),
+                ('active_conversations', models.IntegerField(default=0, help_text='Root messages of active conversations')),
+            ],
+            options={
+                'verbose_name': 'Message Rollup',
+                'verbose_name_plural': 'Message Rollups',
+                'constraints': [models.UniqueConstraint(fields=('hour', 'category', 'severity', 'language', 'message_type', 'has_error'), name='unique_message_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_response', '0006_message_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receivedmessage',
+            name='follow_up_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of direct follow-up messages'),
+        ),
+        migrations.AddField(
+            model_name='receivedmessage',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, help_text='When the latest message of the conversation was received', null=True),
+        ),
+        migrations.AddField(
+            model_name='receivedmessage',
+            name='latest_category',
+            field=models.CharField(blank=True, help_text='Category of the latest processed message in the conversation', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='receivedmessage',
+            name='latest_severity',
+            field=models.CharField(blank=True, help_text='Severity of the latest processed message in the conversation', max_length=4),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_response', '0007_conversation_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatencyHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(help_text='Pipeline stage', max_length=20)),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], help_text='Length of the period', max_length=10)),
+                ('period_start', models.DateTimeField(help_text='Start of the UTC minute or hour')),
+                ('count', models.PositiveIntegerField(default=0, help_text='Measured runs')),
+                ('sum_ms', models.FloatField(default=0.0, help_text='Sum of durations (ms)')),
+                ('counts', models.JSONField(default=dict, help_text='Runs per non-empty bucket, as {bucket: count}')),
+            ],
+            options={
+                'verbose_name': 'Latency Histogram',
+                'verbose_name_plural': 'Latency Histograms',
+                'indexes': [models.Index(fields=['resolution', 'period_start'], name='first_respo_resolut_bd24b7_idx')],
+                'constraints': [models.UniqueConstraint(fields=('stage', 'resolution', 'period_start'), name='unique_latency_histogram')],
+            },
+        ),
+    ]
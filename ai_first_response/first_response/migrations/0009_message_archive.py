@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_response', '0008_stage_latency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(help_text='Id the message had in ReceivedMessage', primary_key=True, serialize=False)),
+                ('root_id', models.BigIntegerField(db_index=True, help_text='Id of the message that started the conversation')),
+                ('parent_id', models.BigIntegerField(blank=True, help_text='Parent message id if this is a follow-up', null=True)),
+                ('parent_is_starter', models.BooleanField(default=False, help_text='Whether the parent starts a conversation')),
+                ('conversation_step', models.PositiveIntegerField(default=1, help_text='Step number in conversation (1=initial)')),
+                ('is_conversation_starter', models.BooleanField(default=True, help_text='Whether this starts a new conversation')),
+                ('conversation_status', models.CharField(blank=True, help_text='Status of the conversation', max_length=20)),
+                ('message_type', models.CharField(blank=True, help_text='Type of message', max_length=10)),
+                ('language', models.CharField(blank=True, help_text='Language of the message', max_length=10)),
+                ('ai_category', models.CharField(blank=True, help_text='AI classified category', max_length=100)),
+                ('ai_severity', models.CharField(blank=True, help_text='AI classified severity level', max_length=4)),
+                ('user_latitude', models.FloatField(help_text="User's latitude coordinate")),
+                ('user_longitude', models.FloatField(help_text="User's longitude coordinate")),
+                ('response_time_ms', models.PositiveIntegerField(blank=True, help_text='Response time in milliseconds', null=True)),
+                ('has_error', models.BooleanField(default=False, help_text='Whether processing had errors')),
+                ('session_key', models.CharField(blank=True, help_text="User's session key", max_length=40)),
+                ('received_at', models.DateTimeField(help_text='When message was received')),
+                ('processed_at', models.DateTimeField(blank=True, help_text='When AI finished processing', null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True, help_text='When the message was archived')),
+                ('payload', models.BinaryField(help_text='zlib-compressed JSON of the message texts and AI instructions')),
+            ],
+            options={
+                'verbose_name': 'Archived Message',
+                'verbose_name_plural': 'Archived Messages',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['received_at'], name='first_respo_receive_21274c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from first_response.search import install_search_index
+    install_search_index(schema_editor)
+
+
+def uninstall(apps, schema_editor):
+    from first_response.search import uninstall_search_index
+    uninstall_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+    """Full-text index on messages: tsvector + GIN on PostgreSQL, FTS5 on SQLite (see search.py)"""
+
+    dependencies = [
+        ('first_response', '0009_message_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
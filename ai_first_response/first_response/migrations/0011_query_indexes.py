@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_response', '0010_message_search'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='receivedmessage',
+            name='first_respo_ai_cate_32e963_idx',
+        ),
+        migrations.AddIndex(
+            model_name='receivedmessage',
+            index=models.Index(fields=['processed_at', 'ai_category'], name='msg_processed_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receivedmessage',
+            index=models.Index(fields=['received_at', 'ai_category', 'ai_severity'], name='msg_received_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receivedmessage',
+            index=models.Index(fields=['ai_category', 'received_at'], name='msg_category_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receivedmessage',
+            index=models.Index(fields=['conversation_status', 'parent_message', 'received_at'], name='msg_conversation_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receivedmessage',
+            index=models.Index(fields=['is_conversation_starter', 'received_at'], name='msg_starter_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receivedmessage',
+            index=models.Index(condition=models.Q(('has_error', True)), fields=['-received_at'], name='msg_error_recent_idx'),
+        ),
+    ]
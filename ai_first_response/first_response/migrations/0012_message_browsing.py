@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_response', '0011_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='receivedmessage',
+            name='first_respo_receive_3c449f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='receivedmessage',
+            index=models.Index(fields=['received_at', 'id'], name='msg_received_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receivedmessage',
+            index=models.Index(fields=['parent_message', 'received_at', 'id'], name='msg_parent_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receivedmessage',
+            index=models.Index(fields=['session_key', 'received_at'], name='msg_session_received_idx'),
+        ),
+    ]
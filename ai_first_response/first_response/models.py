@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
@@ -68,6 +69,15 @@ class ReceivedMessage(models.Model):
                                          choices=[('active', 'Active'), ('completed', 'Completed'), ('abandoned', 'Abandoned')],
                                          help_text="Status of the conversation")
     
+    # Denormalized from this message and its direct follow-ups (see conversations.py)
+    follow_up_count = models.PositiveIntegerField(default=0, help_text="Number of direct follow-up messages")
+    last_activity_at = models.DateTimeField(null=True, blank=True,
+                                            help_text="When the latest message of the conversation was received")
+    latest_severity = models.CharField(max_length=4, blank=True,
+                                       help_text="Severity of the latest processed message in the conversation")
+    latest_category = models.CharField(max_length=100, blank=True,
+                                       help_text="Category of the latest processed message in the conversation")
+    
     # Context data
     external_feed = models.TextField(blank=True, help_text="External data feed used for context")
     response_time_ms = models.PositiveIntegerField(null=True, blank=True, 
@@ -92,10 +102,28 @@ class ReceivedMessage(models.Model):
         verbose_name_plural = "Received Messages"
         ordering = ['-received_at']
         indexes = [
-            models.Index(fields=['received_at']),
+            # Keyset pagination: newest first, ties broken by id (also serves received_at ranges)
+            models.Index(fields=['received_at', 'id'], name='msg_received_keyset_idx'),
             models.Index(fields=['ai_severity']),
-            models.Index(fields=['ai_category']),
             models.Index(fields=['user_latitude', 'user_longitude']),
+            # Matched to the hot queries (benchmark_indexes measures each one with and without them)
+            # Alert, hotspot and clustering windows: processed_at range, 'Unknown' category excluded
+            models.Index(fields=['processed_at', 'ai_category'], name='msg_processed_window_idx'),
+            # Received-time windows counted by category and severity
+            models.Index(fields=['received_at', 'ai_category', 'ai_severity'], name='msg_received_category_idx'),
+            # One category, newest first (replaces the single-column category index)
+            models.Index(fields=['ai_category', 'received_at'], name='msg_category_received_idx'),
+            # Open conversations (roots still active)
+            models.Index(fields=['conversation_status', 'parent_message', 'received_at'],
+                         name='msg_conversation_status_idx'),
+            # Conversation starters or follow-ups in a time window
+            models.Index(fields=['is_conversation_starter', 'received_at'], name='msg_starter_received_idx'),
+            # Conversation pages: starters (parent IS NULL) newest first, or one message's follow-ups
+            models.Index(fields=['parent_message', 'received_at', 'id'], name='msg_parent_keyset_idx'),
+            # A session's own messages, newest first
+            models.Index(fields=['session_key', 'received_at'], name='msg_session_received_idx'),
+            # Failed messages, newest first (has_error is compared as a literal, so the partial index applies)
+            models.Index(fields=['-received_at'], name='msg_error_recent_idx', condition=models.Q(has_error=True)),
         ]
     
     def __str__(self):
@@ -120,3 +148,203 @@ class ReceivedMessage(models.Model):
             return f"{self.response_time_ms}ms"
         else:
             return f"{self.response_time_ms/1000:.1f}s"
+
+
+class GeoTileCount(models.Model):
+    """Per-day message counts in a Web Mercator map tile, by category and severity"""
+    zoom = models.PositiveSmallIntegerField(help_text="Tile zoom level")
+    x = models.PositiveIntegerField(help_text="Tile column at this zoom")
+    y = models.PositiveIntegerField(help_text="Tile row at this zoom")
+    day = models.DateField(help_text="UTC day the messages were processed")
+    category = models.CharField(max_length=100, help_text="AI classified category")
+    severity = models.CharField(max_length=4, blank=True, help_text="AI severity assessment")
+    
+    count = models.PositiveIntegerField(default=0, help_text="Messages in this tile")
+    lat_sum = models.FloatField(default=0.0, help_text="Sum of latitudes, for the centroid")
+    lon_sum = models.FloatField(default=0.0, help_text="Sum of longitudes, for the centroid")
+    
+    class Meta:
+        verbose_name = "Geo Tile Count"
+        verbose_name_plural = "Geo Tile Counts"
+        constraints = [
+            models.UniqueConstraint(fields=['zoom', 'x', 'y', 'day', 'category', 'severity'],
+                                    name='unique_geo_tile_count'),
+        ]
+        indexes = [
+            models.Index(fields=['zoom', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"z{self.zoom}/{self.x}/{self.y} {self.day} {self.category}/{self.severity}: {self.count}"
+
+
+class MessageRollup(models.Model):
+    """Per-hour message counts by category, severity, language, type and error flag"""
+    hour = models.DateTimeField(help_text="Start of the UTC hour the messages were received in")
+    category = models.CharField(max_length=100, blank=True, help_text="AI classified category")
+    severity = models.CharField(max_length=4, blank=True, help_text="AI severity assessment (upper case)")
+    language = models.CharField(max_length=10, blank=True, help_text="Language of the messages")
+    message_type = models.CharField(max_length=10, blank=True, help_text="Type of the messages")
+    has_error = models.BooleanField(default=False, help_text="Whether processing had errors")
+    
+    count = models.IntegerField(default=0, help_text="Messages")
+    processed = models.IntegerField(default=0, help_text="Messages the AI finished processing")
+    response_time_count = models.IntegerField(default=0, help_text="Messages with a response time")
+    response_time_total = models.BigIntegerField(default=0, help_text="Sum of response times (ms)")
+    starters = models.IntegerField(default=0, help_text="Conversation starters")
+    follow_ups = models.IntegerField(default=0, help_text="Follow-up messages")
+    starter_replies = models.IntegerField(default=0, help_text="Follow-ups whose parent starts a conversation")
+    active_conversations = models.IntegerField(default=0, help_text="Root messages of active conversations")
+    
+    class Meta:
+        verbose_name = "Message Rollup"
+        verbose_name_plural = "Message Rollups"
+        constraints = [
+            models.UniqueConstraint(fields=['hour', 'category', 'severity', 'language', 'message_type', 'has_error'],
+                                    name='unique_message_rollup'),
+        ]
+    
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H}:00 {self.category}/{self.severity}: {self.count}"
+
+
+class ArchivedMessage(models.Model):
+    """
+    Compact copy of a message moved out of ReceivedMessage by the retention
+    command (see retention.py). Keeps the id, conversation links and the
+    columns the rollups and map tiles are computed from; the texts and AI
+    instructions are stored zlib-compressed in `payload`, and the client IP
+    and user agent are dropped.
+    """
+    id = models.BigIntegerField(primary_key=True, help_text="Id the message had in ReceivedMessage")
+    root_id = models.BigIntegerField(db_index=True, help_text="Id of the message that started the conversation")
+    parent_id = models.BigIntegerField(null=True, blank=True, help_text="Parent message id if this is a follow-up")
+    parent_is_starter = models.BooleanField(default=False, help_text="Whether the parent starts a conversation")
+    conversation_step = models.PositiveIntegerField(default=1, help_text="Step number in conversation (1=initial)")
+    is_conversation_starter = models.BooleanField(default=True, help_text="Whether this starts a new conversation")
+    conversation_status = models.CharField(max_length=20, blank=True, help_text="Status of the conversation")
+    
+    message_type = models.CharField(max_length=10, blank=True, help_text="Type of message")
+    language = models.CharField(max_length=10, blank=True, help_text="Language of the message")
+    ai_category = models.CharField(max_length=100, blank=True, help_text="AI classified category")
+    ai_severity = models.CharField(max_length=4, blank=True, help_text="AI classified severity level")
+    user_latitude = models.FloatField(help_text="User's latitude coordinate")
+    user_longitude = models.FloatField(help_text="User's longitude coordinate")
+    response_time_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Response time in milliseconds")
+    has_error = models.BooleanField(default=False, help_text="Whether processing had errors")
+    session_key = models.CharField(max_length=40, blank=True, help_text="User's session key")
+    
+    received_at = models.DateTimeField(help_text="When message was received")
+    processed_at = models.DateTimeField(null=True, blank=True, help_text="When AI finished processing")
+    archived_at = models.DateTimeField(auto_now_add=True, help_text="When the message was archived")
+    
+    payload = models.BinaryField(help_text="zlib-compressed JSON of the message texts and AI instructions")
+    
+    class Meta:
+        verbose_name = "Archived Message"
+        verbose_name_plural = "Archived Messages"
+        ordering = ['-received_at']
+        indexes = [
+            models.Index(fields=['received_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.ai_category or 'Unknown'} #{self.id} ({self.received_at.strftime('%Y-%m-%d %H:%M')}, archived)"
+
+
+class LatencyHistogram(models.Model):
+    """Log-bucketed latency histogram of one pipeline stage over a minute or an hour (see latency.py)"""
+    
+    RESOLUTION_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+    ]
+    
+    stage = models.CharField(max_length=20, help_text="Pipeline stage")
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES, help_text="Length of the period")
+    period_start = models.DateTimeField(help_text="Start of the UTC minute or hour")
+    count = models.PositiveIntegerField(default=0, help_text="Measured runs")
+    sum_ms = models.FloatField(default=0.0, help_text="Sum of durations (ms)")
+    counts = models.JSONField(default=dict, help_text="Runs per non-empty bucket, as {bucket: count}")
+    
+    class Meta:
+        verbose_name = "Latency Histogram"
+        verbose_name_plural = "Latency Histograms"
+        constraints = [
+            models.UniqueConstraint(fields=['stage', 'resolution', 'period_start'], name='unique_latency_histogram'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'period_start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.stage} {self.resolution} {self.period_start:%Y-%m-%d %H:%M}: {self.count}"
+
+
+class AlertSubscription(models.Model):
+    """Area of interest registered by a citizen or an operator"""
+    
+    AREA_TYPE_CHOICES = [
+        ('circle', 'Point and radius'),
+        ('polygon', 'Polygon'),
+    ]
+    
+    name = models.CharField(max_length=100, blank=True, help_text="Label for the area")
+    area_type = models.CharField(max_length=10, choices=AREA_TYPE_CHOICES, help_text="Shape of the area")
+    latitude = models.FloatField(null=True, blank=True, help_text="Circle center latitude")
+    longitude = models.FloatField(null=True, blank=True, help_text="Circle center longitude")
+    radius_km = models.FloatField(null=True, blank=True, help_text="Circle radius in kilometers")
+    polygon = models.JSONField(null=True, blank=True, help_text="Polygon ring as [[lon, lat], ...]")
+    categories = models.JSONField(default=list, blank=True, help_text="Categories to notify about (empty for all)")
+    
+    session_key = models.CharField(max_length=40, blank=True, db_index=True, help_text="Owner's session key")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL,
+                                   related_name='alert_subscriptions', help_text="Operator who registered the area")
+    is_active = models.BooleanField(default=True, help_text="Whether the area is matched")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Alert Subscription"
+        verbose_name_plural = "Alert Subscriptions"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        if self.area_type == 'circle':
+            return f"{self.name or 'Area'} ({self.latitude:.4f}, {self.longitude:.4f}, {self.radius_km} km)"
+        return f"{self.name or 'Area'} (polygon)"
+
+
+class SubscriptionNotification(models.Model):
+    """An alert or critical message that matched a subscription's area"""
+    
+    KIND_CHOICES = [
+        ('alert', 'Emergency Alert'),
+        ('message', 'Critical Message'),
+    ]
+    
+    subscription = models.ForeignKey(AlertSubscription, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    message = models.ForeignKey(ReceivedMessage, null=True, blank=True, on_delete=models.SET_NULL,
+                                related_name='notifications', help_text="Matched message (critical messages)")
+    alert_key = models.CharField(max_length=100, blank=True, help_text="Stable key of the matched alert area")
+    category = models.CharField(max_length=100, blank=True)
+    severity = models.CharField(max_length=4, blank=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    payload = models.JSONField(default=dict, help_text="Alert or message summary")
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Subscription Notification"
+        verbose_name_plural = "Subscription Notifications"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['subscription', 'created_at']),
+            models.Index(fields=['alert_key', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.subscription_id}: {self.category}"
@@ -0,0 +1,184 @@
+"""
+Message Retention
+Moves conversations whose every message is older than the retention age out
+of ReceivedMessage into the compact ArchivedMessage table, so the hot table
+and its indexes only hold recent traffic.
+
+Conversations move whole (a starter and all its follow-ups, at any depth) and
+only once nothing in them is newer than the cutoff. Archived messages were
+already counted in the hourly rollups and map tiles on ingest; they keep the
+columns those are computed from, so rebuild_rollups and rebuild_tiles still
+include them.
+"""
+import json
+import logging
+import zlib
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .conversations import conversation_thread
+from .models import ArchivedMessage, ReceivedMessage
+
+logger = logging.getLogger(__name__)
+
+# ReceivedMessage fields kept only inside the compressed payload
+PAYLOAD_FIELDS = ('message_text', 'user_message', 'ai_instructions', 'needs_follow_up', 'follow_up_question',
+                  'external_feed', 'error_message', 'is_test_message')
+
+
+def retention_cutoff(now=None, days=None):
+    """Messages received before this are archived"""
+    if days is None:
+        days = getattr(settings, 'MESSAGE_RETENTION_DAYS', 90)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def compress_payload(message):
+    """zlib-compressed JSON of a message's texts (user_message only when it differs from message_text)"""
+    payload = {name: getattr(message, name) for name in PAYLOAD_FIELDS}
+    if payload['user_message'] == payload['message_text']:
+        del payload['user_message']
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def decompress_payload(data):
+    payload = json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+    payload.setdefault('user_message', payload.get('message_text', ''))
+    return payload
+
+
+def _archived(message, root_id, parent):
+    return ArchivedMessage(
+        id=message.id, root_id=root_id, parent_id=message.parent_message_id,
+        parent_is_starter=bool(parent and parent.is_conversation_starter),
+        conversation_step=message.conversation_step, is_conversation_starter=message.is_conversation_starter,
+        conversation_status=message.conversation_status, message_type=message.message_type,
+        language=message.language, ai_category=message.ai_category, ai_severity=message.ai_severity,
+        user_latitude=message.user_latitude, user_longitude=message.user_longitude,
+        response_time_ms=message.response_time_ms, has_error=message.has_error,
+        session_key=message.session_key, received_at=message.received_at,
+        processed_at=message.processed_at, payload=compress_payload(message)
+    )
+
+
+def _conversation_trees(roots):
+    """{root id: [messages]} with every follow-up below each root, one query per conversation depth"""
+    root_of = {root.id: root.id for root in roots}
+    trees = {root.id: [root] for root in roots}
+    frontier = list(root_of)
+    while frontier:
+        children = list(ReceivedMessage.objects.filter(parent_message_id__in=frontier).order_by())
+        frontier = []
+        for child in children:
+            if child.id in root_of:
+                continue
+            root_of[child.id] = root_of[child.parent_message_id]
+            trees[root_of[child.id]].append(child)
+            frontier.append(child.id)
+    return trees
+
+
+def archive_conversations(cutoff, batch_size=500, dry_run=False):
+    """
+    Archive every conversation whose messages were all received (and last
+    active) before `cutoff`, `batch_size` conversations per transaction.
+
+    Returns:
+        (conversations archived, messages archived)
+    """
+    archived_conversations = archived_messages = 0
+    last_id = 0
+    while True:
+        roots = list(ReceivedMessage.objects.filter(
+            Q(last_activity_at__isnull=True) | Q(last_activity_at__lt=cutoff),
+            parent_message__isnull=True, received_at__lt=cutoff, id__gt=last_id
+        ).order_by('id')[:batch_size])
+        if not roots:
+            break
+        last_id = roots[-1].id
+
+        trees = {
+            root_id: messages for root_id, messages in _conversation_trees(roots).items()
+            if all(m.received_at < cutoff and (m.last_activity_at is None or m.last_activity_at < cutoff)
+                   for m in messages)
+        }
+        if dry_run:
+            archived_conversations += len(trees)
+            archived_messages += sum(len(messages) for messages in trees.values())
+            continue
+
+        with transaction.atomic():
+            ids = [m.id for messages in trees.values() for m in messages]
+            # Lock the rows, then drop conversations that got a follow-up since they were read
+            active = set(ReceivedMessage.objects.select_for_update().filter(
+                id__in=ids, last_activity_at__gte=cutoff
+            ).values_list('id', flat=True))
+            active.update(ReceivedMessage.objects.filter(parent_message_id__in=ids).exclude(
+                id__in=ids
+            ).values_list('parent_message_id', flat=True))
+            if active:
+                trees = {root_id: messages for root_id, messages in trees.items()
+                         if not any(m.id in active for m in messages)}
+                ids = [m.id for messages in trees.values() for m in messages]
+
+            rows = []
+            for root_id, messages in trees.items():
+                by_id = {m.id: m for m in messages}
+                rows.extend(_archived(m, root_id, by_id.get(m.parent_message_id)) for m in messages)
+            ArchivedMessage.objects.bulk_create(rows, batch_size=batch_size)
+            ReceivedMessage.objects.filter(id__in=ids).delete()
+
+        archived_conversations += len(trees)
+        archived_messages += len(rows)
+        logger.info(f"Archived {len(trees)} conversations ({len(rows)} messages) up to id {last_id}")
+    return archived_conversations, archived_messages
+
+
+def message_to_dict(message):
+    """API representation of a stored or archived message"""
+    if isinstance(message, ArchivedMessage):
+        texts = decompress_payload(message.payload)
+        parent_id = message.parent_id
+    else:
+        texts = {name: getattr(message, name) for name in PAYLOAD_FIELDS}
+        parent_id = message.parent_message_id
+    return {
+        'id': message.id,
+        'parent_id': parent_id,
+        'conversation_step': message.conversation_step,
+        'is_conversation_starter': message.is_conversation_starter,
+        'conversation_status': message.conversation_status,
+        'message_type': message.message_type,
+        'language': message.language,
+        'message_text': texts['message_text'],
+        'ai_category': message.ai_category,
+        'ai_severity': message.ai_severity,
+        'ai_instructions': texts['ai_instructions'],
+        'needs_follow_up': texts['needs_follow_up'],
+        'follow_up_question': texts['follow_up_question'],
+        'latitude': message.user_latitude,
+        'longitude': message.user_longitude,
+        'response_time_ms': message.response_time_ms,
+        'has_error': message.has_error,
+        'received_at': message.received_at.isoformat(),
+        'processed_at': message.processed_at.isoformat() if message.processed_at else None,
+    }
+
+
+def find_conversation(message_id):
+    """
+    The whole conversation containing a message, whether it is stored or archived.
+
+    Returns:
+        (archived, messages in the order received) or None if the message is unknown
+    """
+    messages = conversation_thread(message_id)
+    if messages:
+        return False, messages
+
+    archived = ArchivedMessage.objects.filter(id=message_id).first()
+    if archived is None:
+        return None
+    return True, list(ArchivedMessage.objects.filter(root_id=archived.root_id).order_by('received_at', 'id'))
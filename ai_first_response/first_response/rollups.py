@@ -0,0 +1,253 @@
+"""
+Hourly Message Rollups
+Per-hour message counts by category, severity, language, message type and
+error flag, kept up to date on ingest. The admin dashboard reads its numbers
+and charts from these rows, so a page view scans at most a few thousand
+rollup rows however large the message table grows.
+
+Messages are bucketed by the hour they were received, like the dashboard's
+series. Deletions and bulk edits outside the ingest hooks are not tracked;
+`rebuild_rollups` recomputes any range from the stored and archived messages.
+"""
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncHour, Upper
+from .models import ArchivedMessage, MessageRollup, ReceivedMessage
+
+# Measures summed by the dashboard, with the message condition each one counts
+MEASURES = ('count', 'processed', 'response_time_count', 'response_time_total',
+            'starters', 'follow_ups', 'starter_replies', 'active_conversations')
+
+DIMENSIONS = ('hour', 'category', 'severity', 'language', 'message_type', 'has_error')
+
+
+def _parent_is_starter(message):
+    """Whether a follow-up's parent starts a conversation, without loading the parent when it is not cached"""
+    if ReceivedMessage.parent_message.is_cached(message):
+        return bool(message.parent_message.is_conversation_starter)
+    return ReceivedMessage.objects.filter(id=message.parent_message_id, is_conversation_starter=True).exists()
+
+
+def contribution(message, parent_is_starter=None):
+    """
+    What a message adds to the rollups: (dimension values, measure values).
+    Take it before changing a counted message and pass it to record_message
+    as `previous`, so the message is moved between buckets instead of counted twice.
+
+    Args:
+        message: The ReceivedMessage
+        parent_is_starter: Whether its parent starts a conversation, when the
+            caller knows; otherwise read from the loaded parent (one small
+            query if it is not loaded)
+    """
+    key = (
+        message.received_at.replace(minute=0, second=0, microsecond=0),
+        message.ai_category or '',
+        (message.ai_severity or '').upper(),
+        message.language or '',
+        message.message_type or '',
+        bool(message.has_error),
+    )
+    timed = message.response_time_ms is not None
+    is_reply = message.parent_message_id is not None
+    if is_reply and parent_is_starter is None:
+        parent_is_starter = _parent_is_starter(message)
+    measures = {
+        'count': 1,
+        'processed': int(message.processed_at is not None),
+        'response_time_count': int(timed),
+        'response_time_total': message.response_time_ms if timed else 0,
+        'starters': int(bool(message.is_conversation_starter)),
+        'follow_ups': int((message.conversation_step or 1) > 1),
+        'starter_replies': int(is_reply and bool(parent_is_starter)),
+        'active_conversations': int(message.parent_message_id is None and message.conversation_status == 'active'),
+    }
+    return key, measures
+
+
+def _apply(key, measures, sign):
+    lookup = dict(zip(DIMENSIONS, key))
+    increments = {name: F(name) + sign * value for name, value in measures.items() if value}
+    if not increments or MessageRollup.objects.filter(**lookup).update(**increments):
+        return
+    if sign < 0:
+        return  # Nothing to take back (the range was rebuilt without it)
+    try:
+        with transaction.atomic():
+            MessageRollup.objects.create(**lookup, **measures)
+    except IntegrityError:
+        # Another worker created the row first
+        MessageRollup.objects.filter(**lookup).update(**increments)
+
+
+def record_message(message, previous=None, parent_is_starter=None):
+    """
+    Count a processed message.
+
+    Args:
+        message: The saved ReceivedMessage
+        previous: contribution() of the message as it was last counted, when
+            it was counted before; its measures are taken back first
+        parent_is_starter: Passed on to contribution()
+    """
+    current = contribution(message, parent_is_starter)
+    if previous == current:
+        return
+    if previous is not None:
+        _apply(*previous, -1)
+    _apply(*current, 1)
+
+
+# Per model: (lookup of "the parent starts a conversation", lookup of "has no parent")
+_PARENT_LOOKUPS = {
+    ReceivedMessage: ('parent_message__is_conversation_starter', 'parent_message__isnull'),
+    ArchivedMessage: ('parent_is_starter', 'parent_id__isnull'),
+}
+
+
+def _grouped(messages):
+    """Rollup rows for a ReceivedMessage or ArchivedMessage queryset, aggregated by the database"""
+    parent_is_starter, parent_isnull = _PARENT_LOOKUPS[messages.model]
+    return messages.annotate(
+        rollup_hour=TruncHour('received_at'),
+        rollup_severity=Upper('ai_severity'),
+    ).values(
+        'rollup_hour', 'ai_category', 'rollup_severity', 'language', 'message_type', 'has_error'
+    ).annotate(
+        count=Count('id'),
+        processed=Count('id', filter=Q(processed_at__isnull=False)),
+        response_time_count=Count('response_time_ms'),
+        response_time_total=Coalesce(Sum('response_time_ms'), 0),
+        starters=Count('id', filter=Q(is_conversation_starter=True)),
+        follow_ups=Count('id', filter=Q(conversation_step__gt=1)),
+        starter_replies=Count('id', filter=Q(**{parent_is_starter: True})),
+        active_conversations=Count('id', filter=Q(**{parent_isnull: True}, conversation_status='active')),
+    ).order_by()
+
+
+def conversations_closed(messages):
+    """
+    Take conversations that are about to leave the 'active' status out of the
+    active count. Call with the queryset before updating it in bulk.
+    """
+    active = messages.filter(parent_message__isnull=True, conversation_status='active')
+    for row in _grouped(active).values_list('rollup_hour', 'ai_category', 'rollup_severity', 'language',
+                                            'message_type', 'has_error', 'active_conversations'):
+        MessageRollup.objects.filter(**dict(zip(DIMENSIONS, row[:-1]))).update(
+            active_conversations=F('active_conversations') - row[-1]
+        )
+
+
+def rebuild_rollups(since=None, batch_size=2000):
+    """
+    Recompute the rollups from the stored and archived messages (all of them,
+    or those received on or after the `since` datetime, rounded down to the
+    hour). Returns the number of rollup rows written.
+    """
+    messages = ReceivedMessage.objects.all()
+    archived = ArchivedMessage.objects.all()
+    rollups = MessageRollup.objects.all()
+    if since is not None:
+        since = since.replace(minute=0, second=0, microsecond=0)
+        messages = messages.filter(received_at__gte=since)
+        archived = archived.filter(received_at__gte=since)
+        rollups = rollups.filter(hour__gte=since)
+
+    # An hour can hold both stored and archived messages: sum the two groupings
+    totals = {}
+    for grouped in (_grouped(messages), _grouped(archived)):
+        for row in grouped.iterator(chunk_size=batch_size):
+            key = (row['rollup_hour'], row['ai_category'], row['rollup_severity'] or '', row['language'],
+                   row['message_type'], row['has_error'])
+            measures = totals.setdefault(key, dict.fromkeys(MEASURES, 0))
+            for name in MEASURES:
+                measures[name] += row[name]
+    rows = [MessageRollup(**dict(zip(DIMENSIONS, key)), **measures) for key, measures in totals.items()]
+    with transaction.atomic():
+        rollups.delete()
+        MessageRollup.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def headline_stats(now):
+    """
+    Headline numbers of the admin dashboard and the 24h runtime statistics of
+    the system status, in a single aggregate() over the rollups.
+
+    Time windows start on an hour boundary and follow the hour a message was
+    received: messages_24h counts the processed messages received in the last
+    24 hours, where the per-message query used processed_at. Processing takes
+    seconds, so the two differ by at most the messages of the oldest hour.
+    follow_ups_today counts messages received today with conversation_step > 1,
+    as before.
+    """
+    last_30_days = Q(hour__gte=now - timedelta(days=30))
+    today = Q(hour__gte=now.replace(hour=0, minute=0, second=0, microsecond=0))
+    last_24h = Q(hour__gte=now - timedelta(hours=24))
+    processed_24h = last_24h & Q(processed__gt=0)
+
+    totals = MessageRollup.objects.aggregate(
+        total_messages=Coalesce(Sum('count'), 0),
+        messages_last_30_days=Coalesce(Sum('count', filter=last_30_days), 0),
+        critical_messages=Coalesce(Sum('count', filter=Q(severity__in=['CRIT', 'HIGH'])), 0),
+        timed=Coalesce(Sum('response_time_count'), 0),
+        timed_total=Coalesce(Sum('response_time_total'), 0),
+        total_processed=Coalesce(Sum('processed'), 0),
+        error_count=Coalesce(Sum('count', filter=Q(has_error=True)), 0),
+        conversations_active=Coalesce(Sum('active_conversations'), 0),
+        follow_ups_today=Coalesce(Sum('follow_ups', filter=today), 0),
+        starter_count=Coalesce(Sum('starters'), 0),
+        reply_count=Coalesce(Sum('starter_replies'), 0),
+        messages_24h=Coalesce(Sum('processed', filter=last_24h), 0),
+        timed_24h=Coalesce(Sum('response_time_count', filter=processed_24h), 0),
+        timed_total_24h=Coalesce(Sum('response_time_total', filter=processed_24h), 0),
+        categories_24h=Count('category', filter=processed_24h, distinct=True),
+        severities_24h=Count('severity', filter=processed_24h, distinct=True),
+    )
+
+    starters, replies = totals.pop('starter_count'), totals.pop('reply_count')
+    totals['avg_conversation_length'] = (starters + replies) / starters if starters else 1.0
+    timed, timed_total = totals.pop('timed'), totals.pop('timed_total')
+    totals['avg_response_time'] = timed_total / timed if timed else None
+    timed, timed_total = totals.pop('timed_24h'), totals.pop('timed_total_24h')
+    totals['avg_response_time_24h'] = timed_total / timed if timed else None
+    return totals
+
+
+def dashboard_stats(now):
+    """
+    Everything the admin dashboard shows, read from the rollups.
+
+    Returns:
+        headline_stats() plus the severity, category, daily and hourly
+        series, shaped like the dashboard's former per-message queries
+    """
+    stats = headline_stats(now)
+    rollups = MessageRollup.objects.all()
+
+    known = [value for value, _ in ReceivedMessage.SEVERITY_CHOICES]
+    stats['severity_stats'] = rollups.annotate(
+        normalized_severity=Case(
+            *[When(severity=value, then=Value(value)) for value in known],
+            default=Value('UNKNOWN')
+        )
+    ).values('normalized_severity').annotate(count=Sum('count')).order_by('-count')
+
+    stats['category_stats'] = rollups.annotate(ai_category=F('category')).values('ai_category').annotate(
+        count=Sum('count')
+    ).order_by('-count')[:10]  # Top 10 categories
+
+    stats['daily_stats'] = _series(rollups.filter(hour__gte=now - timedelta(days=30)), 'day',
+                                   lambda hour: hour.replace(hour=0))
+    stats['hourly_stats'] = _series(rollups.filter(hour__gte=now - timedelta(hours=24)), 'hour', lambda hour: hour)
+    return stats
+
+
+def _series(rollups, field, bucket):
+    """[{field: bucket start, 'count': n}] in time order, from per-hour totals"""
+    counts = {}
+    for hour, count in rollups.values('hour').annotate(total=Sum('count')).values_list('hour', 'total').order_by():
+        start = bucket(hour)
+        counts[start] = counts.get(start, 0) + count
+    return [{field: start, 'count': counts[start]} for start in sorted(counts)]
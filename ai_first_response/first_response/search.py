@@ -0,0 +1,131 @@
+"""
+Message Full-Text Search
+Indexes the user message, transcription, follow-up question and category of
+every ReceivedMessage in the database's own full-text engine, kept in sync by
+the database on every insert, update and delete:
+
+- PostgreSQL: a generated `search_vector` tsvector column with a GIN index,
+  stemmed with the 'italian' configuration for Italian messages and
+  'english' otherwise; queries are matched against both stemmings.
+- SQLite: an external-content FTS5 table maintained by triggers, with the
+  porter (English) stemmer. SQLite has no Italian stemmer, so query terms
+  are also matched as prefixes ("incendi" finds "incendio").
+
+Other databases fall back to icontains filters.
+"""
+import re
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from .models import ReceivedMessage
+
+TABLE = ReceivedMessage._meta.db_table
+FTS_TABLE = 'first_response_message_fts'
+SEARCH_COLUMNS = ('user_message', 'message_text', 'follow_up_question', 'ai_category')
+
+# Generated column and index on PostgreSQL
+POSTGRES_DOCUMENT = " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS)
+POSTGRES_INSTALL = [
+    f"""ALTER TABLE {TABLE} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        to_tsvector(CASE WHEN language LIKE 'it%' THEN 'italian'::regconfig ELSE 'english'::regconfig END,
+                    {POSTGRES_DOCUMENT})
+    ) STORED""",
+    f"CREATE INDEX first_response_message_search ON {TABLE} USING GIN (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS first_response_message_search",
+    f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+POSTGRES_QUERY = "(websearch_to_tsquery('english', %s) || websearch_to_tsquery('italian', %s))"
+
+# FTS5 table and sync triggers on SQLite
+_columns = ', '.join(SEARCH_COLUMNS)
+_new = ', '.join(f"new.{column}" for column in SEARCH_COLUMNS)
+_old = ', '.join(f"old.{column}" for column in SEARCH_COLUMNS)
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({_columns}, content='{TABLE}', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF {_columns} ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new});
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+INSTALL = {'postgresql': POSTGRES_INSTALL, 'sqlite': SQLITE_INSTALL}
+UNINSTALL = {'postgresql': POSTGRES_UNINSTALL, 'sqlite': SQLITE_UNINSTALL}
+
+
+def install_search_index(schema_editor):
+    """Create the index for the schema editor's database (used by the migration)"""
+    for sql in INSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql, params=None)
+
+
+def uninstall_search_index(schema_editor):
+    for sql in UNINSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql, params=None)
+
+
+def _fts5_query(text):
+    """Every word of the search, as a quoted prefix term (FTS5 syntax characters never reach MATCH)"""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_condition(text):
+    """Boolean expression matching messages that contain every word of `text` (None if it has none)"""
+    if not re.search(r'\w', text or ''):
+        return None
+    if connection.vendor == 'postgresql':
+        return RawSQL(f"{TABLE}.search_vector @@ {POSTGRES_QUERY}", [text, text], output_field=BooleanField())
+    if connection.vendor == 'sqlite':
+        return RawSQL(f"{TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+                      [_fts5_query(text)], output_field=BooleanField())
+    condition = Q()
+    for word in text.split():
+        in_any_column = Q()
+        for column in SEARCH_COLUMNS:
+            in_any_column |= Q(**{f"{column}__icontains": word})
+        condition &= in_any_column
+    return condition
+
+
+def search_messages(queryset, text):
+    """The messages of `queryset` matching `text` (none if it has no words)"""
+    condition = search_condition(text)
+    if condition is None:
+        return queryset.none()
+    return queryset.filter(condition)
+
+
+def ranked_search(text, limit=20):
+    """Best matching messages first (ts_rank on PostgreSQL, bm25 on SQLite, newest first elsewhere)"""
+    messages = ReceivedMessage.objects.all()
+    if not re.search(r'\w', text or ''):
+        return []
+    if connection.vendor == 'postgresql':
+        return list(search_messages(messages, text).annotate(
+            rank=RawSQL(f"ts_rank({TABLE}.search_vector, {POSTGRES_QUERY})", [text, text], output_field=FloatField())
+        ).order_by('-rank', '-received_at')[:limit])
+    if connection.vendor == 'sqlite':
+        # Rank inside FTS5, then load only the rows of the page
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+                           [_fts5_query(text), limit])
+            ids = [row[0] for row in cursor.fetchall()]
+        found = messages.in_bulk(ids)
+        return [found[i] for i in ids if i in found]
+    return list(search_messages(messages, text).order_by('-received_at')[:limit])
@@ -0,0 +1,106 @@
+"""
+Database-Side Cluster Candidates
+Alternative alerts backend: the database buckets the time window into integer
+grid cells (floored lat/lon at the cluster radius) and returns one count per
+category and cell. Only the messages in dense neighborhoods, the only places a
+cluster can form, are fetched and clustered in Python. Uses portable ORM
+expressions, so it runs on both SQLite and PostgreSQL.
+"""
+from datetime import timedelta
+import numpy as np
+from django.db.models import Count, F, FloatField, IntegerField, Max, Min, Value
+from django.db.models.functions import Cast, Floor
+from django.utils import timezone
+from .analytics import load_columns
+from .clustering import build_alert, cluster_points, grid_shape
+from .models import ReceivedMessage
+
+# Candidate cells per IN (...) list, under SQLite's bound parameter limit
+IN_BATCH = 900
+
+
+def window_queryset(time_window_hours):
+    """Processed messages in the time window that can form alerts"""
+    return ReceivedMessage.objects.filter(
+        processed_at__gte=timezone.now() - timedelta(hours=time_window_hours),
+        user_latitude__isnull=False,
+        user_longitude__isnull=False,
+        ai_category__isnull=False
+    ).exclude(ai_category='Unknown').order_by()  # Unordered: the processed_at index drives the scan
+
+
+def _cell_expressions(dlat, col_width):
+    row = Cast(Floor((F('user_latitude') + Value(90.0)) / Value(dlat), output_field=FloatField()),
+               IntegerField())
+    col = Cast(Floor((F('user_longitude') + Value(180.0)) / Value(col_width), output_field=FloatField()),
+               IntegerField())
+    return row, col
+
+
+def _dense_cells(cell_counts, n_cols, min_count):
+    """Cells whose 3x3 neighborhood holds at least min_count messages, plus their neighbors"""
+    def neighbors(cell):
+        row, col = cell
+        return [(r, (col + dc) % n_cols) for r in (row - 1, row, row + 1) for dc in (-1, 0, 1)]
+
+    candidates = set()
+    for cell in cell_counts:
+        if sum(cell_counts.get(n, 0) for n in neighbors(cell)) >= min_count:
+            candidates.update(n for n in neighbors(cell) if n in cell_counts)
+    return candidates
+
+
+def sql_cluster_alerts(radius_km, min_count, time_window_hours):
+    """
+    Alerts for the time window, computed from database cell counts. Same
+    clusters as the in-memory backend.
+    """
+    window = window_queryset(time_window_hours)
+    bounds = window.aggregate(lowest=Min('user_latitude'), highest=Max('user_latitude'))
+    if bounds['lowest'] is None:
+        return []
+    dlat, n_cols = grid_shape(max(abs(bounds['lowest']), abs(bounds['highest'])), radius_km)
+    col_width = 360.0 / n_cols
+    row, col = _cell_expressions(dlat, col_width)
+
+    # One row per (category, cell) crosses the wire instead of one per message
+    per_category = {}
+    cell_rows = window.annotate(row=row, col=col).values('ai_category', 'row', 'col').annotate(
+        count=Count('id')
+    ).values_list('ai_category', 'row', 'col', 'count').order_by()
+    for category, r, c, count in cell_rows:
+        cells = per_category.setdefault(category, {})
+        cell = (r, c % n_cols)  # Longitude 180 floors to n_cols; it is column 0
+        cells[cell] = cells.get(cell, 0) + count
+
+    alerts = []
+    fields = ['id', 'user_latitude', 'user_longitude', 'processed_at', 'ai_severity']
+    for category, cell_counts in per_category.items():
+        if sum(cell_counts.values()) < min_count:
+            continue
+        candidates = _dense_cells(cell_counts, n_cols, min_count)
+        if not candidates:
+            continue
+
+        # Refine: fetch only the messages in dense neighborhoods
+        keys = sorted({r * (n_cols + 1) + c for r, c in candidates} |
+                      {r * (n_cols + 1) + n_cols for r, c in candidates if c == 0})
+        messages = window.filter(ai_category=category).annotate(
+            cell_key=row * Value(n_cols + 1) + col
+        )
+        parts = [load_columns(messages.filter(cell_key__in=keys[i:i + IN_BATCH]), fields,
+                              consumer='sql_clusters')
+                 for i in range(0, len(keys), IN_BATCH)]
+        points = [point for part in parts for point in zip(*(part.values(name) for name in fields))]
+        if len(points) < min_count:
+            continue
+
+        # Newest first, as the alerts endpoint has always clustered them
+        points.sort(key=lambda p: (p[3], p[0]), reverse=True)
+        lats = np.array([p[1] for p in points])
+        lons = np.array([p[2] for p in points])
+        for members in cluster_points(lats, lons, radius_km, min_count):
+            alerts.append(build_alert(category, [points[i] for i in members], radius_km))
+
+    alerts.sort(key=lambda x: x['count'], reverse=True)
+    return alerts
@@ -0,0 +1,94 @@
+"""
+Agentic System Status
+Builds the status summary shown on the system dashboard, shared by the status
+API endpoint and the live push channel.
+"""
+import logging
+from django.utils import timezone
+from .agentic_system import AgenticEmergencySystem
+from .analytics import get_query_stats
+from .latency import stage_latency
+from .metrics import agentic_metrics
+from .rollups import headline_stats
+
+logger = logging.getLogger(__name__)
+
+
+def build_agentic_status(agentic_system=None):
+    """
+    Status, agentic metrics and 24h runtime statistics for the system dashboard.
+    Long-lived callers pass their own AgenticEmergencySystem instead of building one per call.
+    """
+    # Initialize agentic system
+    if agentic_system is None:
+        agentic_system = AgenticEmergencySystem()
+    
+    # Get system status
+    status = agentic_system.get_system_status()
+    
+    # Get real metrics from the metrics system
+    metrics = agentic_metrics.get_all_metrics()
+    planner_metrics = metrics.get('planner', {})
+    executor_metrics = metrics.get('executor', {})
+    memory_metrics = metrics.get('memory', {})
+    
+    # Add runtime statistics with error handling
+    try:
+        # Same single rollup aggregate as the admin dashboard's headline numbers
+        stats = headline_stats(timezone.now())
+        
+        runtime_stats = {
+            'messages_24h': stats['messages_24h'],
+            'avg_response_time_ms': stats['avg_response_time_24h'] or 0,
+            'categories_processed': stats['categories_24h'],
+            'severities_handled': stats['severities_24h']
+        }
+        
+    except Exception as e:
+        logger.error(f"Error calculating runtime stats: {e}")
+        runtime_stats = {
+            'messages_24h': 0,
+            'avg_response_time_ms': 0,
+            'categories_processed': 0,
+            'severities_handled': 0
+        }
+    
+    # Per-stage latency percentiles, merged across workers
+    try:
+        latency = stage_latency.summary()
+    except Exception as e:
+        logger.error(f"Error calculating stage latency: {e}")
+        latency = {}
+    
+    # Format response for frontend compatibility
+    components = status.get('components', {})
+    
+    # Use real metrics from the metrics system
+    plans_generated = planner_metrics.get('plans_generated', 0)
+    plan_completeness = planner_metrics.get('completeness', 0)
+    actions_executed = executor_metrics.get('actions_executed', 0) 
+    execution_success = executor_metrics.get('success_rate', 0)
+    stored_patterns = memory_metrics.get('patterns_stored', 0)
+    context_hits = memory_metrics.get('context_hits', 0)
+    
+    response_data = {
+        "status": "success",
+        "planner_status": "Active" if components.get('planner', {}).get('status') == 'active' else "Inactive",
+        "executor_status": "Active" if components.get('executor', {}).get('status') == 'active' else "Inactive", 
+        "memory_status": "Active" if components.get('memory', {}).get('status') == 'active' else "Inactive",
+        "plans_generated": plans_generated,
+        "plan_completeness": plan_completeness,
+        "actions_executed": actions_executed, 
+        "execution_success": execution_success,
+        "stored_patterns": stored_patterns,
+        "context_hits": context_hits,
+        "messages_24h": runtime_stats['messages_24h'],
+        "avg_response_time": f"{runtime_stats['avg_response_time_ms']:.0f}",
+        "categories_processed": runtime_stats['categories_processed'],
+        "system_version": status.get('version', '1.0-agentic'),
+        "capabilities": status.get('capabilities', []),
+        "analytics_queries": get_query_stats(),
+        "stage_latency": latency
+    }
+    
+    return response_data
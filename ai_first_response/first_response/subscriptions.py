@@ -0,0 +1,265 @@
+"""
+Geofenced Alert Subscriptions
+Matches new emergency alerts and critical messages against registered areas
+of interest (point + radius, or polygon) and stores a notification for every
+matching subscription.
+
+Areas are indexed by their bounding boxes in a shapely STRtree, so a match is
+one tree query plus an exact check of the few candidates (a vectorized
+haversine for circles, a prepared polygon test for polygons), never a scan of
+all subscriptions. Messages are matched as points; alerts as their center
+plus the cluster radius, so an area that only overlaps the cluster's edge is
+notified too.
+"""
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+import numpy as np
+import shapely
+from shapely.geometry import Point, Polygon
+from shapely.ops import nearest_points
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+from .geo import KM_PER_DEGREE, GeoGrid, distances_from, haversine_km
+from .models import AlertSubscription, SubscriptionNotification
+
+logger = logging.getLogger(__name__)
+
+# Severities whose messages are matched on their own, without waiting for a cluster
+NOTIFY_SEVERITIES = ('CRIT', 'HIGH')
+
+
+def circle_bounds(lat, lon, radius_km):
+    """
+    Bounding boxes (west, south, east, north) of a circle; two boxes when it
+    crosses the antimeridian
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if abs(lat) + dlat >= 90:
+        return [(-180.0, south, 180.0, north)]
+    dlon = dlat / math.cos(math.radians(abs(lat) + dlat))
+    if dlon >= 180:
+        return [(-180.0, south, 180.0, north)]
+    west, east = lon - dlon, lon + dlon
+    if west < -180:
+        return [(west + 360, south, 180.0, north), (-180.0, south, east, north)]
+    if east > 180:
+        return [(west, south, 180.0, north), (-180.0, south, east - 360, north)]
+    return [(west, south, east, north)]
+
+
+def polygon_from_ring(ring):
+    """Validated shapely Polygon from a [[lon, lat], ...] ring"""
+    if not isinstance(ring, list) or len(ring) < 3:
+        raise ValueError("A polygon needs at least 3 [lon, lat] points")
+    points = [(float(lon), float(lat)) for lon, lat in ring]
+    if any(not (-180 <= lon <= 180 and -90 <= lat <= 90) for lon, lat in points):
+        raise ValueError("Polygon coordinates out of range")
+    polygon = Polygon(points)
+    if not polygon.is_valid or polygon.area == 0:
+        raise ValueError("Polygon is not valid (self-intersecting or empty)")
+    return polygon
+
+
+class SubscriptionIndex:
+    """
+    Process-wide spatial index of active subscriptions. Rebuilt when this
+    process changes a subscription, and otherwise when a cheap version query
+    (at most every SUBSCRIPTION_INDEX_REFRESH_SECONDS) shows another worker did.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._tree = None
+        self._owners = np.empty(0, dtype=np.int64)  # Tree item -> subscription position
+
+    def invalidate(self):
+        self._stale = True
+
+    def _current_version(self):
+        return tuple(AlertSubscription.objects.aggregate(
+            changed=Max('updated_at'), total=Count('id')
+        ).values())
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        refresh_seconds = getattr(settings, 'SUBSCRIPTION_INDEX_REFRESH_SECONDS', 30)
+        if not self._stale and now - self._checked_at < refresh_seconds:
+            return
+        self._checked_at = now
+        version = self._current_version()
+        if self._stale or version != self._version:
+            self._build()
+            self._version = version
+            self._stale = False
+
+    def _build(self):
+        rows = AlertSubscription.objects.filter(is_active=True).values_list(
+            'id', 'area_type', 'latitude', 'longitude', 'radius_km', 'polygon', 'categories'
+        )
+        ids, lats, lons, radii, polygons, categories = [], [], [], [], [], []
+        boxes, owners = [], []
+        for sub_id, area_type, lat, lon, radius_km, ring, cats in rows.iterator(chunk_size=2000):
+            position = len(ids)
+            try:
+                if area_type == 'circle':
+                    area_boxes = circle_bounds(lat, lon, radius_km)
+                    polygon = None
+                else:
+                    polygon = polygon_from_ring(ring)
+                    shapely.prepare(polygon)
+                    area_boxes = [polygon.bounds]
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Skipping invalid subscription area {sub_id}: {e}")
+                continue
+            ids.append(sub_id)
+            lats.append(lat if polygon is None else np.nan)
+            lons.append(lon if polygon is None else np.nan)
+            radii.append(radius_km if polygon is None else np.nan)
+            polygons.append(polygon)
+            categories.append(frozenset(cats or ()))
+            boxes.extend(area_boxes)
+            owners.extend([position] * len(area_boxes))
+
+        self._ids = np.array(ids, dtype=np.int64)
+        self._lats = np.array(lats, dtype=float)
+        self._lons = np.array(lons, dtype=float)
+        self._radii = np.array(radii, dtype=float)
+        self._polygons = polygons
+        self._categories = categories
+        if boxes:
+            west, south, east, north = np.array(boxes, dtype=float).T
+            self._tree = shapely.STRtree(shapely.box(west, south, east, north))
+        else:
+            self._tree = None
+        self._owners = np.array(owners, dtype=np.int64)
+        logger.info(f"Built subscription index: {len(ids)} areas, {len(boxes)} boxes")
+
+    def match(self, lat, lon, category=None, radius_km=0.0):
+        """
+        Ids of the active subscriptions that cover the category and whose area
+        contains the point, or comes within radius_km of it when one is given.
+        Polygon distances are measured to the nearest boundary point in lon/lat,
+        which is close enough for cluster-sized radii away from the poles.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            if self._tree is None:
+                return []
+            point = Point(lon, lat)
+            if radius_km > 0:
+                west, south, east, north = np.array(circle_bounds(lat, lon, radius_km), dtype=float).T
+                hits = self._tree.query(shapely.box(west, south, east, north))[1]
+            else:
+                hits = self._tree.query(point)
+            candidates = np.unique(self._owners[hits])
+            if not len(candidates):
+                return []
+
+            circles = candidates[~np.isnan(self._radii[candidates])]
+            distances = distances_from(lat, lon, self._lats[circles], self._lons[circles])
+            inside = circles[distances <= self._radii[circles] + radius_km]
+            matched = inside.tolist() + [
+                position for position in candidates[np.isnan(self._radii[candidates])].tolist()
+                if self._polygon_within(self._polygons[position], point, radius_km)
+            ]
+            return [int(self._ids[position]) for position in matched
+                    if category is None or not self._categories[position] or category in self._categories[position]]
+
+    @staticmethod
+    def _polygon_within(polygon, point, radius_km):
+        if polygon.covers(point):
+            return True
+        if radius_km <= 0:
+            return False
+        nearest = nearest_points(polygon.exterior, point)[0]
+        return haversine_km(point.y, point.x, nearest.y, nearest.x) <= radius_km
+
+
+subscription_index = SubscriptionIndex()
+
+
+def notify_message(message):
+    """Notify the subscriptions covering a newly processed CRIT/HIGH message"""
+    if (message.ai_severity not in NOTIFY_SEVERITIES or message.user_latitude is None
+            or message.user_longitude is None):
+        return 0
+    matched = subscription_index.match(message.user_latitude, message.user_longitude, message.ai_category)
+    SubscriptionNotification.objects.bulk_create([
+        SubscriptionNotification(
+            subscription_id=sub_id, kind='message', message=message,
+            category=message.ai_category, severity=message.ai_severity,
+            latitude=message.user_latitude, longitude=message.user_longitude,
+            payload={
+                'message_id': message.id,
+                'category': message.ai_category,
+                'severity': message.ai_severity,
+                'processed_at': message.processed_at.isoformat() if message.processed_at else None
+            }
+        ) for sub_id in matched
+    ])
+    return len(matched)
+
+
+class AlertNotifier:
+    """
+    Notifies subscriptions about alerts they have not heard about yet. An
+    alert covers its center plus the cluster radius, and is identified by
+    its category and the grid cell of its center, so a cluster that grows
+    (and whose center drifts a little) is not re-sent within the cluster
+    time window.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._known = {}  # alert key -> time it was handled (monotonic)
+        self._grid = None
+
+    def alert_key(self, alert):
+        radius_km = alert['radius_km']
+        if self._grid is None or self._grid.cell_km != radius_km:
+            self._grid = GeoGrid(radius_km)
+        row, col = self._grid.cell(alert['center_lat'], alert['center_lon'])
+        return f"{alert['category']}:{row}:{col}"
+
+    def notify(self, alerts):
+        """Store notifications for new alerts; returns how many were created"""
+        window_hours = getattr(settings, 'EMERGENCY_CLUSTER_TIME_WINDOW_HOURS', 24)
+        now = time.monotonic()
+        created = 0
+        with self._lock:
+            self._known = {key: seen for key, seen in self._known.items() if now - seen < window_hours * 3600}
+            for alert in alerts:
+                key = self.alert_key(alert)
+                if key in self._known:
+                    continue
+                self._known[key] = now
+                matched = subscription_index.match(alert['center_lat'], alert['center_lon'], alert['category'],
+                                                   alert['radius_km'])
+                if not matched:
+                    continue
+                # Other workers may have notified some of them already
+                already = set(SubscriptionNotification.objects.filter(
+                    alert_key=key, subscription_id__in=matched,
+                    created_at__gte=timezone.now() - timedelta(hours=window_hours)
+                ).values_list('subscription_id', flat=True))
+                notifications = [
+                    SubscriptionNotification(
+                        subscription_id=sub_id, kind='alert', alert_key=key,
+                        category=alert['category'], severity=alert['dominant_severity'],
+                        latitude=alert['center_lat'], longitude=alert['center_lon'], payload=alert
+                    ) for sub_id in matched if sub_id not in already
+                ]
+                SubscriptionNotification.objects.bulk_create(notifications)
+                created += len(notifications)
+        return created
+
+
+alert_notifier = AlertNotifier()
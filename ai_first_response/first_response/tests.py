@@ -1,3 +1,1420 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from datetime import timedelta
+from unittest import mock
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Avg, Count
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+from . import conversations, disaster_feeds, rollups
+from .admin import EstimatedCountPaginator
+from .alerts import AlertClusterIndex, alerts_etag, cluster_settings
+from .analytics import NO_TIME, from_epoch_us, get_query_stats, load_columns, to_epoch_us
+from .browse import keyset_page
+from .clustering import build_alert, cluster_points
+from .conversations import conversation_thread, conversation_threads
+from .disaster_feeds import (EndpointHealth, clear_cache, endpoint_health, fetch_first_success, gdacs_events,
+                             gdacs_events_within)
+from .feed_events import FeedEvents, FeedEventsBuilder
+from .feed_parsers import iter_json_events, iter_rss_items, iter_text_chunks
+from .geo import GeoGrid, haversine_km, pairwise_distances, within_radius
+from .hotspots import HotspotDetector, baseline_minutes
+from .impact_areas import ImpactAreaIndex, ImpactAreas, event_polygons, events_from_geometries
+from .ingest import message_processed
+from .latency import StageLatency, bucket_index, bucket_value
+from .live import LiveChannel, event_stream
+from .models import (AlertSubscription, ArchivedMessage, GeoTileCount, LatencyHistogram, MessageRollup,
+                     ReceivedMessage, SubscriptionNotification)
+from .retention import archive_conversations, find_conversation
+from .search import ranked_search, search_messages
+from .sql_clustering import sql_cluster_alerts
+from .subscriptions import AlertNotifier, SubscriptionIndex
+from .tiles import rebuild_tiles, record_message as record_tile, viewport_cells
+from .status import build_agentic_status
 
-# Create your tests here.
+
+def create_messages(count, seed=1):
+    """Processed messages spread over the last 40 days, counted in the rollups"""
+    rng = random.Random(seed)
+    now = timezone.now()
+    messages = []
+    for _ in range(count):
+        parent = rng.choice(messages) if messages and rng.random() < 0.3 else None
+        message = ReceivedMessage.objects.create(
+            user_message='help', message_text='help', user_latitude=45.07, user_longitude=7.69,
+            ai_category=rng.choice(['Fire', 'Flood', 'Medical', '']),
+            ai_severity=rng.choice(['CRIT', 'HIGH', 'MED', 'LOW', 'INFO']),
+            language=rng.choice(['en', 'it']), message_type=rng.choice(['text', 'voice']),
+            has_error=rng.random() < 0.1, response_time_ms=rng.choice([None, 120, 480]),
+            processed_at=now if rng.random() < 0.9 else None,
+            parent_message=parent, is_conversation_starter=parent is None,
+            conversation_step=2 if parent else 1, conversation_status=rng.choice(['active', 'completed'])
+        )
+        ReceivedMessage.objects.filter(id=message.id).update(
+            received_at=now - timedelta(minutes=rng.randint(0, 40 * 24 * 60))
+        )
+        message.refresh_from_db()
+        rollups.record_message(message)
+        messages.append(message)
+    return messages
+
+
+class FakeResponse:
+    """Just enough of a requests.Response for the feed code"""
+
+    def __init__(self, status_code=200, body=b'', chunk_size=None, chunk_delay=0):
+        self.status_code = status_code
+        self.body = body
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.closed = False
+        self.url = ''
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        chunk_size = self.chunk_size or chunk_size
+        for start in range(0, len(self.body), chunk_size):
+            time.sleep(self.chunk_delay)
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeEndpoints:
+    """requests.get replacement answering each URL with (delay seconds, status)"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.responses = {}
+        self.finished = threading.Event()
+
+    def get(self, url, params=None, timeout=None, stream=False):
+        delay, status = self.answers[url]
+        time.sleep(delay)
+        response = self.responses[url] = FakeResponse(status)
+        if len(self.responses) == len(self.answers):
+            self.finished.set()
+        return response
+
+
+@override_settings(GDACS_BREAKER_FAILURE_THRESHOLD=2, GDACS_BREAKER_COOLDOWN=60, GDACS_REQUEST_TIMEOUT=5)
+class EndpointHealthTests(TestCase):
+
+    def setUp(self):
+        endpoint_health.reset()
+
+    def _fetch(self, answers, **kwargs):
+        endpoints = FakeEndpoints(answers)
+        with mock.patch('first_response.disaster_feeds.requests.get', endpoints.get):
+            url, response = fetch_first_success([(url, None) for url in answers], **kwargs)
+            # Wait for abandoned requests so their responses are closed
+            endpoints.finished.wait(2)
+            time.sleep(0.05)
+        return url, response, endpoints.responses
+
+    def test_breaker_opens_then_lets_a_single_probe_through(self):
+        health = EndpointHealth()
+        health.record_failure('a')
+        self.assertEqual(health.order(['a', 'b']), ['a', 'b'])
+        with self.assertLogs('first_response.disaster_feeds', 'WARNING'):
+            health.record_failure('a')
+        self.assertEqual(health.order(['a', 'b']), ['b'])
+
+        health._state['a']['opened_at'] -= 61  # Cooldown over
+        self.assertEqual(health.order(['a', 'b']), ['a', 'b'])
+        self.assertEqual(health.order(['a', 'b']), ['b'])  # Probe in flight
+
+        with self.assertLogs('first_response.disaster_feeds', 'WARNING'):
+            health.record_failure('a')  # Failed probe: open again for a full cooldown
+        self.assertEqual(health.order(['a', 'b']), ['b'])
+        health._state['a']['opened_at'] -= 61
+        self.assertEqual(health.order(['a', 'b']), ['a', 'b'])
+        health.record_success('a')
+        self.assertEqual(health.order(['b', 'a']), ['a', 'b'])
+        self.assertFalse(health.snapshot()['endpoints']['a']['circuit_open'])
+
+    def test_serial_falls_back_and_closes_failed_responses(self):
+        url, response, responses = self._fetch({'a': (0, 503), 'b': (0, 200)}, race=False)
+        self.assertEqual(url, 'b')
+        self.assertFalse(response.closed)
+        self.assertTrue(responses['a'].closed)
+        self.assertEqual(endpoint_health.snapshot()['last_healthy'], 'b')
+
+        url, response, responses = self._fetch({'c': (0, 503), 'd': (0, 404)}, race=False)
+        self.assertIsNone(url)
+        self.assertIs(response, responses['d'])
+        self.assertTrue(responses['c'].closed)
+
+    def test_race_ignores_and_closes_late_answers(self):
+        url, response, responses = self._fetch({'slow': (0.3, 200), 'fast': (0, 200)}, race=True)
+        self.assertEqual(url, 'fast')
+        self.assertTrue(responses['slow'].closed)
+        snapshot = endpoint_health.snapshot()
+        self.assertEqual(snapshot['last_healthy'], 'fast')
+        self.assertEqual(snapshot['endpoints']['slow']['total_successes'], 0)
+
+    def test_total_budget_is_enforced(self):
+        started = time.monotonic()
+        with self.assertLogs('first_response.disaster_feeds', 'WARNING'):
+            url, response, responses = self._fetch({'a': (0.2, 503), 'b': (0.5, 200)}, timeout=0.4, race=False)
+        self.assertIsNone(url)
+        self.assertIs(response, responses['a'])  # The last error answer, for the caller to report
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertTrue(responses['b'].closed)
+        self.assertEqual(endpoint_health.snapshot()['endpoints']['b']['total_failures'], 1)
+
+
+def split_text(text, size):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+class FeedParserTests(TestCase):
+
+    def setUp(self):
+        self.features = [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [7.6 + i, 45.0]},
+                          'properties': {'eventname': f'Event {i}', 'description': 'a "quoted", [text]'}}
+                         for i in range(20)]
+
+    def test_json_events_across_chunk_boundaries(self):
+        for document in (json.dumps({'type': 'FeatureCollection', 'features': self.features}),
+                         json.dumps(self.features, indent=2), json.dumps({'results': self.features})):
+            for size in (1, 7, 4096):
+                self.assertEqual(list(iter_json_events(split_text(document, size))), self.features)
+        self.assertEqual(list(iter_json_events(['{"features": []}'])), [])
+        self.assertEqual(list(iter_json_events(['{"status": "ok"}'])), [])
+
+    def test_invalid_json_raises(self):
+        truncated = json.dumps(self.features)[:-40]
+        with self.assertRaises(ValueError):
+            list(iter_json_events(split_text(truncated, 16)))
+        with self.assertRaises(ValueError):
+            list(iter_json_events(['<html>Service unavailable</html>']))
+
+    def test_stream_stops_after_enough_matches(self):
+        chunks = iter(split_text(json.dumps(self.features), 64))
+        # Events 0-3 are within ~320 km of Turin, the rest further east
+        matches = gdacs_events_within(chunks, 45.07, 7.69, 400, limit=2)
+        self.assertEqual([e['properties']['eventname'] for e in matches], ['Event 0', 'Event 1'])
+        far = json.dumps([{'latitude': -33.9, 'longitude': 151.2}] * 10 + self.features[3:4])
+        self.assertEqual(gdacs_events_within(split_text(far, 5), 45.07, 7.69, 400), [self.features[3]])
+
+    def test_rss_items_across_chunk_boundaries(self):
+        document = (' \n<?xml version="1.0"?><rss xmlns:geo="http://www.w3.org/2003/01/geo/wgs84_pos#">'
+                    '<channel><title>GDACS</title>'
+                    '<item><title>Flood in Piedmont – Po</title><link>https://gdacs.org/1</link>'
+                    '<geo:Point><geo:lat>45.1</geo:lat><geo:long>7.7</geo:long></geo:Point></item>'
+                    '<item><title>Earthquake</title><description>lat: 38.1, lon: 13.3</description></item>'
+                    '<item><title>No position</title></item>'
+                    '<item><title>Not read</title></item></channel></rss>')
+        for size in (1, 13, 4096):
+            # A byte order mark and whitespace before the declaration, chunks split inside characters
+            chunks = iter_text_chunks(FakeResponse(200, document.encode('utf-8-sig'), chunk_size=size))
+            items = list(iter_rss_items(chunks, limit=3))
+            self.assertEqual([(i['title'], i['latitude'], i['longitude']) for i in items],
+                             [('Flood in Piedmont – Po', 45.1, 7.7), ('Earthquake', 38.1, 13.3),
+                              ('No position', None, None)])
+            self.assertEqual(items[0]['link'], 'https://gdacs.org/1')
+
+    def test_invalid_json_falls_back_to_rss(self):
+        rss = ('<rss><channel><item><title>Flood</title><description>lat: 45.1, lon: 7.7</description>'
+               '</item></channel></rss>').encode('utf-8')
+
+        def get(url, params=None, timeout=None, stream=False):
+            return FakeResponse(200, rss if url.endswith('rss.xml') else b'{"features": [{"broken"')
+
+        clear_cache()
+        endpoint_health.reset()
+        with mock.patch('first_response.disaster_feeds.requests.get', get):
+            events = gdacs_events.__wrapped__(45.07, 7.69, 50)
+        self.assertEqual([event.place for event in events], ['Flood'])
+
+    @override_settings(GDACS_REQUEST_TIMEOUT=0.3)
+    def test_slow_body_is_cut_off_at_the_deadline(self):
+        body = json.dumps({'features': [{'geometry': {'coordinates': [100.0, -40.0]}}] * 200}).encode('utf-8')
+        responses = []
+
+        def get(url, params=None, timeout=None, stream=False):
+            responses.append(FakeResponse(200, body, chunk_size=64, chunk_delay=0.01))
+            return responses[-1]
+
+        clear_cache()
+        endpoint_health.reset()
+        started = time.monotonic()
+        with mock.patch('first_response.disaster_feeds.requests.get', get):
+            with self.assertLogs('first_response.disaster_feeds', 'WARNING'):
+                events = gdacs_events.__wrapped__(45.07, 7.69, 50)
+        self.assertFalse(events)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertTrue(responses[0].closed)
+
+
+class FeedEventsTests(TestCase):
+
+    def test_usgs_round_trip(self):
+        features = [{
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [7.69 + i, 45.07, 10.0]},
+            'properties': {'mag': 3.5 + i, 'place': 'Turin' if i % 2 else 'Alps', 'time': 1700000000000 + i,
+                           'url': f'https://earthquake.usgs.gov/{i}'}
+        } for i in range(4)]
+        events = FeedEvents.from_usgs_features(features)
+        self.assertEqual(len(events), 4)
+        self.assertEqual(len(events.strings), 6)  # Place names are interned
+        for feature, converted in zip(features, events.to_features()):
+            self.assertEqual(converted['geometry']['coordinates'], feature['geometry']['coordinates'][:2])
+            for name in ('mag', 'place', 'time', 'url'):
+                self.assertEqual(converted['properties'][name], feature['properties'][name])
+            self.assertEqual(converted['properties']['eventtype'], 'EQ')
+
+        self.assertEqual([e.place for e in events[1:3]], ['Turin', 'Alps'])
+        self.assertEqual([e.magnitude for e in events.within(45.07, 7.69, 50)], [3.5])
+
+    def test_gdacs_events_and_missing_values(self):
+        events = FeedEvents.from_gdacs_events([
+            {'geometry': {'coordinates': [13.3, 38.1]},
+             'properties': {'eventname': 'Flood', 'eventtype': 'fl', 'alertlevel': 'ORANGE',
+                            'fromdate': '2026-10-01T12:00:00Z', 'severitydata': {'severity': 2.5},
+                            'url': {'report': 'https://gdacs.org/report'}}},
+            {'name': 'No position', 'eventtype': 'XX', 'fromdate': 'not a date'},
+        ])
+        flood, unknown = list(events)
+        self.assertEqual((flood.lat, flood.lon, flood.event_type, flood.alert_level), (38.1, 13.3, 'FL', 'Orange'))
+        self.assertEqual((flood.magnitude, flood.url), (2.5, 'https://gdacs.org/report'))
+        self.assertEqual(flood.time, 1790856000.0)
+        self.assertFalse(unknown.has_location)
+        self.assertEqual((unknown.place, unknown.event_type, unknown.time, unknown.magnitude),
+                         ('No position', '', None, None))
+        self.assertIsNone(unknown.to_feature()['geometry'])
+        self.assertEqual(len(events.within(38.1, 13.3, 1)), 1)
+
+    def test_empty(self):
+        for events in (FeedEvents(), FeedEventsBuilder().build()):
+            self.assertFalse(events)
+            self.assertEqual(events.to_features(), [])
+            self.assertEqual(len(events.within(45.0, 7.0, 100)), 0)
+
+
+class GeoTests(TestCase):
+
+    def test_haversine(self):
+        self.assertAlmostEqual(float(haversine_km(45.0703, 7.6869, 41.9028, 12.4964)), 525.0, delta=2)
+        self.assertAlmostEqual(float(haversine_km(0, 179.5, 0, -179.5)), 111.2, delta=0.1)
+        self.assertAlmostEqual(float(haversine_km(89.9, 0, 89.9, 180)), 22.2, delta=0.1)
+        matrix = pairwise_distances([45.0, 41.9], [7.7, 12.5])
+        self.assertEqual(matrix.shape, (2, 2))
+        self.assertEqual(matrix[0, 0], 0)
+        self.assertAlmostEqual(matrix[0, 1], matrix[1, 0])
+
+    def test_within_radius_matches_brute_force(self):
+        rng = np.random.default_rng(7)
+        lats = rng.uniform(-90, 90, 5000)
+        lons = rng.uniform(-180, 180, 5000)
+        lats[::97] = np.nan
+        for lat, lon, radius in [(45.07, 7.69, 800), (-16.5, 179.9, 1500), (0, -180, 300), (88, 45, 900),
+                                 (-60, -179, 2500)]:
+            indices, distances = within_radius(lat, lon, lats, lons, radius)
+            expected = np.flatnonzero(haversine_km(lat, lon, lats, lons) <= radius)
+            self.assertEqual(indices.tolist(), expected.tolist())
+            self.assertTrue((distances <= radius).all())
+
+    def test_grid_neighbors_cover_every_close_pair(self):
+        rng = np.random.default_rng(8)
+        for cell_km in (50, 500):
+            grid = GeoGrid(cell_km)
+            # Clustered around the antimeridian, the equator and the poles
+            lats = np.concatenate([rng.uniform(-20, 20, 400), rng.uniform(80, 90, 200), rng.uniform(-90, -80, 200)])
+            lons = np.concatenate([rng.uniform(175, 185, 400), rng.uniform(-180, 180, 400)])
+            lons = (lons + 180) % 360 - 180
+            cells = [grid.cell(lat, lon) for lat, lon in zip(lats, lons)]
+            close = pairwise_distances(lats, lons) <= cell_km
+            for i, j in zip(*np.nonzero(close)):
+                self.assertIn(cells[j], grid.neighbors(cells[i]))
+            for cell in set(cells):
+                center_lat, center_lon = grid.center(cell)
+                self.assertEqual(grid.cell(center_lat, center_lon), cell)
+
+
+class FeedCacheStatsTests(TestCase):
+
+    def setUp(self):
+        disaster_feeds.clear_cache()
+        disaster_feeds._func_stats.clear()
+        self.now = 1000.0
+        clock = mock.patch('first_response.disaster_feeds.time.time', lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.addCleanup(disaster_feeds.clear_cache)
+
+    def _recount(self):
+        """Statistics recomputed from the cached entries themselves"""
+        ages = {key: self.now - written for key, written in disaster_feeds._cache_ttl.items()}
+        ttls = {key: meta['ttl'] for key, meta in disaster_feeds._cache_meta.items()}
+        return {
+            'total_entries': len(disaster_feeds._cache),
+            'valid_entries': sum(1 for key, age in ages.items() if age < ttls[key]),
+            'cache_size_bytes': sum(disaster_feeds._estimate_size(value) for value in disaster_feeds._cache.values()),
+        }
+
+    def test_incremental_stats_match_a_recount(self):
+        @disaster_feeds.cache_with_ttl(10)
+        def short_lived(key):
+            return {'key': key, 'events': list(range(key))}
+
+        @disaster_feeds.cache_with_ttl(100)
+        def long_lived(key):
+            return FeedEventsBuilder().build() if key % 2 else [key] * key
+
+        rng = random.Random(3)
+        for _ in range(300):
+            self.now += rng.uniform(0, 3)
+            rng.choice([short_lived, long_lived])(rng.randint(1, 12))
+            if rng.random() < 0.1:
+                disaster_feeds.cleanup_expired_cache()
+            stats = disaster_feeds.get_cache_stats()
+            self.assertEqual({name: stats[name] for name in self._recount()}, self._recount())
+
+        functions = stats['functions']
+        self.assertEqual(functions['short_lived']['hits'] + functions['short_lived']['misses']
+                         + functions['long_lived']['hits'] + functions['long_lived']['misses'], 300)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertEqual(stats['expired_entries'], stats['total_entries'] - stats['valid_entries'])
+
+    def test_schedule_is_pruned_on_write(self):
+        @disaster_feeds.cache_with_ttl(10)
+        def feed(key):
+            return [key]
+
+        # Written without ever reading the stats or cleaning up
+        for key in range(500):
+            self.now += 1
+            feed(key)
+        self.assertLessEqual(len(disaster_feeds._cache_schedule), 2 * 20)
+        self.assertLessEqual(len(disaster_feeds._cache), 20)
+
+
+def greedy_clusters(lats, lons, radius_km, min_count):
+    """The pairwise search the grid engine replaced, as a reference"""
+    distances = pairwise_distances(lats, lons)
+    clustered = np.zeros(len(lats), dtype=bool)
+    clusters = []
+    for i in range(len(lats)):
+        if clustered[i]:
+            continue
+        members = np.flatnonzero(~clustered & (distances[i] <= radius_km))
+        if len(members) >= min_count:
+            clusters.append(members.tolist())
+            clustered[members] = True
+    return clusters
+
+
+class ClusteringTests(TestCase):
+
+    def test_grid_engine_matches_pairwise_search(self):
+        rng = np.random.default_rng(9)
+        for center_lat, center_lon, spread in [(45.0, 7.7, 2.0), (-17.0, 179.5, 3.0), (78.0, 15.0, 4.0)]:
+            lats = np.clip(center_lat + rng.normal(0, spread, 400), -90, 90)
+            lons = (center_lon + rng.normal(0, spread, 400) + 180) % 360 - 180
+            for radius_km, min_count in [(10, 3), (50, 3), (200, 8)]:
+                clusters = [members.tolist() for members in cluster_points(lats, lons, radius_km, min_count)]
+                self.assertEqual(clusters, greedy_clusters(lats, lons, radius_km, min_count))
+
+    def test_small_inputs(self):
+        self.assertEqual(cluster_points([], [], 10, 3), [])
+        self.assertEqual(cluster_points([45.0, 45.0], [7.0, 7.0], 10, 3), [])
+        self.assertEqual([c.tolist() for c in cluster_points([45.0] * 3, [7.0] * 3, 10, 3)], [[0, 1, 2]])
+
+
+def create_alert_messages(count, seed=1, minutes_ago=0):
+    """Processed messages scattered around a few towns, `minutes_ago` old"""
+    rng = random.Random(seed)
+    processed_at = timezone.now() - timedelta(minutes=minutes_ago)
+    towns = [(45.07, 7.69), (45.46, 9.19), (-16.9, 179.9), (-16.8, -179.95)]
+    return [ReceivedMessage.objects.create(
+        user_message='help', message_text='help', ai_category=rng.choice(['Fire', 'Flood']),
+        ai_severity=rng.choice(['CRIT', 'HIGH', 'MED']),
+        user_latitude=lat + rng.uniform(-0.3, 0.3), user_longitude=(lon + rng.uniform(-0.3, 0.3) + 180) % 360 - 180,
+        processed_at=processed_at - timedelta(seconds=rng.randint(0, 600))
+    ) for lat, lon in (rng.choice(towns) for _ in range(count))]
+
+
+def scratch_alerts(radius_km, min_count, time_window_hours):
+    """Alerts clustered from scratch over the whole time window"""
+    window = ReceivedMessage.objects.filter(
+        processed_at__gte=timezone.now() - timedelta(hours=time_window_hours), user_latitude__isnull=False
+    ).order_by('-processed_at', '-id')
+    alerts = []
+    for category in ('Fire', 'Flood'):
+        points = list(window.filter(ai_category=category).values_list(
+            'id', 'user_latitude', 'user_longitude', 'processed_at', 'ai_severity'))
+        points = [(i, lat, lon, to_epoch_us(at), severity) for i, lat, lon, at, severity in points]
+        for members in cluster_points([p[1] for p in points], [p[2] for p in points], radius_km, min_count):
+            alerts.append(build_alert(category, [points[i] for i in members], radius_km))
+    return alerts
+
+
+def by_id(alerts):
+    return {alert['id']: alert for alert in alerts}
+
+
+@override_settings(EMERGENCY_CLUSTER_RADIUS_KM=30, EMERGENCY_CLUSTER_MIN_COUNT=5,
+                   EMERGENCY_CLUSTER_TIME_WINDOW_HOURS=2)
+class AlertBackendTests(TestCase):
+
+    def assertBackendsAgree(self, index):
+        expected = by_id(scratch_alerts(*cluster_settings()))
+        self.assertTrue(expected)
+        self.assertEqual(by_id(index.snapshot()), expected)
+        self.assertEqual(by_id(sql_cluster_alerts(*cluster_settings())), expected)
+
+    def test_incremental_and_sql_match_scratch_after_adds_and_expiry(self):
+        index = AlertClusterIndex()
+        create_alert_messages(120, seed=1, minutes_ago=90)
+        self.assertBackendsAgree(index)
+
+        for message in create_alert_messages(60, seed=2):
+            index.record_message(message)
+        self.assertBackendsAgree(index)
+
+        # An hour later the oldest batch has aged out of the window, without any new message
+        later = timezone.now() + timedelta(hours=1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertBackendsAgree(index)
+            self.assertEqual(len(index._points), 60)
+
+    def test_ingest_leaves_matching_to_the_live_thread(self):
+        message = create_alert_messages(1)[0]
+        with mock.patch('first_response.ingest.live_channel') as channel, \
+                mock.patch('first_response.ingest.alert_clusters') as index:
+            message_processed(message)
+            with override_settings(EMERGENCY_ALERTS_BACKEND='sql'):
+                message_processed(message)
+        self.assertEqual(index.record_message.call_count, 1)  # Not with the SQL backend
+        self.assertFalse(index.snapshot.called)
+        channel.notify.assert_called_with(alerts_changed=True)
+
+    def test_live_thread_matches_alerts_without_dashboards(self):
+        channel = LiveChannel()
+        alerts = [{'id': 'Fire_1', 'count': 5}]
+        with mock.patch('first_response.live.current_alerts', return_value=alerts), \
+                mock.patch('first_response.live.alert_notifier') as notifier, \
+                mock.patch('first_response.live.connection'):
+            channel.notify()
+            self.assertIsNone(channel._thread)  # Nothing to do for a message that cannot change alerts
+            channel.notify(alerts_changed=True)
+            thread = channel._thread
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        notifier.notify.assert_called_once_with(alerts)
+
+
+@override_settings(EMERGENCY_CLUSTER_RADIUS_KM=30, EMERGENCY_CLUSTER_MIN_COUNT=5,
+                   EMERGENCY_CLUSTER_TIME_WINDOW_HOURS=2)
+class AlertsETagTests(TestCase):
+
+    def setUp(self):
+        self.url = '/api/first-response/alerts/'
+        create_alert_messages(40, minutes_ago=100)
+
+    def test_not_modified_until_a_message_arrives(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['alerts'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        create_alert_messages(1, seed=2)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_when_messages_age_out(self):
+        etag = alerts_etag()
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(minutes=30)):
+            self.assertNotEqual(alerts_etag(), etag)
+
+    def test_etag_is_derived_from_the_database(self):
+        # Every worker computes the same ETag, whatever is in its own cache
+        etag = alerts_etag()
+        cache.clear()
+        self.assertEqual(alerts_etag(), etag)
+        with self.assertNumQueries(2):
+            alerts_etag()
+
+
+class AnalyticsColumnsTests(TestCase):
+
+    def test_columns_match_model_values(self):
+        create_messages(120)
+        fields = ['id', 'ai_category', 'ai_severity', 'user_latitude', 'response_time_ms', 'has_error',
+                  'processed_at', 'parent_message']
+        queryset = ReceivedMessage.objects.order_by('id')
+        columns = load_columns(queryset, fields, consumer='test_columns', chunk_size=7)
+
+        self.assertEqual(len(columns), 120)
+        rows = list(queryset.values_list(*fields))
+        for i, name in enumerate(fields):
+            expected = [row[i] for row in rows]
+            if name == 'processed_at':
+                expected = [to_epoch_us(value) for value in expected]
+                self.assertEqual(columns[name].tolist(), expected)
+            elif name in ('response_time_ms', 'has_error', 'parent_message'):
+                self.assertEqual(columns[name].tolist(), [-1 if v is None else int(v) for v in expected])
+            else:
+                self.assertEqual(columns.values(name), expected)
+        self.assertEqual(columns.value_counts('ai_category'), {
+            category: count for category, count in Counter(row[1] for row in rows).items() if category
+        })
+        self.assertEqual(get_query_stats()['test_columns']['rows'] % 120, 0)
+
+    def test_nulls_and_empty_results(self):
+        columns = load_columns(ReceivedMessage.objects.none(), ['id', 'ai_category', 'processed_at'], 'test_empty')
+        self.assertEqual(len(columns), 0)
+        self.assertEqual(columns['ai_category'].dtype, np.int32)
+
+        ReceivedMessage.objects.create(user_message='help', message_text='help', user_latitude=45.0,
+                                       user_longitude=7.0)
+        columns = load_columns(ReceivedMessage.objects.all(), ['ai_category', 'processed_at', 'response_time_ms'],
+                               'test_nulls')
+        self.assertEqual(columns.values('ai_category'), [''])
+        self.assertEqual(columns.value_counts('ai_category'), {})  # Empty labels are not counted
+        self.assertEqual(columns['processed_at'].tolist(), [NO_TIME])
+        self.assertEqual(columns['response_time_ms'].tolist(), [-1])
+
+    def test_epoch_round_trip(self):
+        now = timezone.now()
+        self.assertEqual(from_epoch_us(to_epoch_us(now)), now)
+        self.assertEqual(to_epoch_us(now.replace(tzinfo=None)), to_epoch_us(now))
+        self.assertEqual(to_epoch_us(None), NO_TIME)
+
+
+def create_reports(minutes_ago, lat=45.07, lon=7.69, category='Fire'):
+    """One processed report per entry of `minutes_ago`, in the same hotspot cell"""
+    now = timezone.now()
+    return [ReceivedMessage.objects.create(
+        user_message='help', message_text='help', ai_category=category, ai_severity='HIGH',
+        user_latitude=lat, user_longitude=lon, processed_at=now - timedelta(minutes=minutes)
+    ) for minutes in minutes_ago]
+
+
+@override_settings(HOTSPOT_CELL_KM=10, HOTSPOT_WINDOW_MINUTES=5, HOTSPOT_MIN_COUNT=3, HOTSPOT_Z_THRESHOLD=3.0,
+                   HOTSPOT_EWMA_ALPHA=0.05)
+class HotspotTests(TestCase):
+
+    def test_steady_traffic_is_not_a_surge_after_a_restart(self):
+        # Two reports a minute for the last two hours, older than the window included
+        create_reports([minute for minute in range(120) for _ in range(2)])
+        self.assertEqual(HotspotDetector().snapshot(), [])
+
+    def test_surge_above_the_baseline_is_flagged(self):
+        create_reports(range(120))
+        create_reports([0, 1, 2, 3] * 6)
+        hotspots = HotspotDetector().snapshot()
+        self.assertEqual(len(hotspots), 1)
+        self.assertEqual(hotspots[0]['category'], 'Fire')
+        self.assertLess(hotspots[0]['baseline_per_minute'], 2)
+
+    def test_reports_recorded_before_the_first_load_are_counted_once(self):
+        detector = HotspotDetector()
+        for message in create_reports([0, 0, 1, 1, 2, 2]):
+            detector.record_message(message)
+        self.assertEqual(detector._cells, {})  # Nothing is buffered until a snapshot loads the window
+        hotspots = detector.snapshot()
+        self.assertEqual([hotspot['count'] for hotspot in hotspots], [6])
+
+    def test_baseline_history_covers_the_ewma(self):
+        self.assertEqual(baseline_minutes(0.05), 90)
+        self.assertEqual(baseline_minutes(0.5), 7)
+
+
+def tile_rows():
+    return sorted((zoom, x, y, day, category, severity, count, round(lat_sum, 6), round(lon_sum, 6))
+                  for zoom, x, y, day, category, severity, count, lat_sum, lon_sum
+                  in GeoTileCount.objects.values_list('zoom', 'x', 'y', 'day', 'category', 'severity',
+                                                      'count', 'lat_sum', 'lon_sum'))
+
+
+class GeoTileTests(TestCase):
+
+    def setUp(self):
+        rng = random.Random(6)
+        now = timezone.now()
+        self.messages = []
+        for _ in range(120):
+            lat, lon = rng.choice([(45.07, 7.69), (-16.9, 179.99), (-16.9, -179.99), (84.9, 20.0)])
+            message = ReceivedMessage.objects.create(
+                user_message='help', message_text='help', ai_category=rng.choice(['Fire', 'Flood']),
+                ai_severity=rng.choice(['CRIT', 'LOW', '']), user_latitude=lat + rng.uniform(-1, 1),
+                user_longitude=(lon + rng.uniform(-1, 1) + 180) % 360 - 180,
+                processed_at=now - timedelta(days=rng.randint(0, 9))
+            )
+            record_tile(message)
+            self.messages.append(message)
+
+    def test_rebuild_matches_incremental_counts(self):
+        incremental = tile_rows()
+        self.assertEqual(sum(row[6] for row in incremental), 120 * 6)  # Six zoom levels
+        self.assertEqual(rebuild_tiles(), len(incremental))
+        self.assertEqual(tile_rows(), incremental)
+
+        since = (timezone.now() - timedelta(days=3)).date()
+        GeoTileCount.objects.filter(day__gte=since).update(count=0)
+        rebuild_tiles(since=since)
+        self.assertEqual(tile_rows(), incremental)
+
+    def test_viewport_across_the_antimeridian(self):
+        zoom, cells = viewport_cells(-10, -25, -170, 170, map_zoom=4, days=10)
+        self.assertEqual(zoom, 6)
+        expected = sum(1 for m in self.messages if -25 <= m.user_latitude <= -10 and abs(m.user_longitude) >= 170)
+        self.assertEqual(sum(cell['count'] for cell in cells), expected)
+        self.assertTrue(all(abs(cell['center_lon']) >= 170 for cell in cells))
+
+    def test_days_are_bounded(self):
+        viewport = {'north': 50, 'south': 40, 'east': 10, 'west': 0, 'zoom': 4}
+        url = '/api/first-response/map/tiles/'
+        self.assertEqual(self.client.get(url, {**viewport, 'days': 10}).json()['days'], 10)
+        with self.settings(GEO_TILE_MAX_DAYS=30):
+            for days in (0, 31, 10 ** 9):
+                self.assertEqual(self.client.get(url, {**viewport, 'days': days}).status_code, 400)
+
+
+def next_event(subscriber, timeout=5):
+    """(event name, data) of the next SSE event a subscriber receives"""
+    lines = subscriber.queue.get(timeout=timeout).strip().split('\n')
+    fields = dict(line.split(': ', 1) for line in lines)
+    return fields['event'], json.loads(fields['data'])
+
+
+@override_settings(LIVE_TICK_SECONDS=0.05, LIVE_HEARTBEAT_SECONDS=0.1, LIVE_STREAM_MAX_SECONDS=0.3,
+                   LIVE_MAX_SUBSCRIBERS=1, LIVE_MAX_ASYNC_SUBSCRIBERS=2, EMERGENCY_CLUSTER_TIME_WINDOW_HOURS=1)
+class LiveChannelTests(TestCase):
+
+    def setUp(self):
+        self.channel = LiveChannel()
+        self.alerts = []
+        self.status = {'status': 'success', 'messages_24h': 3}
+        for target, kwargs in [
+            ('first_response.live.current_alerts', {'side_effect': lambda: list(self.alerts)}),
+            ('first_response.live.build_agentic_status', {'side_effect': lambda system: dict(self.status)}),
+            ('first_response.live.AgenticEmergencySystem', {}),
+            ('first_response.live.alert_notifier', {}),
+            ('first_response.live.connection', {}),
+            ('first_response.live.LiveChannel._probe', {'return_value': False}),
+        ]:
+            patcher = mock.patch(target, **kwargs)
+            setattr(self, target.rsplit('.', 1)[1], patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        for subscriber in list(self.channel._subscribers):
+            self.channel.unsubscribe(subscriber)
+        if self.channel._thread is not None:
+            self.channel._thread.join(5)
+
+    def alert(self, alert_id, count, minutes_old):
+        return {'id': alert_id, 'count': count,
+                'first_occurrence': (timezone.now() - timedelta(minutes=minutes_old)).isoformat()}
+
+    def test_snapshot_then_diffs_and_metric_deltas(self):
+        self.alerts = [self.alert('Fire_a', 5, 10)]
+        subscriber = self.channel.subscribe()
+        self.assertEqual(next_event(subscriber), ('snapshot', {'alerts': self.alerts, 'status': self.status}))
+
+        self.alerts = [self.alert('Fire_a', 6, 10), self.alert('Flood_b', 5, 5)]
+        self.status = {'status': 'success', 'messages_24h': 5}
+        self.channel.notify(alerts_changed=True)
+        self.assertEqual(next_event(subscriber), ('alerts', {
+            'added': [self.alerts[1]], 'updated': [self.alerts[0]], 'removed': []
+        }))
+        self.assertEqual(next_event(subscriber), ('metrics', {
+            'changed': {'messages_24h': 5}, 'deltas': {'messages_24h': 2}
+        }))
+        self.alert_notifier.notify.assert_called_with(self.alerts)
+        self.assertEqual(self.AgenticEmergencySystem.call_count, 1)  # Built once, not per refresh
+
+    def test_expired_alert_is_removed_without_a_new_message(self):
+        old = self.alert('Fire_a', 5, 60 - 0.005)  # Its oldest member leaves the one hour window in 0.3 s
+        self.alerts = [old, self.alert('Flood_b', 5, 5)]
+        subscriber = self.channel.subscribe()
+        self.assertEqual(next_event(subscriber)[0], 'snapshot')
+
+        self.alerts = self.alerts[1:]
+        self.assertEqual(next_event(subscriber), ('alerts', {'added': [], 'updated': [], 'removed': ['Fire_a']}))
+
+    def test_wsgi_streams_are_capped_below_the_thread_count(self):
+        self.assertIsNotNone(self.channel.subscribe())
+        self.assertIsNone(self.channel.subscribe())
+        self.assertIsNotNone(self.channel.subscribe(asynchronous=True))
+        self.assertIsNotNone(self.channel.subscribe(asynchronous=True))
+        self.assertIsNone(self.channel.subscribe(asynchronous=True))
+
+    def test_event_stream_ends_and_unsubscribes(self):
+        subscriber = self.channel.subscribe()
+        chunks = list(event_stream(self.channel, subscriber))
+        self.assertEqual(chunks[0], "retry: 3000\n\n")
+        self.assertTrue(chunks[1].startswith('id: 0\nevent: snapshot\n'))
+        self.assertIn(": keep-alive\n\n", chunks)
+        self.assertEqual(self.channel.subscriber_count(), 0)
+
+
+@override_settings(EMERGENCY_CLUSTER_RADIUS_KM=30, EMERGENCY_CLUSTER_MIN_COUNT=5,
+                   EMERGENCY_CLUSTER_TIME_WINDOW_HOURS=2)
+class SqlClusteringTests(TestCase):
+
+    def setUp(self):
+        # A fresh incremental index: the process-wide one holds rows of earlier tests
+        patcher = mock.patch('first_response.alerts.alert_clusters', AlertClusterIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sparse_window_is_not_refined(self):
+        rng = random.Random(8)
+        for _ in range(40):
+            ReceivedMessage.objects.create(
+                user_message='help', message_text='help', ai_category='Fire', ai_severity='HIGH',
+                user_latitude=rng.uniform(-60, 60), user_longitude=rng.uniform(-180, 180),
+                processed_at=timezone.now()
+            )
+        # Bounds and cell counts only: no message rows are fetched
+        with self.assertNumQueries(2):
+            self.assertEqual(sql_cluster_alerts(*cluster_settings()), [])
+
+    def test_endpoint_backends_agree(self):
+        create_alert_messages(150, seed=3)
+        url = '/api/first-response/alerts/'
+        incremental = self.client.get(url).json()
+        with override_settings(EMERGENCY_ALERTS_BACKEND='sql'):
+            cache.clear()
+            sql = self.client.get(url).json()
+        self.assertTrue(incremental['alerts'])
+        self.assertEqual(by_id(sql.pop('alerts')), by_id(incremental.pop('alerts')))
+        self.assertEqual(sql, incremental)
+
+
+class SubscriptionMatchingTests(TestCase):
+
+    def setUp(self):
+        self.turin = AlertSubscription.objects.create(area_type='circle', latitude=45.07, longitude=7.69,
+                                                      radius_km=20, categories=['Fire'])
+        self.fiji = AlertSubscription.objects.create(area_type='circle', latitude=-16.9, longitude=179.9,
+                                                     radius_km=50)
+        self.lake = AlertSubscription.objects.create(area_type='polygon', polygon=[
+            [8.5, 45.8], [8.8, 45.8], [8.8, 46.1], [8.5, 46.1]])
+        AlertSubscription.objects.create(area_type='circle', latitude=45.07, longitude=7.69, radius_km=20,
+                                         is_active=False)
+        self.index = SubscriptionIndex()
+
+    def test_points_match_containing_areas(self):
+        self.assertEqual(self.index.match(45.1, 7.7, 'Fire'), [self.turin.id])
+        self.assertEqual(self.index.match(45.1, 7.7, 'Flood'), [])  # Category filter
+        self.assertEqual(self.index.match(-16.9, -179.8), [self.fiji.id])  # Across the antimeridian
+        self.assertEqual(self.index.match(46.0, 8.6), [self.lake.id])
+        self.assertEqual(self.index.match(46.0, 8.95), [])
+
+    def test_matches_agree_with_a_linear_scan(self):
+        rng = np.random.default_rng(4)
+        for lat, lon in zip(rng.uniform(44, 47, 300), rng.uniform(6, 10, 300)):
+            expected = [self.lake.id] if 45.8 <= lat <= 46.1 and 8.5 <= lon <= 8.8 else []
+            if haversine_km(lat, lon, 45.07, 7.69) <= 20:
+                expected.insert(0, self.turin.id)
+            self.assertEqual(self.index.match(lat, lon, 'Fire'), expected)
+
+    def test_alert_radius_reaches_nearby_areas(self):
+        # 0.3 degrees east of the polygon (about 23 km) and 40 km from the Turin circle
+        self.assertEqual(self.index.match(46.0, 9.1), [])
+        self.assertEqual(self.index.match(46.0, 9.1, radius_km=30), [self.lake.id])
+        self.assertEqual(self.index.match(45.07, 8.2, 'Fire', radius_km=10), [])
+        self.assertEqual(self.index.match(45.07, 8.2, 'Fire', radius_km=30), [self.turin.id])
+
+    def test_notifier_matches_cluster_area_once(self):
+        alert = {'id': 'Fire_x', 'category': 'Fire', 'center_lat': 45.07, 'center_lon': 8.2, 'radius_km': 30,
+                 'dominant_severity': 'HIGH', 'count': 12}
+        with mock.patch('first_response.subscriptions.subscription_index', self.index):
+            notifier = AlertNotifier()
+            self.assertEqual(notifier.notify([alert]), 1)
+            self.assertEqual(notifier.notify([dict(alert, count=13, center_lon=8.201)]), 0)
+            self.assertEqual(AlertNotifier().notify([alert]), 0)  # Another worker already sent it
+        self.assertEqual(SubscriptionNotification.objects.get().subscription_id, self.turin.id)
+
+
+@override_settings(SUBSCRIPTION_MAX_PER_SESSION=2)
+class SubscriptionApiTests(TestCase):
+
+    url = '/api/first-response/subscriptions/'
+
+    def test_post_requires_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        body = json.dumps({'lat': 45.0, 'lon': 7.6, 'radius_km': 10})
+        self.assertEqual(client.post(self.url, body, content_type='application/json').status_code, 403)
+        client.get(reverse('dashboard'))  # Sets the CSRF cookie
+        response = client.post(self.url, body, content_type='application/json',
+                               HTTP_X_CSRFTOKEN=client.cookies['csrftoken'].value)
+        self.assertEqual(response.status_code, 201)
+
+    def test_subscriptions_are_capped_per_session(self):
+        body = json.dumps({'lat': 45.0, 'lon': 7.6, 'radius_km': 10})
+        for _ in range(2):
+            self.assertEqual(self.client.post(self.url, body, content_type='application/json').status_code, 201)
+        self.assertEqual(self.client.post(self.url, body, content_type='application/json').status_code, 429)
+        self.assertEqual(len(self.client.get(self.url).json()['subscriptions']), 2)
+
+
+def geometry_feature(event_id, coordinates, geometry_type='Polygon', event_type='FL'):
+    return {'type': 'Feature', 'properties': {'eventtype': event_type, 'eventid': event_id,
+                                              'eventname': f"Event {event_id}", 'alertlevel': 'Orange'},
+            'geometry': {'type': geometry_type, 'coordinates': coordinates}}
+
+
+class ImpactAreaTests(TestCase):
+
+    def setUp(self):
+        self.features = [
+            geometry_feature(1, [[[7.0, 45.0], [8.0, 45.0], [8.0, 46.0], [7.0, 46.0], [7.0, 45.0]]]),
+            geometry_feature(1, [7.5, 45.5], 'Point'),  # Event point: not an area
+            # Cyclone track drawn past the antimeridian
+            geometry_feature(2, [[[178.0, -18.0], [182.0, -18.0], [182.0, -15.0], [178.0, -15.0], [178.0, -18.0]]],
+                             event_type='TC'),
+            # Self-intersecting bow tie, repaired instead of dropped
+            geometry_feature(3, [[[10.0, 40.0], [11.0, 41.0], [11.0, 40.0], [10.0, 41.0], [10.0, 40.0]]]),
+        ]
+        self.areas = ImpactAreas(events_from_geometries(self.features))
+
+    def test_point_in_polygon_lookups(self):
+        self.assertEqual(len(self.areas), 3)
+        self.assertEqual([e['event_id'] for e in self.areas.containing(45.5, 7.5)], [1])
+        self.assertEqual(self.areas.containing(45.5, 8.5), [])
+        self.assertEqual([e['event_id'] for e in self.areas.containing(-16.0, -179.0)], [2])
+        self.assertEqual([e['event_id'] for e in self.areas.containing(40.5, 10.2)], [3])
+        self.assertEqual(self.areas.containing(None, 7.5), [])
+
+    def test_antimeridian_copy_and_dropped_points(self):
+        self.assertEqual(len(event_polygons(self.features[:2])), 1)
+        self.assertEqual(len(event_polygons(self.features[2:3])), 2)
+
+    def test_index_keeps_old_areas_when_a_refresh_fails(self):
+        fetch = mock.Mock(side_effect=[events_from_geometries(self.features), None])
+        index = ImpactAreaIndex(fetch=fetch)
+        self.assertEqual([e['event_id'] for e in index.containing(45.5, 7.5, wait=True)], [1])
+        index._next_refresh = 0.0
+        self.assertEqual([e['event_id'] for e in index.containing(45.5, 7.5, wait=True)], [1])
+        self.assertEqual(fetch.call_count, 2)
+        self.assertFalse(index.is_stale())
+        self.assertIsNotNone(index.stats()['last_error_at'])
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.messages = create_messages(150, seed=5)
+
+    def test_rebuild_matches_incremental_series(self):
+        now = timezone.now()
+        incremental = rollups.dashboard_stats(now)
+        rows = sorted(MessageRollup.objects.values_list(*rollups.DIMENSIONS, *rollups.MEASURES))
+        rollups.rebuild_rollups()
+        self.assertEqual(sorted(MessageRollup.objects.values_list(*rollups.DIMENSIONS, *rollups.MEASURES)), rows)
+        rebuilt = rollups.dashboard_stats(now)
+        for name in ('severity_stats', 'category_stats'):
+            self.assertEqual(list(rebuilt.pop(name)), list(incremental.pop(name)))
+        self.assertEqual(rebuilt, incremental)
+
+    def test_partial_rebuild_keeps_older_hours(self):
+        rows = sorted(MessageRollup.objects.values_list(*rollups.DIMENSIONS, *rollups.MEASURES))
+        since = timezone.now() - timedelta(days=10)
+        MessageRollup.objects.filter(hour__gte=since).update(count=0)
+        rollups.rebuild_rollups(since=since)
+        self.assertEqual(sorted(MessageRollup.objects.values_list(*rollups.DIMENSIONS, *rollups.MEASURES)), rows)
+
+    def test_follow_ups_today_counts_later_steps(self):
+        today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        expected = ReceivedMessage.objects.filter(received_at__gte=today, conversation_step__gt=1).count()
+        self.assertEqual(rollups.headline_stats(timezone.now())['follow_ups_today'], expected)
+
+    def test_contribution_does_not_query_for_a_loaded_parent(self):
+        reply = ReceivedMessage.objects.select_related('parent_message').filter(parent_message__isnull=False).first()
+        with self.assertNumQueries(0):
+            key, measures = rollups.contribution(reply)
+        self.assertEqual(measures['starter_replies'], int(reply.parent_message.is_conversation_starter))
+        reply = ReceivedMessage.objects.get(id=reply.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(rollups.contribution(reply, parent_is_starter=True)[1]['starter_replies'], 1)
+
+
+class HeadlineStatsTests(TestCase):
+
+    def test_single_query(self):
+        create_messages(50)
+        with self.assertNumQueries(1):
+            rollups.headline_stats(timezone.now())
+
+    def test_matches_message_table(self):
+        create_messages(200)
+        stats = rollups.headline_stats(timezone.now())
+        messages = ReceivedMessage.objects.all()
+
+        self.assertEqual(stats['total_messages'], messages.count())
+        self.assertEqual(stats['critical_messages'], messages.filter(ai_severity__in=['CRIT', 'HIGH']).count())
+        self.assertEqual(stats['total_processed'], messages.filter(processed_at__isnull=False).count())
+        self.assertEqual(stats['error_count'], messages.filter(has_error=True).count())
+        self.assertEqual(stats['conversations_active'],
+                         messages.filter(conversation_status='active', parent_message__isnull=True).count())
+        self.assertAlmostEqual(stats['avg_response_time'],
+                               messages.aggregate(avg=Avg('response_time_ms'))['avg'])
+        self.assertAlmostEqual(stats['avg_conversation_length'], messages.filter(
+            is_conversation_starter=True
+        ).annotate(length=Count('follow_ups') + 1).aggregate(avg=Avg('length'))['avg'])
+
+    def test_moved_message_is_not_counted_twice(self):
+        message = create_messages(1)[0]
+        previous = rollups.contribution(message)
+        message.ai_severity = 'CRIT' if message.ai_severity != 'CRIT' else 'LOW'
+        message.has_error = not message.has_error
+        message.save()
+        rollups.record_message(message, previous)
+
+        stats = rollups.headline_stats(timezone.now())
+        self.assertEqual(stats['total_messages'], 1)
+        self.assertEqual(stats['error_count'], int(message.has_error))
+        self.assertEqual(stats['critical_messages'], int(message.ai_severity in ('CRIT', 'HIGH')))
+
+    def test_rebuild_matches_incremental(self):
+        create_messages(150)
+        incremental = rollups.headline_stats(timezone.now())
+        rollups.rebuild_rollups()
+        self.assertEqual(rollups.headline_stats(timezone.now()), incremental)
+
+    def test_timing(self):
+        # A year of busy hours: the aggregate reads rollup rows, never messages
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=365)
+        MessageRollup.objects.bulk_create([
+            MessageRollup(hour=start + timedelta(hours=hour), category=category, severity='HIGH',
+                          language='en', message_type='text', count=10, processed=10,
+                          response_time_count=10, response_time_total=2000, starters=8, starter_replies=2)
+            for hour in range(365 * 24) for category in ('Fire', 'Flood', 'Medical')
+        ], batch_size=2000)
+
+        started = time.perf_counter()
+        stats = rollups.headline_stats(timezone.now())
+        elapsed = time.perf_counter() - started
+        self.assertEqual(stats['total_messages'], 365 * 24 * 3 * 10)
+        self.assertLess(elapsed, 1.0)
+
+
+class DashboardQueryCountTests(TestCase):
+
+    def _count_queries(self, func):
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context)
+
+    def test_admin_dashboard_queries_do_not_grow_with_messages(self):
+        with translation.override('en'):
+            url = reverse('admin_dashboard')
+        create_messages(10, seed=1)
+        few = self._count_queries(lambda: self.assertEqual(self.client.get(url).status_code, 200))
+        create_messages(100, seed=2)
+        many = self._count_queries(lambda: self.assertEqual(self.client.get(url).status_code, 200))
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 6)
+
+    def test_status_runtime_stats_single_query(self):
+        create_messages(50)
+        # The rollup aggregate and the stage latency histograms
+        with self.assertNumQueries(2):
+            status = build_agentic_status()
+        stats = rollups.headline_stats(timezone.now())
+        self.assertEqual(status['messages_24h'], stats['messages_24h'])
+        self.assertEqual(status['categories_processed'], stats['categories_24h'])
+
+
+def create_conversation(depth, fan_out, rng, parent=None, step=1):
+    """A starter (or reply) with `fan_out` replies per level, `depth` levels deep, counted like the views do"""
+    message = ReceivedMessage.objects.create(
+        user_message='help', message_text='help', user_latitude=45.0, user_longitude=7.6,
+        ai_category=rng.choice(['Fire', 'Flood']), ai_severity=rng.choice(['HIGH', 'LOW']),
+        parent_message=parent, is_conversation_starter=parent is None, conversation_step=step,
+        processed_at=timezone.now()
+    )
+    ReceivedMessage.objects.filter(id=message.id).update(received_at=timezone.now() - timedelta(
+        minutes=rng.randint(0, 600)))
+    message.refresh_from_db()
+    conversations.record_message(message)
+    if depth:
+        for _ in range(fan_out):
+            create_conversation(depth - 1, fan_out, rng, message, conversations.add_follow_up(message))
+    return message
+
+
+class ConversationStatsTests(TestCase):
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.roots = [create_conversation(2, 3, rng) for _ in range(4)]
+
+    def test_follow_up_steps_and_counts(self):
+        root = self.roots[0]
+        replies = list(ReceivedMessage.objects.filter(parent_message=root).order_by('id'))
+        self.assertEqual([reply.conversation_step for reply in replies], [2, 3, 4])
+        root.refresh_from_db()
+        self.assertEqual(root.follow_up_count, 3)
+
+    def test_incremental_stats_match_backfill(self):
+        fields = ('id', 'follow_up_count', 'last_activity_at', 'latest_severity', 'latest_category')
+        incremental = {row[0]: row[1] for row in ReceivedMessage.objects.values_list(*fields)}
+        conversations.backfill_conversation_stats(batch_size=7)
+        backfilled = list(ReceivedMessage.objects.values_list(*fields))
+        self.assertEqual({row[0]: row[1] for row in backfilled}, incremental)
+        for message_id, count, activity, severity, category in backfilled:
+            latest = ReceivedMessage.objects.filter(parent_message_id=message_id).order_by(
+                '-received_at', '-id').first()
+            if latest is not None:
+                self.assertEqual((activity, severity, category),
+                                 (latest.received_at, latest.ai_severity, latest.ai_category))
+
+    def test_thread_cte_matches_a_tree_walk(self):
+        def walk(message):
+            found = [message]
+            for reply in ReceivedMessage.objects.filter(parent_message=message):
+                found.extend(walk(reply))
+            return found
+
+        for root in self.roots:
+            expected = sorted(walk(root), key=lambda m: (m.received_at, m.id))
+            leaf = expected[-1] if expected[-1].parent_message_id else expected[0]
+            with self.assertNumQueries(1):
+                self.assertEqual([m.id for m in conversation_thread(leaf.id)], [m.id for m in expected])
+        with self.assertNumQueries(1):
+            threads = conversation_threads([root.id for root in self.roots])
+        for root in self.roots:
+            self.assertEqual(len(threads[root.id]), 1 + 3 + 9)
+        self.assertEqual(conversation_thread(0), [])
+
+
+class StageLatencyTests(TestCase):
+
+    def test_bucket_error_is_bounded(self):
+        for ms in (0.05, 1, 37.5, 480, 12000, 250000):
+            self.assertAlmostEqual(bucket_value(bucket_index(ms)), ms, delta=ms * 0.02)
+
+    def test_percentiles_match_exact_values(self):
+        rng = random.Random(3)
+        durations = sorted(rng.lognormvariate(5, 1) for _ in range(5000))
+        recorder = StageLatency()
+        for ms in durations:
+            recorder.record('classify', ms)
+        stats = recorder.summary(max_age=0)['classify']['5m']
+        self.assertEqual(stats['count'], len(durations))
+        for q in (50, 95, 99):
+            exact = durations[int(len(durations) * q / 100)]
+            self.assertAlmostEqual(stats[f"p{q}"], exact, delta=exact * 0.03)
+
+    def test_workers_merge_through_flush(self):
+        first, second = StageLatency(), StageLatency()
+        for _ in range(100):
+            first.record('plan', 10)
+            second.record('plan', 1000)
+        first.flush()
+        second.flush()
+
+        self.assertEqual(LatencyHistogram.objects.filter(stage='plan', resolution='minute').count(), 1)
+        self.assertEqual(LatencyHistogram.objects.get(stage='plan', resolution='hour').count, 200)
+        stats = StageLatency().summary(max_age=0)['plan']
+        for window in ('5m', '1h', '24h'):
+            self.assertEqual(stats[window]['count'], 200)
+            self.assertAlmostEqual(stats[window]['p50'], 10, delta=0.2)
+            self.assertAlmostEqual(stats[window]['p99'], 1000, delta=20)
+            self.assertAlmostEqual(stats[window]['mean_ms'], 505)
+
+    def test_summary_flushes_an_idle_delta(self):
+        recorder = StageLatency()
+        recorder.record('tts', 40)
+        self.assertFalse(LatencyHistogram.objects.exists())  # Not due yet
+
+        recorder._last_flush -= 60  # The process has been idle since
+        self.assertEqual(recorder.summary(max_age=0)['tts']['5m']['count'], 1)
+        self.assertEqual(LatencyHistogram.objects.get(stage='tts', resolution='minute').count, 1)
+        self.assertEqual(StageLatency().summary(max_age=0)['tts']['5m']['count'], 1)
+        self.assertEqual(recorder.summary(max_age=0)['tts']['5m']['count'], 1)  # Not counted twice
+
+
+class RetentionTests(TestCase):
+
+    def setUp(self):
+        self.messages = create_messages(200, seed=4)
+        self.cutoff = timezone.now() - timedelta(days=20)
+
+    def test_only_whole_idle_conversations_move(self):
+        conversations, archived = archive_conversations(self.cutoff, batch_size=7)
+        self.assertGreater(conversations, 0)
+        self.assertEqual(ArchivedMessage.objects.count(), archived)
+        self.assertEqual(ReceivedMessage.objects.count() + archived, len(self.messages))
+        # No conversation is split between the tables
+        archived_ids = set(ArchivedMessage.objects.values_list('id', flat=True))
+        self.assertFalse(ReceivedMessage.objects.filter(parent_message_id__in=archived_ids).exists())
+        self.assertFalse(ArchivedMessage.objects.exclude(parent_id__in=archived_ids).exclude(
+            parent_id__isnull=True).exists())
+        self.assertFalse(ArchivedMessage.objects.filter(received_at__gte=self.cutoff).exists())
+
+    def test_rebuilds_still_count_archived_messages(self):
+        stats = rollups.headline_stats(timezone.now())
+        rebuild_tiles()
+        tiles = sorted(GeoTileCount.objects.values_list('zoom', 'x', 'y', 'day', 'category', 'severity', 'count'))
+        archive_conversations(self.cutoff)
+
+        rollups.rebuild_rollups()
+        self.assertEqual(rollups.headline_stats(timezone.now()), stats)
+        rebuild_tiles()
+        self.assertEqual(sorted(GeoTileCount.objects.values_list(
+            'zoom', 'x', 'y', 'day', 'category', 'severity', 'count')), tiles)
+
+    def test_archived_conversation_is_readable(self):
+        session = self.client.session
+        session.save()
+        old = timezone.now() - timedelta(days=30)
+        root = ReceivedMessage.objects.create(user_message='fire', message_text='fire', user_latitude=45.0,
+                                              user_longitude=7.6, ai_severity='HIGH', session_key=session.session_key)
+        reply = ReceivedMessage.objects.create(user_message='still burning', message_text='still burning',
+                                               user_latitude=45.0, user_longitude=7.6, ai_severity='CRIT',
+                                               parent_message=root, is_conversation_starter=False,
+                                               conversation_step=2, session_key='other')
+        last = ReceivedMessage.objects.create(user_message='out', message_text='out', user_latitude=45.0,
+                                              user_longitude=7.6, ai_severity='LOW', parent_message=reply,
+                                              is_conversation_starter=False, conversation_step=3)
+        ReceivedMessage.objects.filter(id__in=[root.id, reply.id, last.id]).update(received_at=old)
+        archive_conversations(self.cutoff)
+
+        archived, messages = find_conversation(last.id)
+        self.assertTrue(archived)
+        self.assertEqual(sorted(m.id for m in messages), [root.id, reply.id, last.id])
+
+        self.assertEqual(self.client.get(f'/api/first-response/conversations/{root.id}/').status_code, 200)
+        response = self.client.get(f'/api/first-response/conversations/{reply.id}/').json()
+        self.assertTrue(response['archived'])
+        self.assertEqual([m['message_text'] for m in response['messages']], ['fire', 'still burning', 'out'])
+        self.assertEqual(response['messages'][2]['parent_id'], reply.id)
+
+    def test_foreign_follow_up_cannot_read_the_thread(self):
+        session = self.client.session
+        session.save()
+        root = ReceivedMessage.objects.create(user_message='fire', message_text='fire', user_latitude=45.0,
+                                              user_longitude=7.6, ai_severity='HIGH', session_key='owner')
+        reply = ReceivedMessage.objects.create(user_message='hello', message_text='hello', user_latitude=45.0,
+                                               user_longitude=7.6, ai_severity='LOW', parent_message=root,
+                                               is_conversation_starter=False, conversation_step=2,
+                                               session_key=session.session_key)
+        for message in (root, reply):
+            self.assertEqual(self.client.get(f'/api/first-response/conversations/{message.id}/').status_code, 404)
+
+        archive_conversations(timezone.now() + timedelta(days=1))
+        self.assertTrue(ArchivedMessage.objects.filter(id=reply.id).exists())
+        self.assertEqual(self.client.get(f'/api/first-response/conversations/{reply.id}/').status_code, 404)
+
+
+class MessageExportTests(TestCase):
+
+    def setUp(self):
+        self.messages = create_messages(120, seed=5)
+        self.client.force_login(User.objects.create_user('analyst', password='x', is_staff=True))
+        self.expected = ReceivedMessage.objects.filter(ai_severity='HIGH').order_by('id')
+
+    def _get(self, **params):
+        response = self.client.get('/api/first-response/export/', {'severity': 'high', **params})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self._get(format='ndjson').decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], list(self.expected.values_list('id', flat=True)))
+        self.assertEqual(rows[0]['parent_message_id'], self.expected[0].parent_message_id)
+
+    def test_csv(self):
+        lines = self._get(format='csv').decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'received_at', 'processed_at'])
+        self.assertEqual(len(lines) - 1, self.expected.count())
+
+    def test_npz_columns(self):
+        columns = np.load(io.BytesIO(self._get(format='npy')))
+        labels = json.loads(columns['labels.json'])['labels']
+        self.assertEqual(columns['id'].tolist(), list(self.expected.values_list('id', flat=True)))
+        self.assertEqual(columns['received_at'].tolist(),
+                         [to_epoch_us(m.received_at) for m in self.expected])
+        self.assertEqual({labels['ai_severity'][code] for code in columns['ai_severity']}, {'HIGH'})
+        self.assertNotIn('message_text', columns.files)
+
+    def test_requires_staff(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/first-response/export/').status_code, 302)
+
+    def test_command_writes_npy_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_messages', format='npy', output=directory, chunk_size=16, stdout=io.StringIO())
+            processed = np.load(Path(directory) / 'processed_at.npy')
+            self.assertEqual(len(processed), len(self.messages))
+            self.assertEqual(int((processed == NO_TIME).sum()),
+                             ReceivedMessage.objects.filter(processed_at__isnull=True).count())
+
+
+class AdminChangelistTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        self.url = reverse('admin:first_response_receivedmessage_changelist')
+
+    def _count_queries(self, params=None):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(self.url, params or {}).status_code, 200)
+        return len(context)
+
+    def test_queries_do_not_grow_with_rows(self):
+        create_messages(10, seed=6)
+        self._count_queries()  # Caches the category filter choices
+        few = self._count_queries()
+        create_messages(150, seed=7)
+        self.assertEqual(self._count_queries(), few)
+        self.assertEqual(self._count_queries({'ai_category': 'Fire'}), self._count_queries({'ai_category': 'Flood'}))
+
+    def test_filtered_count_is_capped(self):
+        create_messages(30, seed=8)
+        with self.settings(ADMIN_COUNT_LIMIT=10):
+            paginator = EstimatedCountPaginator(ReceivedMessage.objects.filter(user_latitude__gt=0), 5)
+            self.assertEqual(paginator.count, 10)
+            self.assertEqual(paginator.num_pages, 2)
+
+    def test_archive_changelist_skips_full_counts(self):
+        create_messages(40, seed=9)
+        archive_conversations(timezone.now() + timedelta(days=1))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:first_response_archivedmessage_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.context['cl'].paginator, EstimatedCountPaginator)
+        self.assertFalse(any('DISTINCT' in query['sql'] for query in context.captured_queries))
+
+
+class MessageSearchTests(TestCase):
+
+    def setUp(self):
+        self.fire = ReceivedMessage.objects.create(user_message='The building is burning, smoke everywhere',
+                                                   user_latitude=45.0, user_longitude=7.6, ai_category='Fire',
+                                                   ai_severity='HIGH', user_ip='10.0.0.7')
+        self.flood = ReceivedMessage.objects.create(user_message="C'è un incendio vicino al fiume", language='it',
+                                                    user_latitude=45.0, user_longitude=7.6, ai_category='Flood',
+                                                    ai_severity='MED')
+
+    def _ids(self, text):
+        return set(search_messages(ReceivedMessage.objects.all(), text).values_list('id', flat=True))
+
+    def test_stemming_and_prefixes(self):
+        self.assertEqual(self._ids('burned buildings'), {self.fire.id})
+        self.assertEqual(self._ids('incendi'), {self.flood.id})
+        self.assertEqual(self._ids('flood'), {self.flood.id})
+        self.assertEqual(self._ids('smoke fiume'), set())
+        self.assertEqual(self._ids('"*) OR ('), set())
+
+    def test_index_follows_updates_and_deletes(self):
+        self.fire.follow_up_question = 'Is anyone trapped?'
+        self.fire.save()
+        self.assertEqual(self._ids('trapped'), {self.fire.id})
+        ReceivedMessage.objects.filter(id=self.fire.id).update(user_message='All clear')
+        self.assertEqual(self._ids('smoke'), set())
+        self.fire.delete()
+        self.assertEqual(self._ids('trapped'), set())
+
+    def test_admin_and_api(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        changelist = reverse('admin:first_response_receivedmessage_changelist')
+        self.assertContains(self.client.get(changelist, {'q': 'smoke'}), '1 result')
+        self.assertContains(self.client.get(changelist, {'q': '10.0.0.7'}), '1 result')
+
+        response = self.client.get('/api/first-response/messages/search/', {'q': 'incendio'}).json()
+        self.assertEqual([r['id'] for r in response['results']], [self.flood.id])
+        self.assertEqual([m.id for m in ranked_search('building smoke', limit=5)], [self.fire.id])
+        self.assertEqual(self.client.get('/api/first-response/messages/search/').status_code, 400)
+
+
+class MessageBrowsingTests(TestCase):
+
+    def setUp(self):
+        self.messages = create_messages(90, seed=6)
+        # Ties on received_at are ordered by id
+        ReceivedMessage.objects.filter(id__in=[m.id for m in self.messages[:10]]).update(
+            received_at=timezone.now() - timedelta(days=3)
+        )
+        self.newest_first = list(ReceivedMessage.objects.order_by('-received_at', '-id').values_list('id', flat=True))
+
+    def test_pages_cover_every_message_once(self):
+        ids, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                rows, cursor = keyset_page(ReceivedMessage.objects.all(), ['id'], cursor, limit=7)
+            ids.extend(row['id'] for row in rows)
+            if cursor is None:
+                break
+        self.assertEqual(ids, self.newest_first)
+
+    def test_api_filters_and_fields(self):
+        self.client.force_login(User.objects.create_user('analyst', password='x', is_staff=True))
+        ids, cursor = [], None
+        while True:
+            response = self.client.get('/api/first-response/messages/', {
+                'severity': 'high', 'fields': 'ai_severity,latitude', 'limit': 4, **({'cursor': cursor} if cursor else {})
+            }).json()
+            self.assertTrue(all(set(m) == {'id', 'ai_severity', 'latitude'} for m in response['messages']))
+            ids.extend(m['id'] for m in response['messages'])
+            cursor = response['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(ids, list(ReceivedMessage.objects.filter(ai_severity='HIGH').order_by(
+            '-received_at', '-id').values_list('id', flat=True)))
+
+        outside = {'north': 40, 'south': 30, 'east': 10, 'west': 0}
+        self.assertEqual(self.client.get('/api/first-response/messages/', outside).json()['messages'], [])
+        self.assertEqual(self.client.get('/api/first-response/messages/', {'fields': 'user_ip'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/first-response/messages/', {'cursor': 'not-a-cursor'}).status_code, 400)
+        for token in (b'99999999999999999999999.1', b'0.99999999999999999999999', b'0.-1'):
+            cursor = base64.urlsafe_b64encode(token).decode('ascii')
+            for url in ('/api/first-response/messages/', '/api/first-response/conversations/'):
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 400)
+
+    def test_visitors_only_browse_their_session(self):
+        session = self.client.session
+        session.save()
+        ReceivedMessage.objects.filter(id=self.messages[5].id).update(session_key=session.session_key)
+        response = self.client.get('/api/first-response/messages/').json()
+        self.assertEqual([m['id'] for m in response['messages']], [self.messages[5].id])
+
+    def test_conversation_threads(self):
+        root = ReceivedMessage.objects.create(user_message='fire', message_text='fire', user_latitude=45.0,
+                                              user_longitude=7.6)
+        reply = ReceivedMessage.objects.create(user_message='spreading', message_text='spreading',
+                                               user_latitude=45.0, user_longitude=7.6, parent_message=root,
+                                               is_conversation_starter=False, conversation_step=2)
+        last = ReceivedMessage.objects.create(user_message='out', message_text='out', user_latitude=45.0,
+                                              user_longitude=7.6, parent_message=reply,
+                                              is_conversation_starter=False, conversation_step=3)
+        with self.assertNumQueries(1):
+            self.assertEqual([m.id for m in conversation_thread(last.id)], [root.id, reply.id, last.id])
+
+        roots = list(ReceivedMessage.objects.filter(parent_message__isnull=True).values_list('id', flat=True))
+        with self.assertNumQueries(1):
+            threads = conversation_threads(roots)
+        self.assertEqual(sum(len(thread) for thread in threads.values()), len(self.messages) + 3)
+
+        self.client.force_login(User.objects.create_user('analyst', password='x', is_staff=True))
+        response = self.client.get('/api/first-response/conversations/', {'messages': '1', 'fields': 'message_text',
+                                                                  'limit': 1}).json()
+        self.assertEqual(response['conversations'][0]['id'], root.id)
+        self.assertEqual([m['message_text'] for m in response['conversations'][0]['messages']],
+                         ['fire', 'spreading', 'out'])
+        self.assertIsNotNone(response['next_cursor'])
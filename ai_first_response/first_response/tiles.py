@@ -0,0 +1,185 @@
+"""
+Multi-Resolution Geo Tiles
+Per-day message counts in Web Mercator tiles (the z/x/y scheme Google Maps
+uses) at a few zoom levels, kept up to date on ingest. The admin map asks for
+the cells in its viewport at a resolution that follows the map zoom, so its
+payload depends on how many cells are on screen, not on message volume.
+"""
+import math
+from datetime import date, timedelta
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .analytics import load_columns
+from .models import ArchivedMessage, GeoTileCount, ReceivedMessage
+
+MAX_MERCATOR_LAT = 85.05112878  # Web Mercator tiles stop here
+
+
+def tile_zoom_levels():
+    """Zoom levels tile counts are maintained for, ascending"""
+    return sorted(getattr(settings, 'GEO_TILE_ZOOM_LEVELS', [2, 4, 6, 8, 10, 12]))
+
+
+def tile_xy(lat, lon, zoom):
+    """Tile (x, y) containing a point; lat/lon may be scalars or NumPy arrays"""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = np.floor((np.asarray(lon) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat)) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def record_message(message):
+    """Add a processed message to its tile at every maintained zoom level"""
+    if (not message.ai_category or message.user_latitude is None
+            or message.user_longitude is None or message.processed_at is None):
+        return
+    day = message.processed_at.date()
+    severity = message.ai_severity or ''
+    lat, lon = message.user_latitude, message.user_longitude
+
+    for zoom in tile_zoom_levels():
+        x, y = (int(v) for v in tile_xy(lat, lon, zoom))
+        key = dict(zoom=zoom, x=x, y=y, day=day, category=message.ai_category, severity=severity)
+        increment = dict(count=F('count') + 1, lat_sum=F('lat_sum') + lat, lon_sum=F('lon_sum') + lon)
+        if GeoTileCount.objects.filter(**key).update(**increment):
+            continue
+        try:
+            with transaction.atomic():
+                GeoTileCount.objects.create(count=1, lat_sum=lat, lon_sum=lon, **key)
+        except IntegrityError:
+            # Another worker created the row first
+            GeoTileCount.objects.filter(**key).update(**increment)
+
+
+def data_zoom(map_zoom):
+    """Maintained zoom level to serve a map zoom from (finer by GEO_TILE_DETAIL levels)"""
+    target = map_zoom + getattr(settings, 'GEO_TILE_DETAIL', 2)
+    levels = tile_zoom_levels()
+    return max((zoom for zoom in levels if zoom <= target), default=levels[0])
+
+
+def _tile_ranges(north, south, east, west, zoom):
+    """x ranges and the y range covering a viewport; x splits in two across the antimeridian"""
+    x_west, y_north = tile_xy(north, west, zoom)
+    x_east, y_south = tile_xy(south, east, zoom)
+    if west <= east:
+        x_ranges = [(int(x_west), int(x_east))]
+    else:
+        x_ranges = [(int(x_west), 2 ** zoom - 1), (0, int(x_east))]
+    return x_ranges, (int(y_north), int(y_south))
+
+
+def viewport_cells(north, south, east, west, map_zoom, days=None):
+    """
+    Aggregated cells inside a map viewport.
+
+    Args:
+        north, south, east, west: Viewport bounds in degrees
+        map_zoom: Current map zoom level
+        days: How many days back to include (GEO_TILE_DEFAULT_DAYS by default)
+
+    Returns:
+        (zoom the cells are at, list of cell dicts)
+    """
+    if days is None:
+        days = getattr(settings, 'GEO_TILE_DEFAULT_DAYS', 7)
+    zoom = data_zoom(map_zoom)
+    x_ranges, (y_min, y_max) = _tile_ranges(north, south, east, west, zoom)
+    since = timezone.now().date() - timedelta(days=days - 1)
+
+    cells = {}
+    for x_min, x_max in x_ranges:
+        rows = GeoTileCount.objects.filter(
+            zoom=zoom, day__gte=since, x__gte=x_min, x__lte=x_max, y__gte=y_min, y__lte=y_max
+        ).values('x', 'y', 'category', 'severity').annotate(
+            total=Sum('count'), lat_total=Sum('lat_sum'), lon_total=Sum('lon_sum')
+        ).values_list('x', 'y', 'category', 'severity', 'total', 'lat_total', 'lon_total')
+
+        for x, y, category, severity, count, lat_sum, lon_sum in rows:
+            cell = cells.get((x, y))
+            if cell is None:
+                cell = cells[(x, y)] = {'x': x, 'y': y, 'count': 0, 'lat_sum': 0.0, 'lon_sum': 0.0,
+                                        'categories': {}, 'severities': {}}
+            cell['count'] += count
+            cell['lat_sum'] += lat_sum
+            cell['lon_sum'] += lon_sum
+            cell['categories'][category] = cell['categories'].get(category, 0) + count
+            severity = severity or 'UNKNOWN'
+            cell['severities'][severity] = cell['severities'].get(severity, 0) + count
+
+    result = []
+    for cell in cells.values():
+        count = cell['count']
+        result.append({
+            'x': cell['x'],
+            'y': cell['y'],
+            'count': count,
+            'center_lat': round(cell.pop('lat_sum') / count, 5),
+            'center_lon': round(cell.pop('lon_sum') / count, 5),
+            'categories': cell['categories'],
+            'severities': cell['severities']
+        })
+    result.sort(key=lambda c: c['count'], reverse=True)
+    return zoom, result
+
+
+def rebuild_tiles(since=None, batch_size=2000):
+    """
+    Recompute tile counts from the stored and archived messages (all of them,
+    or those processed on or after `since`). Returns the number of tile rows written.
+    """
+    tiles = GeoTileCount.objects.all()
+    if since is not None:
+        tiles = tiles.filter(day__gte=since)
+
+    parts = []
+    labels = {'ai_category': {}, 'ai_severity': {}}
+    for model in (ReceivedMessage, ArchivedMessage):
+        messages = model.objects.filter(
+            processed_at__isnull=False,
+            user_latitude__isnull=False,
+            user_longitude__isnull=False
+        ).exclude(ai_category='')
+        if since is not None:
+            messages = messages.filter(processed_at__date__gte=since)
+        columns = load_columns(messages, ['ai_category', 'ai_severity', 'user_latitude', 'user_longitude',
+                                          'processed_at'], consumer='tile_rebuild')
+        part = {name: columns[name] for name in ('user_latitude', 'user_longitude', 'processed_at')}
+        # Re-code labels against one vocabulary shared by both tables
+        for name, vocabulary in labels.items():
+            codes = [vocabulary.setdefault(value, len(vocabulary)) for value in columns.labels[name]]
+            mapping = np.array(codes + [-1], dtype=np.int32)
+            part[name] = mapping[columns[name]]
+        parts.append(part)
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    lats, lons = columns['user_latitude'], columns['user_longitude']
+    days = columns['processed_at'] // (86400 * 1000 * 1000)
+    categories = list(labels['ai_category'])
+    severities = list(labels['ai_severity'])
+
+    rows = []
+    for zoom in tile_zoom_levels():
+        xs, ys = tile_xy(lats, lons, zoom)
+        keys = np.stack([xs, ys, days, columns['ai_category'], columns['ai_severity']], axis=1)
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        counts = np.bincount(inverse, minlength=len(unique))
+        lat_sums = np.bincount(inverse, weights=lats, minlength=len(unique))
+        lon_sums = np.bincount(inverse, weights=lons, minlength=len(unique))
+        for (x, y, day, category, severity), count, lat_sum, lon_sum in zip(
+                unique.tolist(), counts.tolist(), lat_sums.tolist(), lon_sums.tolist()):
+            rows.append(GeoTileCount(
+                zoom=zoom, x=x, y=y, day=date.fromordinal(date(1970, 1, 1).toordinal() + day),
+                category=categories[category], severity=severities[severity] if severity >= 0 else '',
+                count=count, lat_sum=lat_sum, lon_sum=lon_sum
+            ))
+
+    with transaction.atomic():
+        tiles.delete()
+        GeoTileCount.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
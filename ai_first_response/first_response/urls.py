@@ -1,14 +1,28 @@
 from django.urls import path
 from .views import (first_response, dashboard, admin_dashboard, system_dashboard, voice_message, 
-                   emergency_alerts, text_to_speech_api, agentic_system_status, 
+                   emergency_alerts, emergency_hotspots, map_tiles, live_updates, text_to_speech_api, agentic_system_status, 
                    agentic_memory_insights, disaster_feeds_cache_stats, clear_disaster_feeds_cache,
-                   reset_agentic_metrics)
+                   reset_agentic_metrics, alert_subscriptions, alert_subscription_detail,
+                   subscription_notifications, conversation_detail, message_export,
+                   message_search, message_list, conversation_list)
 
 # API URLs (no language prefix)
 api_urlpatterns = [
     path('first-response/emergency/', first_response, name='first_response'),
     path('first-response/voice/', voice_message, name='voice_message'),
     path('first-response/alerts/', emergency_alerts, name='emergency_alerts'),
+    path('first-response/alerts/hotspots/', emergency_hotspots, name='emergency_hotspots'),
+    path('first-response/map/tiles/', map_tiles, name='map_tiles'),
+    path('first-response/live/', live_updates, name='live_updates'),
+    path('first-response/subscriptions/', alert_subscriptions, name='alert_subscriptions'),
+    path('first-response/subscriptions/<int:subscription_id>/', alert_subscription_detail, name='alert_subscription_detail'),
+    path('first-response/subscriptions/<int:subscription_id>/notifications/', subscription_notifications,
+         name='subscription_notifications'),
+    path('first-response/messages/', message_list, name='message_list'),
+    path('first-response/conversations/', conversation_list, name='conversation_list'),
+    path('first-response/conversations/<int:message_id>/', conversation_detail, name='conversation_detail'),
+    path('first-response/messages/search/', message_search, name='message_search'),
+    path('first-response/export/', message_export, name='message_export'),
     path('first-response/tts/', text_to_speech_api, name='text_to_speech_api'),
     path('first-response/agentic/status/', agentic_system_status, name='agentic_system_status'),
     path('first-response/agentic/memory/', agentic_memory_insights, name='agentic_memory_insights'),
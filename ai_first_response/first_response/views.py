@@ -1,25 +1,41 @@
 import os
 import json
+import logging
 import time
 import tempfile
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render
 from django.conf import settings
 from django.utils import timezone
 from django.utils.translation import get_language
 from django.core.files.storage import default_storage
-from .models import EmergencyCategory, ReceivedMessage
+from django.utils.cache import get_conditional_response, patch_cache_control
+from .models import EmergencyCategory, ReceivedMessage, AlertSubscription
 from .responders import classify_message
 from .disaster_feeds import recent_quakes, gdacs_events, get_cache_stats, cleanup_expired_cache, clear_cache
 from .audio_utils import speech_to_text, text_to_speech, convert_audio_format, cleanup_audio_file
 from .agentic_system import AgenticEmergencySystem
 from .metrics import agentic_metrics
+from .status import build_agentic_status
+from .alerts import alert_clusters, alerts_etag
+from .hotspots import hotspot_detector, hotspot_settings
+from .tiles import viewport_cells
+from .live import live_channel, event_stream, async_event_stream
+from .subscriptions import subscription_index, polygon_from_ring
+from .ingest import message_processed
+from .latency import stage_latency
+from .retention import find_conversation, message_to_dict
+from .search import ranked_search
+from .browse import conversation_page, filter_messages, keyset_page, page_size, parse_area, parse_fields
+from .exports import (FORMATS as EXPORT_FORMATS, ExportProgress, csv_chunks, export_queryset, ndjson_chunks,
+                      npz_chunks, parse_time)
+from . import conversations, rollups
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Count, Q, Avg
-from django.db.models.functions import TruncDay, TruncHour
-from datetime import datetime, timedelta
-import math
+
+logger = logging.getLogger(__name__)
+
 
 def dashboard(request):
     """Render the emergency chat dashboard"""
@@ -50,6 +66,7 @@ def first_response(request):
 
     start_time = time.time()
     received_message = None
+    processed = False  # Whether the message reached the ingest hooks
     
     try:
         # Check if request body is empty
@@ -128,7 +145,7 @@ def first_response(request):
         if conversation_id:
             try:
                 parent_message = ReceivedMessage.objects.get(id=conversation_id)
-                conversation_step = parent_message.follow_ups.count() + 2  # +1 for parent, +1 for this message
+                conversation_step = conversations.add_follow_up(parent_message)
                 is_conversation_starter = False
             except ReceivedMessage.DoesNotExist:
                 print(f"Warning: Parent message {conversation_id} not found")
@@ -242,13 +259,17 @@ def first_response(request):
             
             # Update parent message if this is a follow-up and category/severity changed
             if parent_message and (conversation_info.get('severity_update') or conversation_info.get('category_update')):
+                counted_as = rollups.contribution(parent_message)
                 if conversation_info.get('severity_update'):
                     parent_message.ai_severity = normalize_severity(conversation_info['severity_update'])
                 if conversation_info.get('category_update'):
                     parent_message.ai_category = conversation_info['category_update']
-                parent_message.save()
+                parent_message.save(update_fields=['ai_severity', 'ai_category'])
                 print(f"Updated parent message with new assessment: {parent_message.ai_category}/{parent_message.ai_severity}")
+                message_processed(parent_message, reassessed=True, previous=counted_as)
             
+            message_processed(received_message)
+            processed = True
             print("ReceivedMessage saved successfully with agentic and conversation data")
         except Exception as save_error:
             print(f"Error saving ReceivedMessage: {save_error}")
@@ -292,10 +313,13 @@ def first_response(request):
     except Exception as e:
         # Log error to ReceivedMessage
         if received_message:
+            # Taken before the update; only taken back if the message was already counted
+            counted_as = rollups.contribution(received_message)
             received_message.has_error = True
             received_message.error_message = str(e)
             received_message.processed_at = timezone.now()
             received_message.save()
+            message_processed(received_message, reassessed=processed, previous=counted_as if processed else None)
         
         return JsonResponse({
             "error": f"Processing error: {str(e)}"
@@ -303,62 +327,8 @@ def first_response(request):
 
 def admin_dashboard(request):
     """Admin dashboard with statistics and charts"""
-    # Get date range for filtering (last 30 days by default)
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-    
-    # Basic statistics
-    total_messages = ReceivedMessage.objects.count()
-    messages_last_30_days = ReceivedMessage.objects.filter(
-        received_at__gte=start_date
-    ).count()
-    
-    critical_messages = ReceivedMessage.objects.filter(
-        ai_severity__in=['CRIT', 'HIGH']
-    ).count()
-    
-    avg_response_time = ReceivedMessage.objects.filter(
-        response_time_ms__isnull=False
-    ).aggregate(avg_time=Avg('response_time_ms'))['avg_time']
-    
-    # Messages by severity - normalize to uppercase for consistency
-    from django.db.models import Case, When, Value, CharField
-    severity_stats = ReceivedMessage.objects.annotate(
-        normalized_severity=Case(
-            When(ai_severity__iexact='CRIT', then=Value('CRIT')),
-            When(ai_severity__iexact='HIGH', then=Value('HIGH')),
-            When(ai_severity__iexact='MED', then=Value('MED')),
-            When(ai_severity__iexact='LOW', then=Value('LOW')),
-            When(ai_severity__iexact='INFO', then=Value('INFO')),
-            default=Value('UNKNOWN'),
-            output_field=CharField()
-        )
-    ).values('normalized_severity').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
-    # Messages by category
-    category_stats = ReceivedMessage.objects.values('ai_category').annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]  # Top 10 categories
-    
-    # Messages by day (last 30 days)
-    daily_stats = ReceivedMessage.objects.filter(
-        received_at__gte=start_date
-    ).annotate(
-        day=TruncDay('received_at')
-    ).values('day').annotate(
-        count=Count('id')
-    ).order_by('day')
-    
-    # Messages by hour (last 24 hours)
-    hourly_stats = ReceivedMessage.objects.filter(
-        received_at__gte=end_date - timedelta(hours=24)
-    ).annotate(
-        hour=TruncHour('received_at')
-    ).values('hour').annotate(
-        count=Count('id')
-    ).order_by('hour')
+    # Numbers and series come from the hourly rollups, not the message table
+    stats = rollups.dashboard_stats(timezone.now())
     
     # Recent critical messages
     recent_critical = ReceivedMessage.objects.filter(
@@ -366,48 +336,25 @@ def admin_dashboard(request):
     ).order_by('-received_at')[:10]
     
     # Error rate
-    total_processed = ReceivedMessage.objects.filter(processed_at__isnull=False).count()
-    error_count = ReceivedMessage.objects.filter(has_error=True).count()
-    error_rate = (error_count / total_processed * 100) if total_processed > 0 else 0
-    
-    # Conversation statistics
-    # Active conversations: count unique parent messages that are still active
-    conversations_active = ReceivedMessage.objects.filter(
-        conversation_status='active',
-        parent_message__isnull=True  # Only count parent messages, not follow-ups
-    ).count()
-    
-    follow_ups_today = ReceivedMessage.objects.filter(
-        received_at__gte=end_date.replace(hour=0, minute=0, second=0, microsecond=0),
-        conversation_step__gt=1  # Follow-up messages have step > 1
-    ).count()
-    
-    # Average conversation length: calculate the average number of messages per conversation
-    # For each parent message, count itself + all its follow-ups
-    conversation_lengths = ReceivedMessage.objects.filter(
-        is_conversation_starter=True
-    ).annotate(
-        total_messages=Count('follow_ups') + 1  # Count follow-ups + the parent message itself
-    ).aggregate(avg_length=Avg('total_messages'))['avg_length'] or 1.0
-    
-    avg_conversation_length = conversation_lengths
+    total_processed = stats['total_processed']
+    error_rate = (stats['error_count'] / total_processed * 100) if total_processed > 0 else 0
     
     context = {
-        'total_messages': total_messages,
-        'messages_last_30_days': messages_last_30_days,
-        'critical_messages': critical_messages,
-        'avg_response_time': avg_response_time,
+        'total_messages': stats['total_messages'],
+        'messages_last_30_days': stats['messages_last_30_days'],
+        'critical_messages': stats['critical_messages'],
+        'avg_response_time': stats['avg_response_time'],
         'error_rate': error_rate,
-        'severity_stats': severity_stats,
-        'category_stats': category_stats,
-        'daily_stats': daily_stats,
-        'hourly_stats': hourly_stats,
+        'severity_stats': stats['severity_stats'],
+        'category_stats': stats['category_stats'],
+        'daily_stats': stats['daily_stats'],
+        'hourly_stats': stats['hourly_stats'],
         'recent_critical': recent_critical,
         'google_maps_api_key': settings.GOOGLE_MAPS_API_KEY,
         # Conversation statistics
-        'conversations_active': conversations_active,
-        'follow_ups_today': follow_ups_today,
-        'avg_conversation_length': avg_conversation_length,
+        'conversations_active': stats['conversations_active'],
+        'follow_ups_today': stats['follow_ups_today'],
+        'avg_conversation_length': stats['avg_conversation_length'],
     }
     
     return render(request, 'admin/dashboard.html', context)
@@ -458,7 +405,8 @@ def voice_message(request):
             audio_path_to_use = temp_audio_path
         
         # Convert speech to text
-        stt_result = speech_to_text(audio_path_to_use, language)
+        with stage_latency.measure('stt'):
+            stt_result = speech_to_text(audio_path_to_use, language)
         
         if not stt_result['success']:
             return JsonResponse({
@@ -496,7 +444,8 @@ def voice_message(request):
             response_text = str(instructions)
         
         print(f"Generating TTS for text: {response_text[:100]}...")
-        tts_result = text_to_speech(response_text, language)
+        with stage_latency.measure('tts'):
+            tts_result = text_to_speech(response_text, language)
         print(f"TTS result: {tts_result}")
         
         # Create received message record (compatible with agentic response)
@@ -516,6 +465,7 @@ def voice_message(request):
             response_time_ms=int((time.time() - start_time) * 1000),
             processed_at=timezone.now()
         )
+        message_processed(received_message)
         
         # Prepare response (compatible with agentic output)
         response_data = {
@@ -542,8 +492,8 @@ def voice_message(request):
                 gdacs = gdacs_events(lat, lon, radius_km=500)
                 
                 response_data["disaster_feeds"] = {
-                    "earthquakes": quakes[:3],  # Limit to 3 most recent
-                    "gdacs_events": gdacs[:3],  # Limit to 3 most relevant
+                    "earthquakes": quakes[:3].to_features(),  # Limit to 3 most recent
+                    "gdacs_events": gdacs[:3].to_features(),  # Limit to 3 most relevant
                     "location": {"latitude": lat, "longitude": lon}
                 }
                 
@@ -561,9 +511,11 @@ def voice_message(request):
         
         # Log error in database if possible
         if received_message:
+            counted_as = rollups.contribution(received_message)
             received_message.has_error = True
             received_message.error_message = error_msg
             received_message.save()
+            message_processed(received_message, reassessed=True, previous=counted_as)
         
         return JsonResponse({
             "success": False,
@@ -586,147 +538,347 @@ def get_client_ip(request):
     return ip
 
 
-def _haversine_distance(lat1, lon1, lat2, lon2):
-    """Calculate the great circle distance between two points on earth (in km)"""
-    R = 6371  # Earth's radius in kilometers
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi, dl = math.radians(lat2-lat1), math.radians(lon2-lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dl/2)**2
-    return 2*R*math.asin(math.sqrt(a))
-
-
 def emergency_alerts(request):
     """API endpoint to check for emergency clusters and return alerts"""
     try:
-        # Get time window for checking clusters
-        time_window_hours = getattr(settings, 'EMERGENCY_CLUSTER_TIME_WINDOW_HOURS', 24)
-        since_time = timezone.now() - timedelta(hours=time_window_hours)
-        
-        # Get recent messages within time window
-        recent_messages = ReceivedMessage.objects.filter(
-            processed_at__gte=since_time,
-            user_latitude__isnull=False,
-            user_longitude__isnull=False,
-            ai_category__isnull=False
-        ).exclude(ai_category='Unknown').order_by('-processed_at')
-        
-        # Group messages by category
-        category_groups = {}
-        for message in recent_messages:
-            category = message.ai_category
-            if category not in category_groups:
-                category_groups[category] = []
-            category_groups[category].append(message)
-        
-        alerts = []
-        radius_km = getattr(settings, 'EMERGENCY_CLUSTER_RADIUS_KM', 50)
-        min_count = getattr(settings, 'EMERGENCY_CLUSTER_MIN_COUNT', 10)
-        
-        # Check each category for clusters
-        for category, messages in category_groups.items():
-            if len(messages) < min_count:
-                continue
-                
-            # Check for geographical clusters
-            clusters = find_clusters(messages, radius_km, min_count)
-            
-            for cluster in clusters:
-                # Calculate severity distribution
-                severity_counts = {}
-                for msg in cluster['messages']:
-                    severity = msg.ai_severity or 'UNKNOWN'
-                    severity_counts[severity] = severity_counts.get(severity, 0) + 1
-                
-                # Determine dominant severity
-                dominant_severity = max(severity_counts.items(), key=lambda x: x[1])[0] if severity_counts else 'UNKNOWN'
-                
-                alerts.append({
-                    'id': f"{category}_{cluster['center_lat']:.4f}_{cluster['center_lon']:.4f}",
-                    'category': category,
-                    'count': cluster['count'],
-                    'center_lat': cluster['center_lat'],
-                    'center_lon': cluster['center_lon'],
-                    'radius_km': radius_km,
-                    'dominant_severity': dominant_severity,
-                    'severity_distribution': severity_counts,
-                    'first_occurrence': cluster['first_occurrence'].isoformat(),
-                    'last_occurrence': cluster['last_occurrence'].isoformat(),
-                    'time_span_hours': round((cluster['last_occurrence'] - cluster['first_occurrence']).total_seconds() / 3600, 1)
-                })
-        
-        # Sort alerts by count (highest first)
-        alerts.sort(key=lambda x: x['count'], reverse=True)
+        # Dashboards poll this endpoint: answer 304 while nothing relevant changed
+        etag = alerts_etag()
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        
+        # Clusters are maintained incrementally as messages are processed
+        response = JsonResponse(alert_clusters.payload(etag))
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+        
+    except Exception as e:
+        print(f"Error generating emergency alerts: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'alerts': []
+        }, status=500)
+
+
+def emergency_hotspots(request):
+    """API endpoint for cells whose report rate is surging above their baseline"""
+    try:
+        cell_km, window_minutes, min_count, z_threshold, _ = hotspot_settings()
+        hotspots = hotspot_detector.snapshot()
         
         return JsonResponse({
             'success': True,
-            'alerts': alerts,
-            'total_alerts': len(alerts),
-            'checked_time_window_hours': time_window_hours,
-            'cluster_settings': {
-                'radius_km': radius_km,
-                'min_count': min_count
+            'hotspots': hotspots,
+            'total_hotspots': len(hotspots),
+            'detector_settings': {
+                'cell_km': cell_km,
+                'window_minutes': window_minutes,
+                'min_count': min_count,
+                'z_threshold': z_threshold
             }
         })
         
     except Exception as e:
-        print(f"Error generating emergency alerts: {e}")
+        print(f"Error detecting emergency hotspots: {e}")
         return JsonResponse({
             'success': False,
             'error': str(e),
-            'alerts': []
+            'hotspots': []
         }, status=500)
 
 
-def find_clusters(messages, radius_km, min_count):
-    """Find geographical clusters of messages"""
-    clusters = []
-    processed_indices = set()
+def map_tiles(request):
+    """API endpoint for aggregated message counts in the map viewport"""
+    try:
+        north = float(request.GET['north'])
+        south = float(request.GET['south'])
+        east = float(request.GET['east'])
+        west = float(request.GET['west'])
+        zoom = int(request.GET.get('zoom', 6))
+        days = int(request.GET.get('days', getattr(settings, 'GEO_TILE_DEFAULT_DAYS', 7)))
+        if not (-90 <= south <= north <= 90) or not (-180 <= west <= 180 and -180 <= east <= 180):
+            raise ValueError("Invalid viewport bounds")
+        if not (0 <= zoom <= 22) or not (1 <= days <= getattr(settings, 'GEO_TILE_MAX_DAYS', 90)):
+            raise ValueError("Invalid zoom or days")
+    except (KeyError, ValueError) as e:
+        return HttpResponseBadRequest(json.dumps({"error": f"Invalid viewport: {str(e)}"}), content_type="application/json")
     
-    for i, center_msg in enumerate(messages):
-        if i in processed_indices:
-            continue
-            
-        # Find all messages within radius of this message
-        cluster_messages = []
-        cluster_indices = []
+    try:
+        tile_zoom, cells = viewport_cells(north, south, east, west, zoom, days)
         
-        for j, msg in enumerate(messages):
-            if j in processed_indices:
-                continue
-                
-            distance = _haversine_distance(
-                center_msg.user_latitude, center_msg.user_longitude,
-                msg.user_latitude, msg.user_longitude
-            )
-            
-            if distance <= radius_km:
-                cluster_messages.append(msg)
-                cluster_indices.append(j)
-        
-        # If cluster is large enough, add it
-        if len(cluster_messages) >= min_count:
-            # Calculate cluster center (centroid)
-            center_lat = sum(msg.user_latitude for msg in cluster_messages) / len(cluster_messages)
-            center_lon = sum(msg.user_longitude for msg in cluster_messages) / len(cluster_messages)
-            
-            # Get time range
-            times = [msg.processed_at for msg in cluster_messages]
-            first_occurrence = min(times)
-            last_occurrence = max(times)
-            
-            clusters.append({
-                'messages': cluster_messages,
-                'count': len(cluster_messages),
-                'center_lat': center_lat,
-                'center_lon': center_lon,
-                'first_occurrence': first_occurrence,
-                'last_occurrence': last_occurrence
+        return JsonResponse({
+            'success': True,
+            'tile_zoom': tile_zoom,
+            'days': days,
+            'cells': cells,
+            'total_cells': len(cells),
+            'total_messages': sum(cell['count'] for cell in cells)
+        })
+        
+    except Exception as e:
+        print(f"Error loading map tiles: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'cells': []
+        }, status=500)
+
+
+def live_updates(request):
+    """Server-sent events stream of alert diffs and metric deltas for the dashboards"""
+    if request.method != 'GET':
+        return HttpResponseBadRequest(json.dumps({"error": "GET required"}), content_type="application/json")
+    
+    asynchronous = isinstance(request, ASGIRequest)
+    subscriber = live_channel.subscribe(asynchronous)
+    if subscriber is None:
+        # Clients fall back to polling when this worker is full (always beyond one stream under WSGI)
+        return JsonResponse({"error": "Too many live connections"}, status=503)
+    
+    if asynchronous:
+        stream = async_event_stream(live_channel, subscriber)
+    else:
+        stream = event_stream(live_channel, subscriber)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep proxies from buffering the stream
+    return response
+
+
+def _subscription_to_dict(subscription):
+    return {
+        'id': subscription.id,
+        'name': subscription.name,
+        'area_type': subscription.area_type,
+        'latitude': subscription.latitude,
+        'longitude': subscription.longitude,
+        'radius_km': subscription.radius_km,
+        'polygon': subscription.polygon,
+        'categories': subscription.categories,
+        'is_active': subscription.is_active,
+        'created_at': subscription.created_at.isoformat()
+    }
+
+
+def _owned_subscriptions(request):
+    """Subscriptions the requester may see: all for staff, otherwise the session's own"""
+    if request.user.is_authenticated and request.user.is_staff:
+        return AlertSubscription.objects.all()
+    return AlertSubscription.objects.filter(session_key=request.session.session_key or '')
+
+
+def alert_subscriptions(request):
+    """List (GET) or register (POST, CSRF protected) geofenced alert subscriptions"""
+    if request.method == 'GET':
+        subscriptions = _owned_subscriptions(request).filter(is_active=True)
+        return JsonResponse({
+            'success': True,
+            'subscriptions': [_subscription_to_dict(sub) for sub in subscriptions[:500]]
+        })
+    if request.method != 'POST':
+        return HttpResponseBadRequest(json.dumps({"error": "GET or POST required"}), content_type="application/json")
+    
+    try:
+        payload = json.loads(request.body.decode('utf-8') or '{}')
+        categories = payload.get('categories') or []
+        if not isinstance(categories, list) or not all(isinstance(c, str) for c in categories):
+            raise ValueError("'categories' must be a list of category names")
+        
+        subscription = AlertSubscription(name=str(payload.get('name', ''))[:100], categories=categories)
+        if payload.get('polygon') is not None:
+            polygon_from_ring(payload['polygon'])
+            subscription.area_type = 'polygon'
+            subscription.polygon = [[float(lon), float(lat)] for lon, lat in payload['polygon']]
+        else:
+            lat, lon = float(payload['lat']), float(payload['lon'])
+            radius_km = float(payload['radius_km'])
+            max_radius = getattr(settings, 'SUBSCRIPTION_MAX_RADIUS_KM', 500)
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ValueError("Coordinates out of range")
+            if not (0 < radius_km <= max_radius):
+                raise ValueError(f"'radius_km' must be between 0 and {max_radius}")
+            subscription.area_type = 'circle'
+            subscription.latitude, subscription.longitude, subscription.radius_km = lat, lon, radius_km
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        return HttpResponseBadRequest(json.dumps({"error": f"Invalid subscription: {str(e)}"}), content_type="application/json")
+    
+    max_per_session = getattr(settings, 'SUBSCRIPTION_MAX_PER_SESSION', 20)
+    if request.session.session_key and AlertSubscription.objects.filter(
+            session_key=request.session.session_key, is_active=True).count() >= max_per_session:
+        return JsonResponse({"error": f"At most {max_per_session} active subscriptions per session"}, status=429)
+    if not request.session.session_key:
+        request.session.create()
+    subscription.session_key = request.session.session_key
+    if request.user.is_authenticated:
+        subscription.created_by = request.user
+    subscription.save()
+    subscription_index.invalidate()
+    
+    return JsonResponse({'success': True, 'subscription': _subscription_to_dict(subscription)}, status=201)
+
+
+def alert_subscription_detail(request, subscription_id):
+    """Cancel (DELETE, CSRF protected) a subscription"""
+    if request.method != 'DELETE':
+        return HttpResponseBadRequest(json.dumps({"error": "DELETE required"}), content_type="application/json")
+    
+    updated = _owned_subscriptions(request).filter(id=subscription_id, is_active=True).update(
+        is_active=False, updated_at=timezone.now()
+    )
+    if not updated:
+        return JsonResponse({'success': False, 'error': 'Subscription not found'}, status=404)
+    subscription_index.invalidate()
+    return JsonResponse({'success': True})
+
+
+def subscription_notifications(request, subscription_id):
+    """Notifications of a subscription, newest first (?since_id= for only newer ones)"""
+    subscription = _owned_subscriptions(request).filter(id=subscription_id).first()
+    if subscription is None:
+        return JsonResponse({'success': False, 'error': 'Subscription not found'}, status=404)
+    
+    notifications = subscription.notifications.all()
+    since_id = request.GET.get('since_id')
+    if since_id and since_id.isdigit():
+        notifications = notifications.filter(id__gt=int(since_id))
+    
+    return JsonResponse({
+        'success': True,
+        'notifications': [{
+            'id': n.id,
+            'kind': n.kind,
+            'category': n.category,
+            'severity': n.severity,
+            'latitude': n.latitude,
+            'longitude': n.longitude,
+            'payload': n.payload,
+            'is_read': n.is_read,
+            'created_at': n.created_at.isoformat()
+        } for n in notifications[:100]]
+    })
+
+
+def conversation_detail(request, message_id):
+    """Every message of the conversation containing a message, including archived conversations"""
+    found = find_conversation(message_id)
+    if found is not None:
+        archived, messages = found
+        # The thread belongs to the session that started it: anyone can reply to any conversation id
+        root = next((m for m in messages if (m.id == m.root_id if archived else m.parent_message_id is None)), None)
+        is_staff = request.user.is_authenticated and request.user.is_staff
+        if is_staff or (root is not None and root.session_key
+                        and root.session_key == request.session.session_key):
+            return JsonResponse({
+                'success': True,
+                'archived': archived,
+                'messages': [message_to_dict(m) for m in messages]
             })
-            
-            # Mark these messages as processed
-            processed_indices.update(cluster_indices)
+    return JsonResponse({'success': False, 'error': 'Conversation not found'}, status=404)
+
+
+def _browsable_messages(request):
+    """
+    Messages the requester may browse, with the request's filters: all (or
+    one ?session=) for staff, otherwise the session's own
+    """
+    if request.user.is_authenticated and request.user.is_staff:
+        session_key = request.GET.get('session') or None
+    else:
+        session_key = request.session.session_key or ''
+    return filter_messages(ReceivedMessage.objects.all(), category=request.GET.get('category'),
+                           severity=request.GET.get('severity'), area=parse_area(request.GET),
+                           session_key=session_key, since=parse_time(request.GET.get('since')),
+                           until=parse_time(request.GET.get('until')))
+
+
+def message_list(request):
+    """Messages newest first, a page per ?cursor= (?limit, fields, category, severity, north/south/east/west, since, until)"""
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+        messages, next_cursor = keyset_page(_browsable_messages(request), fields, cursor=request.GET.get('cursor'),
+                                            limit=page_size(request.GET.get('limit')))
+    except (KeyError, ValueError) as e:
+        return HttpResponseBadRequest(json.dumps({"error": f"Invalid request: {str(e)}"}), content_type="application/json")
     
-    return clusters
+    return JsonResponse({'success': True, 'messages': messages, 'next_cursor': next_cursor})
+
+
+def conversation_list(request):
+    """Conversations newest first by their starter, as message_list (?messages=1 includes every thread)"""
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+        conversations, next_cursor = conversation_page(
+            _browsable_messages(request), fields, cursor=request.GET.get('cursor'),
+            limit=page_size(request.GET.get('limit')), with_messages=request.GET.get('messages') in ('1', 'true')
+        )
+    except (KeyError, ValueError) as e:
+        return HttpResponseBadRequest(json.dumps({"error": f"Invalid request: {str(e)}"}), content_type="application/json")
+    
+    return JsonResponse({'success': True, 'conversations': conversations, 'next_cursor': next_cursor})
+
+
+@staff_member_required
+def message_search(request):
+    """Messages matching ?q= through the full-text index, best matches first (?limit=, at most 100)"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return HttpResponseBadRequest(json.dumps({"error": "'q' is required"}), content_type="application/json")
+    limit = request.GET.get('limit', '20')
+    limit = min(int(limit), 100) if limit.isdigit() and int(limit) > 0 else 20
+    
+    started = time.perf_counter()
+    messages = ranked_search(query, limit=limit)
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        'results': [{
+            'id': m.id,
+            'received_at': m.received_at.isoformat(),
+            'language': m.language,
+            'message_text': m.message_text or m.user_message,
+            'ai_category': m.ai_category,
+            'ai_severity': m.ai_severity,
+            'follow_up_question': m.follow_up_question,
+            'parent_id': m.parent_message_id,
+            'latitude': m.user_latitude,
+            'longitude': m.user_longitude,
+        } for m in messages]
+    })
+
+
+@staff_member_required
+def message_export(request):
+    """Stream messages as NDJSON, CSV or an .npz of NumPy columns (?format=, since, until, category, severity)"""
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(json.dumps({"error": f"'format' must be one of {', '.join(EXPORT_FORMATS)}"}),
+                                      content_type="application/json")
+    try:
+        queryset = export_queryset(since=parse_time(request.GET.get('since')),
+                                   until=parse_time(request.GET.get('until')),
+                                   category=request.GET.get('category'), severity=request.GET.get('severity'))
+    except ValueError as e:
+        return HttpResponseBadRequest(json.dumps({"error": f"Invalid time: {str(e)}"}), content_type="application/json")
+    
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    progress = ExportProgress()
+    writer, content_type, extension = {
+        'ndjson': (ndjson_chunks, 'application/x-ndjson', 'ndjson'),
+        'csv': (csv_chunks, 'text/csv', 'csv'),
+        'npy': (npz_chunks, 'application/zip', 'npz'),
+    }[export_format]
+    
+    def stream():
+        yield from writer(queryset, progress, chunk_size)
+        logger.info(f"Message export ({export_format}): {progress.report()}")
+    
+    response = StreamingHttpResponse(stream(), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="messages-{timezone.now():%Y%m%d-%H%M%S}.{extension}"'
+    return response
+
 
 @csrf_exempt
 def text_to_speech_api(request):
@@ -754,7 +906,8 @@ def text_to_speech_api(request):
         print(f"TTS API: Converting text to speech: '{text[:100]}...' in language: {language}")
         
         # Generate audio
-        audio_result = text_to_speech(text, language)
+        with stage_latency.measure('tts'):
+            audio_result = text_to_speech(text, language)
         
         if audio_result['success'] and audio_result['audio_url']:
             print(f"TTS API: Audio generated successfully: {audio_result['audio_url']}")
@@ -787,70 +940,7 @@ def agentic_system_status(request):
         return HttpResponseBadRequest(json.dumps({"error": "GET required"}), content_type="application/json")
     
     try:
-        # Initialize agentic system
-        agentic_system = AgenticEmergencySystem()
-        
-        # Get system status
-        status = agentic_system.get_system_status()
-        
-        # Get real metrics from the metrics system
-        metrics = agentic_metrics.get_all_metrics()
-        planner_metrics = metrics.get('planner', {})
-        executor_metrics = metrics.get('executor', {})
-        memory_metrics = metrics.get('memory', {})
-        
-        # Add runtime statistics with error handling
-        try:
-            recent_messages = ReceivedMessage.objects.filter(
-                processed_at__gte=timezone.now() - timedelta(hours=24)
-            )
-            
-            runtime_stats = {
-                'messages_24h': recent_messages.count(),
-                'avg_response_time_ms': recent_messages.aggregate(
-                    avg_time=Avg('response_time_ms')
-                )['avg_time'] or 0,
-                'categories_processed': recent_messages.values('ai_category').distinct().count(),
-                'severities_handled': recent_messages.values('ai_severity').distinct().count()
-            }
-            
-        except Exception as e:
-            print(f"Error calculating runtime stats: {e}")
-            runtime_stats = {
-                'messages_24h': 0,
-                'avg_response_time_ms': 0,
-                'categories_processed': 0,
-                'severities_handled': 0
-            }
-        
-        # Format response for frontend compatibility
-        components = status.get('components', {})
-        
-        # Use real metrics from the metrics system
-        plans_generated = planner_metrics.get('plans_generated', 0)
-        plan_completeness = planner_metrics.get('completeness', 0)
-        actions_executed = executor_metrics.get('actions_executed', 0) 
-        execution_success = executor_metrics.get('success_rate', 0)
-        stored_patterns = memory_metrics.get('patterns_stored', 0)
-        context_hits = memory_metrics.get('context_hits', 0)
-        
-        response_data = {
-            "status": "success",
-            "planner_status": "Active" if components.get('planner', {}).get('status') == 'active' else "Inactive",
-            "executor_status": "Active" if components.get('executor', {}).get('status') == 'active' else "Inactive", 
-            "memory_status": "Active" if components.get('memory', {}).get('status') == 'active' else "Inactive",
-            "plans_generated": plans_generated,
-            "plan_completeness": plan_completeness,
-            "actions_executed": actions_executed, 
-            "execution_success": execution_success,
-            "stored_patterns": stored_patterns,
-            "context_hits": context_hits,
-            "messages_24h": runtime_stats['messages_24h'],
-            "avg_response_time": f"{runtime_stats['avg_response_time_ms']:.0f}",
-            "categories_processed": runtime_stats['categories_processed'],
-            "system_version": status.get('version', '1.0-agentic'),
-            "capabilities": status.get('capabilities', [])
-        }
+        response_data = build_agentic_status()
         
         return JsonResponse(response_data)
         
@@ -909,31 +999,37 @@ def agentic_memory_insights(request):
 def disaster_feeds_cache_stats(request):
     """API endpoint to get disaster feeds cache statistics"""
     try:
-        from .disaster_feeds import get_cache_stats, cleanup_expired_cache
+        from .disaster_feeds import (get_cache_stats, cleanup_expired_cache, endpoint_health,
+                                     USGS_CACHE_TTL, GDACS_CACHE_TTL)
+        from .impact_areas import impact_areas
         
         # Cleanup expired entries first
         cleanup_expired_cache()
         
-        # Get cache statistics
+        # Get cache statistics (constant-time read of maintained counters)
         cache_stats = get_cache_stats()
         
-        # Calculate cache efficiency
-        total_entries = cache_stats['total_entries']
-        cache_efficiency = 0
-        if total_entries > 0:
-            cache_efficiency = (cache_stats['valid_entries'] / total_entries) * 100
+        # Cache efficiency is the real hit ratio: hits / (hits + misses)
+        hit_ratio_pct = round(cache_stats['hit_ratio'] * 100, 1)
         
         response_data = {
             "status": "success",
             "cache_stats": {
-                "total_entries": total_entries,
+                "total_entries": cache_stats['total_entries'],
                 "valid_entries": cache_stats['valid_entries'],
                 "expired_entries": cache_stats['expired_entries'],
                 "cache_size_kb": round(cache_stats['cache_size_bytes'] / 1024, 2),
-                "cache_efficiency_pct": round(cache_efficiency, 1),
-                "usgs_ttl_minutes": 5,  # USGS_CACHE_TTL / 60
-                "gdacs_ttl_minutes": 15  # GDACS_CACHE_TTL / 60
-            }
+                "cache_efficiency_pct": hit_ratio_pct,
+                "hit_ratio_pct": hit_ratio_pct,
+                "hits": cache_stats['hits'],
+                "misses": cache_stats['misses'],
+                "evictions": cache_stats['evictions'],
+                "functions": cache_stats['functions'],
+                "usgs_ttl_minutes": USGS_CACHE_TTL // 60,
+                "gdacs_ttl_minutes": GDACS_CACHE_TTL // 60
+            },
+            "endpoint_health": endpoint_health.snapshot(),
+            "impact_areas": impact_areas.stats()
         }
         
         return JsonResponse(response_data)